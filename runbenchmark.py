@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+
+"""
+This script benchmarks server side hll functions in django environment.
+Arguments are passed to hll_benchmark management command. See:
+python3 runbenchmark.py --help
+"""
+
+import os
+import sys
+
+import django
+from django.core.management import call_command
+from django.db import connection
+
+if __name__ == "__main__":
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+    django.setup()
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS hll')
+
+    call_command('hll_benchmark', *sys.argv[1:])
@@ -15,7 +15,7 @@ from django.test.utils import get_runner
 if __name__ == "__main__":
     print('Django: ', django.VERSION)
     print('Python: ', sys.version)
-    os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
     django.setup()
     TestRunner = get_runner(settings)
     test_runner = TestRunner()
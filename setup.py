@@ -14,7 +14,8 @@ with open('requirements.txt') as f:
 setup(
     name='django-pg-hll',
     version='2.2.0',
-    packages=['django_pg_hll'],
+    packages=['django_pg_hll', 'django_pg_hll.management', 'django_pg_hll.management.commands',
+              'django_pg_hll.migrations'],
     package_dir={'': 'src'},
     url='https://github.com/M1ha-Shvn/django-pg-hll',
     license='BSD 3-clause "New" or "Revised" License',
@@ -1,5 +1,27 @@
+from .accumulator import *  # noqa: F401, F403
 from .aggregate import *  # noqa: F401, F403
+from .auto import *  # noqa: F401, F403
+from .backfill import *  # noqa: F401, F403
+from .benchmark import *  # noqa: F401, F403
 from .bulk_update import *  # noqa: F401, F403
+from .cache import *  # noqa: F401, F403
+from .compaction import *  # noqa: F401, F403
+from .counter import *  # noqa: F401, F403
+from .cube import *  # noqa: F401, F403
+from .delta import *  # noqa: F401, F403
 from .fields import *  # noqa: F401, F403
+from .fold import *  # noqa: F401, F403
+from .formats import *  # noqa: F401, F403
+from .functions import *  # noqa: F401, F403
+from .grouping import *  # noqa: F401, F403
+from .partitioning import *  # noqa: F401, F403
+from .profiler import *  # noqa: F401, F403
+from .progressive import *  # noqa: F401, F403
+from .routers import *  # noqa: F401, F403
+from .sharding import *  # noqa: F401, F403
+from .sketch import *  # noqa: F401, F403
+from .snapshot import *  # noqa: F401, F403
+from .sqlite import *  # noqa: F401, F403
+from .streaming import *  # noqa: F401, F403
 from .transforms import *  # noqa: F401, F403
 from .values import *  # noqa: F401, F403
@@ -0,0 +1,136 @@
+"""
+Client side pre-aggregation of values before sending them to HllField.
+Duplicate values are dropped in python, so only distinct values or a compact hll are sent to database.
+"""
+from typing import Any, Dict, Iterable, Optional, Union
+
+from django.db import connections
+from django.db.models import F, QuerySet
+
+from .compatibility import string_types
+from .sketch import HllSketch, hash_value
+from .values import HllBulkSet, HllCombinedExpression, parse_hll_value
+
+__all__ = ['HllAccumulator']
+
+
+class HllAccumulator:
+    """
+    Accumulates values, keeping an exact set of distinct values up to max_values.
+    When it is exceeded, values are added to a local sketch (see HllSketch) and memory usage doesn't grow any more.
+
+    acc = HllAccumulator(max_values=10000)
+    acc.update(event.user_id for event in events)
+    acc.merge_into(Page.objects.filter(pk=1), 'visitors')
+    """
+    def __init__(self, max_values=10000, db_type=None, hash_seed=0, **params):
+        # type: (int, Optional[str], int, **int) -> None
+        """
+        :param max_values: Maximum number of distinct values to keep before switching to sketch
+        :param db_type: Hash function type. See HllSketch.add()
+        :param hash_seed: Optional hash seed
+        :param params: Sketch parameters: log2m, regwidth, expthresh, sparseon.
+            They should be the same, as HllField you merge accumulator into has.
+        """
+        if max_values < 0:
+            raise ValueError('max_values must be non-negative')
+
+        self.max_values = max_values
+        self.db_type = db_type
+        self.hash_seed = hash_seed
+        self.params = HllSketch(**params).params
+
+        # Hash value: original value. None, when switched to sketch
+        self._values = {}  # type: Optional[Dict[int, Any]]
+        self._sketch = None  # type: Optional[HllSketch]
+
+    @property
+    def exact(self):  # type: () -> bool
+        """
+        True, if accumulator keeps exact set of distinct values
+        """
+        return self._sketch is None
+
+    def _switch_to_sketch(self):  # type: () -> None
+        self._sketch = HllSketch(*self.params)
+        for hashval in self._values:
+            self._sketch.add_hash(hashval)
+
+        self._values = None
+
+    def add(self, value):  # type: (Any) -> None
+        hashval = hash_value(value, db_type=self.db_type, hash_seed=self.hash_seed)
+
+        if self._sketch is not None:
+            self._sketch.add_hash(hashval)
+        elif hashval not in self._values:
+            self._values[hashval] = value
+            if len(self._values) > self.max_values:
+                self._switch_to_sketch()
+
+    def update(self, values):  # type: (Iterable[Any]) -> None
+        for value in values:
+            self.add(value)
+
+    def clear(self):  # type: () -> None
+        self._values, self._sketch = {}, None
+
+    def get_sketch(self):  # type: () -> HllSketch
+        """
+        Returns sketch of all values added
+        """
+        if self._sketch is not None:
+            return self._sketch.copy()
+
+        sketch = HllSketch(*self.params)
+        for hashval in self._values:
+            sketch.add_hash(hashval)
+
+        return sketch
+
+    def cardinality(self):  # type: () -> float
+        """
+        Number of distinct values added. Exact, if accumulator hasn't switched to sketch.
+        """
+        return float(len(self._values)) if self._sketch is None else self._sketch.cardinality()
+
+    @staticmethod
+    def _value_size(value):  # type: (Any) -> int
+        if isinstance(value, string_types):
+            return len(value.encode('utf-8'))
+
+        if isinstance(value, bytes):
+            return len(value)
+
+        return 1 if isinstance(value, bool) else 8
+
+    def to_hll_value(self):  # type: () -> Union[HllBulkSet, HllSketch]
+        """
+        Returns the smallest payload, which can be saved to HllField or united with it:
+        HllBulkSet of distinct values or HllSketch (serialized hll).
+        Hashes are sent as EXPLICIT hll, if there are few of them.
+        """
+        sketch = self.get_sketch()
+
+        # Database hashes values with default parameters and auto detected hash function only
+        if self._sketch is not None or self.db_type is not None or self.hash_seed or self.params != HllSketch().params:
+            return sketch
+
+        values_size = sum(self._value_size(value) for value in self._values.values())
+        if values_size < len(sketch.to_bytes()):
+            return HllBulkSet(list(self._values.values()))
+
+        return sketch
+
+    def merge_into(self, queryset, field_name):  # type: (QuerySet, str) -> int
+        """
+        Unites accumulated values with HllField of all rows in queryset
+        :param queryset: QuerySet of rows to update
+        :param field_name: HllField name
+        :return: Number of rows updated
+        """
+        field = queryset.model._meta.get_field(field_name)
+        value = parse_hll_value(self.to_hll_value(), db_type=field.db_type(connections[queryset.db]))
+        return queryset.update(**{
+            field_name: HllCombinedExpression(F(field_name), HllCombinedExpression.CONCAT, value, output_field=field)
+        })
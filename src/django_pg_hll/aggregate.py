@@ -46,7 +46,8 @@ class HllSParseOn(HllConfigurationMixin, Aggregate):
 class UnionAggCardinality(Aggregate):
     """
     I haven't found a way to combine function inside function in django.
-    So, I've written function to get aggregate cardinality with one call
+    So, I've written function to get aggregate cardinality with one call.
+    Composable alternative: HllCardinalityOf(UnionAgg(hll))
     """
     function = 'hll_union_agg'
     template = 'hll_cardinality(%(function)s(%(expressions)s))'
@@ -56,8 +57,38 @@ class UnionAggCardinality(Aggregate):
 class CardinalitySum(Aggregate):
     """
     I haven't found a way to combine function inside function in django.
-    So, I've written function to get sum cardinality with one call
+    So, I've written function to get sum cardinality with one call.
+    Composable alternative: Sum(HllCardinalityOf(hll))
     """
     function = 'hll_cardinality'
     template = 'SUM(%(function)s(%(expressions)s))'
     output_field = FloatField()
+
+
+class AddAgg(Aggregate):
+    """
+    Builds hll from column values: hll_add_agg(hll_hash_<db_type>(expression))
+    """
+    function = 'hll_add_agg'
+    template = '%(function)s(hll_hash_%(db_type)s(%(expressions)s%(cast)s%(hash_seed)s))'
+    output_field = HllField()
+
+    HASH_TYPES = ('boolean', 'smallint', 'integer', 'bigint', 'bytea', 'text', 'any')
+
+    def __init__(self, expression, db_type='any', hash_seed=None, **extra):
+        """
+        :param expression: Field name or expression to hash
+        :param db_type: Hash function type: boolean, smallint, integer, bigint, bytea, text or any
+        :param hash_seed: Optional hash seed
+        """
+        if db_type not in self.HASH_TYPES:
+            raise ValueError('db_type must be one of: %s' % ', '.join(self.HASH_TYPES))
+
+        # Column type should match hash function argument type. hll_hash_any accepts any type
+        extra.setdefault('cast', '' if db_type == 'any' else '::%s' % db_type)
+        extra['hash_seed'] = '' if hash_seed is None else ', %d' % int(hash_seed)
+        super(AddAgg, self).__init__(expression, db_type=db_type, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite has no type casts. See sqlite.py
+        return self.as_sql(compiler, connection, cast='', **extra_context)
@@ -0,0 +1,126 @@
+"""
+Automatic choice of the way values are sent to database for adding to HllField.
+HllSet builds a chain of hll_hash_* expressions, which is the cheapest for a few values,
+but hits postgres max_stack_depth for thousands of them. HllBulkSet passes values as arrays to hll_add_agg(),
+which has constant SQL overhead. For huge inputs hashing values locally (see HllSketch)
+and sending a serialized sketch of constant size is cheaper, than transferring all values.
+"""
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .sketch import HllSketch, _detect_db_type
+from .values import HllBulkSet, HllFromHex, HllSet, HllValue
+
+__all__ = ['HllAuto', 'get_auto_thresholds']
+
+STRATEGY_INLINE = 'inline'
+STRATEGY_BULK = 'bulk'
+STRATEGY_LOCAL = 'local'
+
+STRATEGIES = (STRATEGY_INLINE, STRATEGY_BULK, STRATEGY_LOCAL)
+
+Params = Tuple[int, int, int, int]
+
+Thresholds = Dict[str, Optional[int]]
+
+
+def _is_hashable_locally(value):  # type: (Any) -> bool
+    if isinstance(value, HllValue):
+        return False
+
+    try:
+        _detect_db_type(value)
+        return True
+    except ValueError:
+        return False
+
+
+class HllAuto(HllValue):
+    """
+    Hll value of iterable, which chooses the cheapest way to send values to database by their number and types:
+    * inline: hll_hash_* expressions, united with || (HllSet). Used for up to INLINE_MAX_VALUES values.
+    * local: sketch, built in python (HllSketch). Used for LOCAL_MIN_VALUES values and more, if params are given
+        and all values can be hashed locally (booleans, integers, bytes and strings).
+    * bulk: arrays of values, aggregated by hll_add_agg() (HllBulkSet). Used otherwise.
+    Thresholds can be measured for your database with run_value_benchmark() and get_auto_thresholds().
+
+    MyModel.objects.filter(pk=1).update(hll=HllEmpty() | F('hll') | HllAuto(user_ids, params=(11, 5, -1, 1)))
+    """
+    INLINE_MAX_VALUES = 8
+    LOCAL_MIN_VALUES = 20000
+
+    template = '(%(expressions)s)'
+    arity = 1
+
+    def __init__(self, values, params=None, strategy=None, thresholds=None, **extra):
+        # type: (Iterable[Any], Optional[Params], Optional[str], Optional[Thresholds], **Any) -> None
+        """
+        :param values: Iterable of values or HllPrimitiveValue instances (which are never hashed locally)
+        :param params: (log2m, regwidth, expthresh, sparseon) of target HllField. Required for local strategy,
+            as locally built sketch should have the same parameters, as the field has.
+        :param strategy: Forces strategy: inline, bulk or local. Chosen automatically by default.
+        :param thresholds: Dictionary with inline_max_values and (or) local_min_values keys,
+            overriding INLINE_MAX_VALUES and LOCAL_MIN_VALUES. None local_min_values disables local strategy.
+        """
+        values = tuple(values)
+        thresholds = thresholds or {}
+
+        if strategy is None:
+            strategy = self.choose_strategy(values, params, thresholds.get('inline_max_values', self.INLINE_MAX_VALUES),
+                                            thresholds.get('local_min_values', self.LOCAL_MIN_VALUES))
+        elif strategy not in STRATEGIES:
+            raise ValueError('strategy must be one of: %s' % ', '.join(STRATEGIES))
+
+        self.strategy = strategy
+        super(HllAuto, self).__init__(self._build(values, params), **extra)
+
+    @classmethod
+    def choose_strategy(cls, values, params, inline_max_values, local_min_values):
+        # type: (Tuple[Any, ...], Optional[Params], int, Optional[int]) -> str
+        if len(values) <= inline_max_values:
+            return STRATEGY_INLINE
+
+        if params is not None and local_min_values is not None and len(values) >= local_min_values \
+                and all(map(_is_hashable_locally, values)):
+            return STRATEGY_LOCAL
+
+        return STRATEGY_BULK
+
+    def _build(self, values, params):  # type: (Tuple[Any, ...], Optional[Params]) -> Any
+        if self.strategy == STRATEGY_LOCAL:
+            if params is None:
+                raise ValueError('params are required for local strategy')
+
+            sketch = HllSketch(*params)
+            sketch.update(values)
+            return HllFromHex(sketch)
+
+        return HllSet(values) if self.strategy == STRATEGY_INLINE else HllBulkSet(values)
+
+
+def get_auto_thresholds(report):  # type: (Iterable[Dict[str, Any]]) -> Thresholds
+    """
+    Derives HllAuto thresholds from benchmark.run_value_benchmark() report
+    :param report: Report, returned by run_value_benchmark()
+    :return: Dictionary with inline_max_values and local_min_values keys, which can be passed to HllAuto thresholds.
+        inline_max_values is the largest size, inline strategy is faster than bulk for.
+        local_min_values is the smallest size, local strategy is faster than bulk for
+        (None, if it is never faster).
+    """
+    latencies = {}  # type: Dict[int, Dict[str, float]]
+    for item in report:
+        if item['latency'] is not None:
+            latencies.setdefault(item['size'], {})[item['strategy']] = item['latency']
+
+    inline_max_values, local_min_values = 0, None
+    for size in sorted(latencies.keys()):
+        bulk = latencies[size].get(STRATEGY_BULK)
+        if bulk is None:
+            continue
+
+        if latencies[size].get(STRATEGY_INLINE, float('inf')) <= bulk:
+            inline_max_values = size
+
+        if local_min_values is None and latencies[size].get(STRATEGY_LOCAL, float('inf')) < bulk:
+            local_min_values = size
+
+    return {'inline_max_values': inline_max_values, 'local_min_values': local_min_values}
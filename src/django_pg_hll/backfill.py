@@ -0,0 +1,128 @@
+"""
+Building HllField values from raw event tables on database side.
+Source table is processed by primary key ranges, every range is united into target rows with a single UPDATE.
+Adding the same values to hll twice doesn't change it, so interrupted backfill can be safely resumed
+from the last checkpoint, even if some chunks after it have already been processed.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from django.db import connections, transaction
+from django.db.models import F, Max, Min, OuterRef, QuerySet, Subquery
+
+from .aggregate import AddAgg
+from .fields import HllField
+from .values import HllCombinedExpression
+
+__all__ = ['hll_backfill']
+
+
+def _read_checkpoint(checkpoint_file):  # type: (Optional[str]) -> Optional[int]
+    if not checkpoint_file or not os.path.exists(checkpoint_file):
+        return None
+
+    with open(checkpoint_file) as f:
+        return json.load(f)['next_pk']
+
+
+def _write_checkpoint(checkpoint_file, next_pk):  # type: (str, int) -> None
+    # File is replaced atomically, so it is never left half written
+    tmp_file = '%s.tmp' % checkpoint_file
+    with open(tmp_file, 'w') as f:
+        json.dump({'next_pk': next_pk}, f)
+
+    os.replace(tmp_file, checkpoint_file)
+
+
+def _get_ranges(source, chunk_size, checkpoint_file):
+    # type: (QuerySet, int, Optional[str]) -> List[Tuple[int, int]]
+    # Primary key ranges from checkpoint (or minimum primary key) to maximum primary key
+    pk_range = source.aggregate(min_pk=Min('pk'), max_pk=Max('pk'))
+    if pk_range['min_pk'] is None:
+        return []
+
+    start_pk = _read_checkpoint(checkpoint_file)
+    if start_pk is None:
+        start_pk = pk_range['min_pk']
+
+    return [(lo, lo + chunk_size) for lo in range(start_pk, pk_range['max_pk'] + 1, chunk_size)]
+
+
+def _wait_chunks(ranges, results, checkpoint_file):
+    # type: (List[Tuple[int, int]], Iterator[None], Optional[str]) -> None
+    # Results are iterated in chunks order, so checkpoint is moved only when all previous chunks are done
+    for chunk_range, _ in zip(ranges, results):
+        if checkpoint_file:
+            _write_checkpoint(checkpoint_file, chunk_range[1])
+
+
+def _process_chunk(source, key_field, value_field, target, target_field, target_key_field, db_type, hash_seed,
+                   pk_range, close_connection):
+    # type: (QuerySet, str, str, QuerySet, str, str, str, Optional[int], Tuple[int, int], bool) -> None
+    try:
+        chunk = source.filter(pk__gte=pk_range[0], pk__lt=pk_range[1], **{'%s__isnull' % value_field: False})
+        chunk_hll = Subquery(
+            chunk.filter(**{key_field: OuterRef(target_key_field)}).order_by().values(key_field).
+            annotate(_hll=AddAgg(value_field, db_type=db_type, hash_seed=hash_seed)).values('_hll'),
+            output_field=HllField()
+        )
+
+        with transaction.atomic(using=target.db):
+            # Rows are locked in primary key order, so concurrent chunks can't deadlock
+            pks = list(target.filter(**{'%s__in' % target_key_field: chunk.values(key_field)}).order_by('pk').
+                       select_for_update().values_list('pk', flat=True))
+            target.filter(pk__in=pks).update(**{
+                target_field: HllCombinedExpression(F(target_field), HllCombinedExpression.CONCAT, chunk_hll,
+                                                    output_field=HllField())
+            })
+    finally:
+        # Connections are thread local. Connection opened by worker thread should not be left open
+        if close_connection:
+            connections[target.db].close()
+
+
+def hll_backfill(source, key_field, value_field, target, target_field, target_key_field='pk', db_type='any',
+                 hash_seed=None, chunk_size=100000, workers=1, throttle=0, checkpoint_file=None):
+    # type: (QuerySet, str, str, QuerySet, str, str, str, Optional[int], int, int, float, Optional[str]) -> int
+    """
+    Adds values of source column to HllField of target rows, grouping them by key.
+    Hlls are built with hll_add_agg(hll_hash_<db_type>(value_field)) in database, values are not loaded to python.
+    Target rows should exist. Source and target should be in the same database.
+    :param source: QuerySet of source rows. Model should have integer primary key.
+    :param key_field: Source field, referencing target row
+    :param value_field: Source field, containing values to add to hll
+    :param target: QuerySet of target rows
+    :param target_field: Target HllField name
+    :param target_key_field: Target field, key_field references
+    :param db_type: Hash function type. See AddAgg
+    :param hash_seed: Optional hash seed
+    :param chunk_size: Size of source primary key range, processed with single query
+    :param workers: Number of threads, processing chunks concurrently
+    :param throttle: Seconds to sleep after every chunk in every worker in order to reduce database load
+    :param checkpoint_file: Path to file, containing progress. If it exists, backfill is resumed from it.
+    :return: Number of chunks processed
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive')
+
+    if source.db != target.db:
+        raise ValueError('source and target must be in the same database')
+
+    ranges = _get_ranges(source, chunk_size, checkpoint_file)
+
+    def process(chunk_range, close_connection=False):
+        _process_chunk(source, key_field, value_field, target, target_field, target_key_field, db_type, hash_seed,
+                       chunk_range, close_connection)
+        if throttle:
+            time.sleep(throttle)
+
+    if workers <= 1:
+        _wait_chunks(ranges, map(process, ranges), checkpoint_file)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            _wait_chunks(ranges, executor.map(lambda r: process(r, True), ranges), checkpoint_file)
+
+    return len(ranges)
@@ -0,0 +1,313 @@
+"""
+Benchmark of server side hll functions for different HllField parameters.
+Synthetic tables are generated for every (parameters, rows, row cardinality) combination.
+Then every query is timed, its buffer usage is taken from EXPLAIN (postgres only)
+and its result is compared with exact cardinality, which is known for generated data.
+"""
+import json
+import statistics
+import time
+import uuid
+from collections import OrderedDict
+from itertools import product
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, models, transaction
+from django.db.migrations.state import ModelState, ProjectState
+from django.db.models import QuerySet, Sum
+from django.db.models.sql import Query
+
+from .aggregate import Cardinality, CardinalitySum, UnionAgg, UnionAggCardinality
+from .auto import STRATEGIES, HllAuto
+from .fields import HllField
+from .profiler import ColumnSize
+from .sketch import HllSketch, hash_value
+from .transforms import CardinalityTransform, Log2MTransform, RegWidthTransform, SchemaVersionTransform, \
+    SParseOnTransform, TypeTransform
+
+__all__ = ['run_benchmark', 'run_value_benchmark']
+
+Params = Tuple[int, int, int, int]
+
+Report = List[Dict[str, Any]]
+
+DEFAULT_PARAMS = [
+    (11, 5, -1, 1),
+    (12, 5, -1, 1),
+    (14, 5, -1, 1),
+    (11, 4, -1, 1),
+    (11, 5, 0, 1),
+    (11, 5, -1, 0)
+]  # type: List[Params]
+
+DEFAULT_SIZES = (1000, 10000)
+
+DEFAULT_ROW_CARDINALITIES = (100, 10000)
+
+DEFAULT_VALUE_COUNTS = (1, 10, 100, 1000, 10000, 100000)
+
+BENCHMARK_APP_LABEL = 'django_pg_hll'
+
+# Benchmark tables are named <prefix>_<random suffix>, so concurrent benchmarks don't conflict
+BENCHMARK_TABLE_PREFIX = 'django_pg_hll_benchmark'
+
+
+def _row_values(queryset, expression):  # type: (QuerySet, Any) -> List[Any]
+    return list(queryset.annotate(_hll_value=expression).values_list('_hll_value', flat=True))
+
+
+def _union_cardinality(data):  # type: (Optional[bytes]) -> Optional[float]
+    return HllSketch.from_bytes(data).cardinality() if data is not None else None
+
+
+# Query name: (function to run query, exact result key, function to get cardinality estimation from query result)
+# Exact result key is one of: row (cardinality of every row), union (cardinality of all rows union),
+# sum (sum of rows cardinalities) or None, if query doesn't estimate cardinality
+BENCHMARK_QUERIES = OrderedDict([
+    ('Cardinality', (lambda qs, field: _row_values(qs, Cardinality(field)), 'row', None)),
+    ('UnionAgg', (lambda qs, field: qs.aggregate(_hll=UnionAgg(field))['_hll'], 'union', _union_cardinality)),
+    ('UnionAggCardinality', (lambda qs, field: qs.aggregate(_hll=UnionAggCardinality(field))['_hll'], 'union', None)),
+    ('CardinalitySum', (lambda qs, field: qs.aggregate(_hll=CardinalitySum(field))['_hll'], 'sum', None)),
+    ('cardinality', (lambda qs, field: _row_values(qs, CardinalityTransform(field)), 'row', None)),
+    ('cardinality__gt', (lambda qs, field: qs.filter(**{'%s__cardinality__gt' % field: 0}).count(), None, None)),
+    ('schema_version', (lambda qs, field: _row_values(qs, SchemaVersionTransform(field)), None, None)),
+    ('type', (lambda qs, field: _row_values(qs, TypeTransform(field)), None, None)),
+    ('regwidth', (lambda qs, field: _row_values(qs, RegWidthTransform(field)), None, None)),
+    ('log2m', (lambda qs, field: _row_values(qs, Log2MTransform(field)), None, None)),
+    ('sparseon', (lambda qs, field: _row_values(qs, SParseOnTransform(field)), None, None))
+])  # type: Dict[str, Tuple[Callable[[QuerySet, str], Any], Optional[str], Optional[Callable[[Any], float]]]]
+
+
+def _relative_error(estimate, exact):  # type: (Any, Any) -> Optional[float]
+    if isinstance(estimate, list):
+        errors = [_relative_error(value, exact) for value in estimate]
+        return statistics.mean(errors) if errors else None
+
+    if estimate is None or not exact:
+        return None
+
+    return abs(float(estimate) - exact) / exact
+
+
+def _get_model(params):  # type: (Params) -> Any
+    # Model is created in separate apps registry, so it doesn't conflict with project models
+    state = ProjectState()
+    state.add_model(ModelState(BENCHMARK_APP_LABEL, 'HllBenchmarkModel', [
+        ('id', models.AutoField(primary_key=True)),
+        ('hll', HllField(**dict(zip(HllField.HLL_ARGS, params))))
+    ], options={'db_table': '%s_%s' % (BENCHMARK_TABLE_PREFIX, uuid.uuid4().hex[:12])}))
+    return state.apps.get_model(BENCHMARK_APP_LABEL, 'HllBenchmarkModel')
+
+
+def _fill_table(model, using, params, rows, row_cardinality, hashes, batch_size=1000):
+    # type: (Any, str, Params, int, int, List[int], int) -> None
+    # Row i contains row_cardinality consecutive values (modulo len(hashes)), following values of row i - 1.
+    # So there are only len(hashes) / row_cardinality different rows and they are serialized once.
+    sketches = {}  # type: Dict[int, bytes]
+    for start in range(0, len(hashes), row_cardinality):
+        sketch = HllSketch(*params)
+        for hashval in hashes[start:start + row_cardinality]:
+            sketch.add_hash(hashval)
+        sketches[start] = sketch.to_bytes()
+
+    for batch_start in range(0, rows, batch_size):
+        model.objects.using(using).bulk_create([
+            model(hll=sketches[(i * row_cardinality) % len(hashes)])
+            for i in range(batch_start, min(rows, batch_start + batch_size))
+        ])
+
+
+def _get_buffers(connection, sql):  # type: (Any, str) -> Tuple[Optional[int], Optional[int]]
+    if connection.vendor != 'postgresql':
+        return None, None
+
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) %s' % sql)
+        plan = cursor.fetchone()[0]
+
+    # Buffers of top plan node include buffers of all child nodes
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']
+    return plan.get('Shared Hit Blocks', 0), plan.get('Shared Read Blocks', 0)
+
+
+def _get_storage(queryset):  # type: (QuerySet) -> Tuple[Optional[int], int]
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    table_bytes = None
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE %s" % table)
+            cursor.execute("SELECT pg_total_relation_size(%s::regclass)", [table])
+            table_bytes = cursor.fetchone()[0]
+
+    column_bytes = queryset.annotate(_hll_size=ColumnSize('hll')).aggregate(_sum=Sum('_hll_size'))['_sum']
+    return table_bytes, column_bytes or 0
+
+
+def _run_query(queryset, name, exact, repeat):  # type: (QuerySet, str, Dict[str, float], int) -> Dict[str, Any]
+    run, exact_key, get_estimate = BENCHMARK_QUERIES[name]
+    connection = connections[queryset.db]
+
+    executed = []  # type: List[str]
+
+    def _capture(execute, sql, params, many, context):
+        # SQL with params, as it is sent to database, is required for EXPLAIN
+        result = execute(sql, params, many, context)
+        executed.append(connection.ops.last_executed_query(context['cursor'], sql, params))
+        return result
+
+    timings, result = [], None
+    for _ in range(repeat):
+        with connection.execute_wrapper(_capture):
+            started = time.perf_counter()
+            result = run(queryset, 'hll')
+            timings.append(time.perf_counter() - started)
+
+    shared_hit, shared_read = _get_buffers(connection, executed[-1])
+    error = None
+    if exact_key is not None:
+        error = _relative_error(get_estimate(result) if get_estimate else result, exact[exact_key])
+
+    return {
+        'query': name,
+        'latency': min(timings),
+        'latency_median': statistics.median(timings),
+        'shared_hit': shared_hit,
+        'shared_read': shared_read,
+        'error': error
+    }
+
+
+def run_benchmark(params_list=None, sizes=DEFAULT_SIZES, row_cardinalities=DEFAULT_ROW_CARDINALITIES,
+                  distinct_values=100000, queries=None, repeat=3, using=DEFAULT_DB_ALIAS):
+    # type: (Optional[Iterable[Params]], Iterable[int], Iterable[int], int, Optional[Iterable[str]], int, str) -> Report
+    """
+    Generates synthetic table for every combination of parameters, rows count and row cardinality
+    and benchmarks server side hll functions on it. Table is dropped after benchmark.
+    :param params_list: Iterable of (log2m, regwidth, expthresh, sparseon) tuples. Defaults to DEFAULT_PARAMS.
+    :param sizes: Iterable of table rows counts
+    :param row_cardinalities: Iterable of numbers of distinct values in every row.
+        Each of them should be a divisor of distinct_values.
+    :param distinct_values: Number of distinct values in the whole table (if there are enough rows)
+    :param queries: Names of queries to run (see BENCHMARK_QUERIES). Defaults to all queries.
+    :param repeat: Number of times every query is run
+    :param using: Database alias to generate tables in
+    :return: A list of dictionaries, one for every table:
+        params, rows, row_cardinality,
+        table_bytes (total size of table with indexes and TOAST, postgres only),
+        column_bytes (total size of stored hll values),
+        queries: a list of dictionaries:
+            query (name), latency (minimal, seconds), latency_median (seconds),
+            shared_hit and shared_read (buffers, read by query, postgres only),
+            error (mean relative error of cardinality estimation, if query estimates it)
+    """
+    if repeat <= 0:
+        raise ValueError('repeat must be positive')
+
+    queries = list(queries or BENCHMARK_QUERIES.keys())
+    unknown = set(queries) - set(BENCHMARK_QUERIES.keys())
+    if unknown:
+        raise ValueError('Unknown queries: %s' % ', '.join(sorted(unknown)))
+
+    row_cardinalities = list(row_cardinalities)
+    for row_cardinality in row_cardinalities:
+        if row_cardinality <= 0 or distinct_values % row_cardinality:
+            raise ValueError('row_cardinalities should be positive divisors of distinct_values')
+
+    # Hashing is the slowest part of data generation, so hashes are reused by all tables
+    hashes = [hash_value(value, db_type='bigint') for value in range(distinct_values)]
+
+    results = []
+    for params, rows, row_cardinality in product(params_list or DEFAULT_PARAMS, sizes, row_cardinalities):
+        params = tuple(params)
+        model = _get_model(params)
+        connection = connections[using]
+
+        with connection.schema_editor() as editor:
+            editor.create_model(model)
+
+        try:
+            _fill_table(model, using, params, rows, row_cardinality, hashes)
+            queryset = model.objects.using(using).all()
+            table_bytes, column_bytes = _get_storage(queryset)
+
+            exact = {
+                'row': row_cardinality,
+                'union': min(distinct_values, rows * row_cardinality),
+                'sum': rows * row_cardinality
+            }
+
+            results.append({
+                'params': params,
+                'rows': rows,
+                'row_cardinality': row_cardinality,
+                'table_bytes': table_bytes,
+                'column_bytes': column_bytes,
+                'queries': [_run_query(queryset, name, exact, repeat) for name in queries]
+            })
+        finally:
+            with connection.schema_editor() as editor:
+                editor.delete_model(model)
+
+    return results
+
+
+def _run_value_query(using, expression):  # type: (str, Any) -> float
+    query = Query(None)
+    sql, params = query.get_compiler(using=using).compile(expression.resolve_expression(query))
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT hll_cardinality(%s)' % sql, params)
+        return cursor.fetchone()[0]
+
+
+def run_value_benchmark(sizes=DEFAULT_VALUE_COUNTS, strategies=STRATEGIES, params=(11, 5, -1, 1), repeat=3,
+                        using=DEFAULT_DB_ALIAS):
+    # type: (Iterable[int], Iterable[str], Params, int, str) -> Report
+    """
+    Benchmarks HllAuto strategies of sending values to database. Every run includes building expression
+    (hashing values for local strategy), sending it to database and computing hll of values.
+    Pass the report to auto.get_auto_thresholds() in order to get HllAuto thresholds for the database.
+    :param sizes: Iterable of numbers of values
+    :param strategies: Strategies to benchmark. Defaults to all strategies.
+    :param params: (log2m, regwidth, expthresh, sparseon) of hll
+    :param repeat: Number of times every strategy is run
+    :param using: Database alias to use
+    :return: A list of dictionaries: size, strategy, latency (minimal, seconds), latency_median (seconds)
+        and error (database error message, if strategy failed, for instance, with stack depth limit).
+        Latencies of failed strategies are None.
+    """
+    if repeat <= 0:
+        raise ValueError('repeat must be positive')
+
+    strategies = list(strategies)
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        raise ValueError('Unknown strategies: %s' % ', '.join(sorted(unknown)))
+
+    results = []
+    for size in sizes:
+        # Values of the same (integer) type, so bulk strategy passes a single array
+        values = list(range(10 ** 9, 10 ** 9 + size))
+
+        for strategy in strategies:
+            timings, error = [], None
+            for _ in range(repeat):
+                try:
+                    # Savepoint keeps transaction usable, if query fails
+                    with transaction.atomic(using=using):
+                        started = time.perf_counter()
+                        _run_value_query(using, HllAuto(values, params=params, strategy=strategy))
+                        timings.append(time.perf_counter() - started)
+                except DatabaseError as ex:
+                    error = str(ex).strip()
+                    break
+
+            results.append({
+                'size': size,
+                'strategy': strategy,
+                'latency': min(timings) if error is None else None,
+                'latency_median': statistics.median(timings) if error is None else None,
+                'error': error
+            })
+
+    return results
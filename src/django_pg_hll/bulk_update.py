@@ -1,12 +1,16 @@
 """
 django-pg-bulk-update support.
+django-pg-bulk-update builds VALUES table of all rows itself and asks set function to format every row value
+separately, so values of all rows can't be merged with a single grouped unnest() query through set function.
+Every iterable value becomes a separate hll_add_agg(unnest(...)) subquery (see HllBulkSet).
+Pass HllSketch values, built locally, to send a single serialized hll per row instead.
 """
 
 from django.db.models.sql import Query
 
 from .compatibility import django_pg_bulk_update_available
 from .fields import HllField
-from .values import HllEmpty, HllValue, HllCombinedExpression
+from .values import HllEmpty, parse_hll_value
 
 # As django-pg-bulk-update library is not required, import only if it exists
 if django_pg_bulk_update_available():
@@ -24,6 +28,24 @@ class HllConcatFunction(ConcatSetFunction):
     names = {'hll_concat'}
     supported_field_classes = {'HllField'}
 
+    def __init__(self, stable_sql=False):  # type: (bool) -> None
+        """
+        :param stable_sql: Passed to HllBulkSet, created for raw iterable values.
+            If set, all rows get the same SQL, so it doesn't depend on data passed.
+        """
+        super(HllConcatFunction, self).__init__()
+        self.stable_sql = stable_sql
+
+        # Compiler creation is expensive, comparing to value formatting. Cache it for every model and database
+        self._compilers = {}
+
+    def _get_compiler(self, field, connection):
+        key = (field.model, connection.alias)
+        if key not in self._compilers:
+            self._compilers[key] = Query(field.model).get_compiler(connection=connection)
+
+        return self._compilers[key]
+
     def _parse_null_default(self, field, connection, **kwargs):
         kwargs['null_default'] = kwargs.get('null_default', HllEmpty())
         return super(HllConcatFunction, self)._parse_null_default(field, connection, **kwargs)
@@ -33,11 +55,8 @@ class HllConcatFunction(ConcatSetFunction):
             return super(HllConcatFunction, self).format_field_value(field, val, connection, cast_type=cast_type,
                                                                      **kwargs)
 
-        if not isinstance(val, (HllValue, HllCombinedExpression)):
-            raise ValueError('val should be HllValue instance')
-
-        compiler = Query(field.model).get_compiler(connection=connection)
-        sql, params = val.as_sql(compiler, connection)
+        val = parse_hll_value(val, db_type=field.db_type(connection), stable_sql=self.stable_sql)
+        sql, params = val.as_sql(self._get_compiler(field, connection), connection)
 
         if cast_type:
             sql = 'CAST(%s AS %s)' % (sql, get_field_db_type(field, connection))
@@ -0,0 +1,201 @@
+"""
+Process local cache of decoded HllField values for hot rows, which are read much more often than updated.
+Every read validates cached sketches with a query, fetching row versions only (postgres xmin and ctid columns),
+so hll data is transferred and decoded again only for rows, changed since they were cached.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.db import connections
+from django.db.models import F, QuerySet, TextField
+from django.db.models.expressions import RawSQL
+
+from .sketch import HllSketch
+
+__all__ = ['HllSketchCache']
+
+CacheKey = Tuple[str, str, str, Hashable]
+
+
+class _CacheEntry:
+    __slots__ = ('version', 'sketch', 'size', 'cardinality')
+
+    def __init__(self, version, sketch):  # type: (Any, HllSketch) -> None
+        self.version = version
+        self.sketch = sketch
+        self.size = sys.getsizeof(sketch)
+        self.cardinality = None  # type: Optional[float]
+
+
+class HllSketchCache:
+    """
+    LRU cache of decoded hll values, keyed by (database, table, field, primary key) and limited by memory size.
+    The cache is opt-in: create an instance (usually one per process) and read hot rows through it.
+    Instances are thread safe.
+
+    cache = HllSketchCache(max_bytes=32 * 1024 * 1024)
+    cache.cardinality(MyModel.objects.all(), pk, 'hll_field')
+    cache.union(MyModel.objects.filter(date__gte='2024-01-01'), [pk1, pk2, pk3], 'hll_field').cardinality()
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, version_field=None):  # type: (int, Optional[str]) -> None
+        """
+        :param max_bytes: Maximum approximate memory size of cached sketches.
+            Least recently used sketches are evicted, when it is exceeded.
+        :param version_field: Name of model field, which value changes with every hll update
+            (update counter, modification time, etc.). None means postgres xmin and ctid system columns,
+            which change on every row update. Required for other databases.
+        """
+        if max_bytes <= 0:
+            raise ValueError('max_bytes must be positive')
+
+        self.max_bytes = max_bytes
+        self.version_field = version_field
+
+        self._entries = OrderedDict()  # type: OrderedDict[CacheKey, _CacheEntry]
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):  # type: () -> int
+        return len(self._entries)
+
+    @property
+    def size(self):  # type: () -> int
+        """
+        Approximate memory size of cached sketches in bytes
+        """
+        return self._size
+
+    def clear(self):  # type: () -> None
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _get_version_expression(self, queryset):  # type: (QuerySet) -> Any
+        if self.version_field is not None:
+            return F(self.version_field)
+
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            raise ValueError('Database %s has no row versions, version_field should be set' % connection.vendor)
+
+        # xmin doesn't change, if row is updated again by the same transaction, but ctid (tuple location) does
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        return RawSQL("%s.xmin::text || ':' || %s.ctid::text" % (table, table), [], output_field=TextField())
+
+    def _get_key(self, queryset, field_name, pk):  # type: (QuerySet, str, Hashable) -> CacheKey
+        return queryset.db, queryset.model._meta.db_table, field_name, pk
+
+    def _set(self, key, entry):  # type: (CacheKey, _CacheEntry) -> None
+        self._discard(key)
+
+        # Sketch, larger than the whole cache, would evict everything and be evicted itself
+        if entry.size > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self._size += entry.size
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def _discard(self, key):  # type: (CacheKey) -> None
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _get_entries(self, queryset, pks, field_name):
+        # type: (QuerySet, Iterable[Hashable], str) -> Dict[Hashable, _CacheEntry]
+        # Primary keys are converted to the type, database returns them in ('1' to 1 for integer primary key)
+        pk_field = queryset.model._meta.pk
+        pks = list(dict.fromkeys(pk_field.to_python(pk) for pk in pks))
+        if not pks:
+            return {}
+
+        queryset = queryset.order_by().annotate(_hll_version=self._get_version_expression(queryset))
+        versions = dict(queryset.filter(pk__in=pks).values_list('pk', '_hll_version'))
+
+        result = {}  # type: Dict[Hashable, _CacheEntry]
+        stale = []  # type: List[Hashable]
+        with self._lock:
+            for pk in pks:
+                key = self._get_key(queryset, field_name, pk)
+                if pk not in versions:
+                    # Row is deleted or doesn't match queryset filters
+                    self._discard(key)
+                    continue
+
+                entry = self._entries.get(key)
+                if entry is not None and entry.version == versions[pk]:
+                    self._entries.move_to_end(key)
+                    result[pk] = entry
+                else:
+                    stale.append(pk)
+
+        if not stale:
+            return result
+
+        # Version is fetched again along with data, as row could be updated after the first query
+        rows = queryset.filter(pk__in=stale).values_list('pk', '_hll_version', field_name)
+        entries = {pk: _CacheEntry(version, HllSketch.from_bytes(data)) for pk, version, data in rows
+                   if data is not None}
+
+        with self._lock:
+            for pk in stale:
+                key = self._get_key(queryset, field_name, pk)
+                if pk in entries:
+                    self._set(key, entries[pk])
+                    result[pk] = entries[pk]
+                else:
+                    self._discard(key)
+
+        return result
+
+    def get_many(self, queryset, pks, field_name):
+        # type: (QuerySet, Iterable[Hashable], str) -> Dict[Hashable, HllSketch]
+        """
+        Returns decoded hll values of multiple rows
+        :param queryset: QuerySet to read rows from. Rows, which don't match it, are treated as missing.
+        :param pks: Primary keys of rows to read
+        :param field_name: HllField name
+        :return: Dictionary of primary key (converted by primary key field to_python()): HllSketch copy.
+            Missing rows and NULL values are not included.
+        """
+        return {pk: entry.sketch.copy() for pk, entry in self._get_entries(queryset, pks, field_name).items()}
+
+    def get(self, queryset, pk, field_name):  # type: (QuerySet, Hashable, str) -> Optional[HllSketch]
+        """
+        Returns decoded hll value of a row. See get_many() for parameters.
+        :return: HllSketch copy or None, if row doesn't exist or value is NULL
+        """
+        return next(iter(self.get_many(queryset, [pk], field_name).values()), None)
+
+    def cardinality(self, queryset, pk, field_name):  # type: (QuerySet, Hashable, str) -> Optional[float]
+        """
+        Returns cardinality of a row hll value. It is also cached, until row is changed.
+        See get_many() for parameters.
+        :return: Cardinality estimation or None, if row doesn't exist or value is NULL
+        """
+        entry = next(iter(self._get_entries(queryset, [pk], field_name).values()), None)
+        if entry is None:
+            return None
+
+        if entry.cardinality is None:
+            entry.cardinality = entry.sketch.cardinality()
+
+        return entry.cardinality
+
+    def union(self, queryset, pks, field_name):  # type: (QuerySet, Iterable[Hashable], str) -> Optional[HllSketch]
+        """
+        Unites hll values of multiple rows locally. See get_many() for parameters.
+        :return: New HllSketch instance or None, if no row with not NULL value is found
+        """
+        result = None
+        for entry in self._get_entries(queryset, pks, field_name).values():
+            if result is None:
+                result = entry.sketch.copy()
+            else:
+                result.union_update(entry.sketch)
+
+        return result
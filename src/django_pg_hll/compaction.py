@@ -0,0 +1,96 @@
+"""
+Precision reduction of hll data. Registers of hlls with greater log2m are folded down (see HllSketch.convert()),
+so hlls with different parameters can be united and cold rows can be downsampled to save storage and I/O.
+postgresql-hll has no function for that, so hlls are converted locally.
+"""
+from typing import Iterable, Optional, Union
+
+from django.db import transaction
+from django.db.models import Case, Q, QuerySet, When
+
+from .sketch import HllSketch
+from .values import HllFromHex
+
+__all__ = ['hll_compact', 'hll_union_mixed']
+
+HllData = Union[HllSketch, bytes, bytearray, memoryview, str]
+
+
+def hll_union_mixed(values):  # type: (Iterable[Optional[HllData]]) -> Optional[HllSketch]
+    """
+    Unites hlls with different parameters. Every hll is converted to the lowest log2m and regwidth among values,
+    expthresh and sparseon are taken from the first hll with the lowest log2m.
+    :param values: HllSketch instances or serialized hlls (HllField values). None values are skipped.
+    :return: New HllSketch instance or None, if there are no values
+    """
+    sketches = [value if isinstance(value, HllSketch) else HllSketch.from_bytes(value)
+                for value in values if value is not None]
+    if not sketches:
+        return None
+
+    base = min(sketches, key=lambda sketch: sketch.log2m)
+    result = HllSketch(base.log2m, min(sketch.regwidth for sketch in sketches), base.expthresh, base.sparseon)
+    for sketch in sketches:
+        result.union_update(sketch, fold_registers=True)
+
+    return result
+
+
+def hll_compact(queryset, field_name, log2m=None, regwidth=None, chunk_size=1000):
+    # type: (QuerySet, str, Optional[int], Optional[int], int) -> int
+    """
+    Downsamples HllField values of queryset rows to lower log2m and (or) regwidth.
+    Only rows with greater parameters are read. Every chunk is converted in a transaction
+    with rows locked by SELECT ... FOR UPDATE, so concurrent updates are not lost.
+    Compacted values can't be united with full precision values by hll_union_agg() in database.
+    Unite them locally with hll_union_mixed() or hll_fold(..., fold_registers=True).
+    :param queryset: QuerySet of rows to compact (cold data, for instance)
+    :param field_name: HllField name. Field should not declare hll parameters (hll(log2m, ...) column type).
+    :param log2m: Target log2m. None keeps log2m as is.
+    :param regwidth: Target regwidth. None keeps regwidth as is.
+    :param chunk_size: Number of rows, converted in a single transaction and updated with a single query
+    :return: Number of rows updated
+    """
+    if log2m is None and regwidth is None:
+        raise ValueError('log2m or regwidth should be given')
+
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive')
+
+    conditions = Q()
+    if log2m is not None:
+        conditions |= Q(**{'%s__log2m__gt' % field_name: log2m})
+    if regwidth is not None:
+        conditions |= Q(**{'%s__regwidth__gt' % field_name: regwidth})
+
+    field = queryset.model._meta.get_field(field_name)
+    if field.hll_arg_params:
+        # hll(log2m, regwidth, ...) column type only accepts values with declared parameters
+        raise ValueError("Field '%s' declares hll parameters, its values can't be downsampled. "
+                         "Change field parameters with AlterHllField instead" % field_name)
+
+    queryset = queryset.filter(conditions).order_by('pk')
+    using = queryset.db
+    last_pk, updated = None, 0
+
+    while True:
+        with transaction.atomic(using=using):
+            # Rows are paged by primary key, so primary keys of the whole queryset are not loaded to memory
+            chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(chunk_queryset.select_for_update().values_list('pk', field_name)[:chunk_size])
+            if not rows:
+                break
+
+            whens = []
+            for pk, data in rows:
+                sketch = HllSketch.from_bytes(data)
+                sketch = sketch.convert(log2m=None if log2m is None else min(sketch.log2m, log2m),
+                                        regwidth=None if regwidth is None else min(sketch.regwidth, regwidth))
+                whens.append(When(pk=pk, then=HllFromHex(sketch)))
+
+            updated += queryset.model._base_manager.using(using).filter(pk__in=[pk for pk, _ in rows]). \
+                update(**{field_name: Case(*whens, output_field=field)})
+
+        last_pk = rows[-1][0]
+
+    return updated
@@ -13,6 +13,18 @@ def django_pg_bulk_update_available():  # type: () -> bool
         return False
 
 
+def numpy_available():  # type: () -> bool
+    """
+    Tests if numpy library is installed
+    :return: Boolean
+    """
+    try:
+        import numpy  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
 try:
     # This approach applies to python 3.10+
     from collections.abc import Iterable  # noqa F401
@@ -0,0 +1,141 @@
+"""
+Named hll counters: "add values to counter X, count union of counters X, Y, Z".
+Counters are upserted with native INSERT ... ON CONFLICT DO UPDATE, so no third party library is required.
+"""
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple, Type
+
+from django.apps import apps
+from django.db import connections, router
+from django.db.models import Model
+from django.db.models.sql import Query
+
+from .aggregate import UnionAggCardinality
+from .values import HllCombinedExpression, parse_hll_value
+
+__all__ = ['HllCounterStore']
+
+
+class HllCounterStore:
+    """
+    Stores named hll counters in a model with unique key field and HllField.
+    By default, django_pg_hll.models.HllCounter is used (django_pg_hll should be in INSTALLED_APPS).
+    Custom counter models can inherit django_pg_hll.models.AbstractHllCounter.
+
+    store = HllCounterStore()
+    store.add('visitors:2024-01-01', [1, 2, 3])
+    store.add_many({'visitors:2024-01-01': [4], 'visitors:2024-01-02': {1, 5}})
+    store.count('visitors:2024-01-01', 'visitors:2024-01-02')  # 5.0
+    store.merge(['visitors:2024-01-01', 'visitors:2024-01-02'], into='visitors:2024-01')
+    """
+    def __init__(self, model=None, key_field_name='key', field_name='hll'):
+        # type: (Optional[Type[Model]], str, str) -> None
+        """
+        :param model: Counter model. Defaults to django_pg_hll.models.HllCounter
+        :param key_field_name: Name of model field with unique constraint, containing counter key
+        :param field_name: HllField name in model
+        """
+        self.model = model or apps.get_model('django_pg_hll', 'HllCounter')
+        self.key_field_name = key_field_name
+        self.field_name = field_name
+
+    def _get_columns(self, connection):  # type: (Any) -> Tuple[str, str, str]
+        qn = connection.ops.quote_name
+        return (qn(self.model._meta.db_table), qn(self.model._meta.get_field(self.key_field_name).column),
+                qn(self.model._meta.get_field(self.field_name).column))
+
+    def _get_db_key(self, key, connection):  # type: (Hashable, Any) -> Any
+        # Keys are normalized as key field saves them, so 1 and '1' are the same counter of integer key field
+        key_field = self.model._meta.get_field(self.key_field_name)
+        return key_field.get_db_prep_save(key_field.to_python(key), connection)
+
+    def _upsert(self, connection, select_sql, params):  # type: (Any, str, List[Any]) -> None
+        table, key_column, hll_column = self._get_columns(connection)
+        sql = 'INSERT INTO %s (%s, %s) %s ON CONFLICT (%s) DO UPDATE SET %s = hll_union(%s.%s, EXCLUDED.%s)' \
+              % (table, key_column, hll_column, select_sql, key_column, hll_column, table, hll_column, hll_column)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def add(self, key, value, using=None):  # type: (Hashable, Any, Optional[str]) -> None
+        """
+        Adds values to counter. Counter is created, if it doesn't exist.
+        :param key: Counter key
+        :param value: Any value, which can be saved to HllField or iterable of values
+        :param using: Database alias to use
+        :return: None
+        """
+        self.add_many({key: value}, using=using)
+
+    def add_many(self, data, batch_size=1000, using=None):  # type: (Dict[Hashable, Any], int, Optional[str]) -> int
+        """
+        Adds values to multiple counters. Every batch of counters is upserted with a single query.
+        Counters are upserted in key order, so concurrent calls can't deadlock.
+        :param data: Dictionary of counter key: value. See add() for value description.
+            Values of keys, saved as the same counter key (1 and '1' for integer key field), are united.
+        :param batch_size: Number of counters, upserted with a single query
+        :param using: Database alias to use
+        :return: Number of counters updated
+        """
+        if batch_size <= 0:
+            raise ValueError('batch_size must be positive')
+
+        using = using or router.db_for_write(self.model)
+        connection = connections[using]
+        query = Query(self.model)
+        compiler = query.get_compiler(using=using)
+        db_type = self.model._meta.get_field(self.field_name).db_type(connection)
+
+        # Keys, which become the same counter, are united, as INSERT ... ON CONFLICT DO UPDATE can't update
+        # the same row twice
+        values = {}  # type: Dict[Any, Any]
+        for key, value in data.items():
+            db_key = self._get_db_key(key, connection)
+            expression = parse_hll_value(value, db_type=db_type)
+            if db_key in values:
+                expression = HllCombinedExpression(values[db_key], HllCombinedExpression.CONCAT, expression)
+            values[db_key] = expression
+
+        keys = sorted(values.keys())
+        for start in range(0, len(keys), batch_size):
+            rows_sql, params = [], []  # type: List[str], List[Any]
+            for key in keys[start:start + batch_size]:
+                sql, value_params = compiler.compile(values[key].resolve_expression(query))
+                rows_sql.append('(%%s, %s)' % sql)
+                params.append(key)
+                params.extend(value_params)
+
+            self._upsert(connection, 'VALUES %s' % ', '.join(rows_sql), params)
+
+        return len(keys)
+
+    def count(self, *keys, **kwargs):  # type: (*Hashable, **Optional[str]) -> float
+        """
+        Counts cardinality of union of counters. Counters, which don't exist, are treated as empty.
+        :param keys: Counter keys
+        :param using: Database alias to use (keyword only)
+        :return: Cardinality estimation
+        """
+        using = kwargs.get('using') or router.db_for_read(self.model)
+        result = self.model._base_manager.using(using).filter(**{'%s__in' % self.key_field_name: keys}). \
+            aggregate(_hll_cardinality=UnionAggCardinality(self.field_name))['_hll_cardinality']
+        return result or 0.0
+
+    def merge(self, keys, into, using=None):  # type: (Iterable[Hashable], Hashable, Optional[str]) -> None
+        """
+        Unites counters into another counter with a single query. Source counters are not changed.
+        :param keys: Source counter keys. Counters, which don't exist, are ignored.
+        :param into: Target counter key. Counter is created, if it doesn't exist.
+        :param using: Database alias to use
+        :return: None
+        """
+        keys = list(keys)
+        if not keys:
+            return
+
+        connection = connections[using or router.db_for_write(self.model)]
+        table, key_column, hll_column = self._get_columns(connection)
+
+        # HAVING skips insert, if there are no source counters and hll_union_agg() returns NULL
+        select_sql = 'SELECT %%s, hll_union_agg(%s) FROM %s WHERE %s IN (%s) HAVING COUNT(*) > 0' \
+                     % (hll_column, table, key_column, ', '.join(['%s'] * len(keys)))
+        self._upsert(connection, select_sql, [self._get_db_key(key, connection) for key in [into] + keys])
@@ -0,0 +1,180 @@
+"""
+Local OLAP cube over hll cells. Finest grain cells are fetched from database once,
+roll-ups, slices and filters are computed in python by uniting decoded registers (see HllSketch).
+"""
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from django.db.models import QuerySet
+
+from .aggregate import UnionAgg
+from .sketch import HllSketch
+
+__all__ = ['HllCube']
+
+FilterKey = Tuple[Tuple[str, FrozenSet[Any]], ...]
+
+
+class HllCube:
+    """
+    Fetches union of hll field, grouped by all dimensions, and answers cardinality queries
+    for any subset of dimensions locally:
+
+    cube = HllCube(Visit.objects.filter(date__gte='2024-01-01'), 'users', ['country', 'city', 'device'])
+    cube.cardinality()  # Total
+    cube.cardinality(country='US', device__in=['ios', 'android'])  # Slice
+    cube.rollup('country')  # {('US',): 100500, ('DE',): 2000}
+    """
+    def __init__(self, queryset, field_name, dimensions, cache_size=1024):
+        # type: (QuerySet, str, Iterable[str], int) -> None
+        """
+        :param queryset: QuerySet of rows to build cube from
+        :param field_name: HllField name
+        :param dimensions: Fields to group cells by
+        :param cache_size: Maximum number of intermediate unions to memoize
+        """
+        self.queryset = queryset
+        self.field_name = field_name
+        self.dimensions = tuple(dimensions)
+        self.cache_size = cache_size
+
+        if not self.dimensions:
+            raise ValueError('At least one dimension is required')
+
+        self._cells = None  # type: Optional[Dict[Tuple[Any, ...], HllSketch]]
+        self._cache = OrderedDict()  # type: OrderedDict[FilterKey, Optional[HllSketch]]
+
+    def _fetch(self, queryset):  # type: (QuerySet) -> Dict[Tuple[Any, ...], HllSketch]
+        rows = queryset.order_by().values(*self.dimensions).annotate(_hll_cell=UnionAgg(self.field_name)). \
+            values_list(*(self.dimensions + ('_hll_cell',)))
+
+        return {row[:-1]: HllSketch.from_bytes(row[-1]) for row in rows if row[-1] is not None}
+
+    @property
+    def cells(self):  # type: () -> Dict[Tuple[Any, ...], HllSketch]
+        """
+        Finest grain cells: dictionary of dimension values tuple: HllSketch. Loaded on first access.
+        """
+        if self._cells is None:
+            self.load()
+
+        return self._cells
+
+    def load(self):  # type: () -> None
+        """
+        (Re)loads all cells from database and clears cache
+        """
+        self._cells = self._fetch(self.queryset)
+        self._cache.clear()
+
+    def refresh(self, **filters):  # type: (**Any) -> None
+        """
+        Reloads cells matching filters from database. Other cells are kept as is.
+        :param filters: Dimension filters. See cardinality() for format. They are also passed to QuerySet.filter()
+        :return: None
+        """
+        filter_key = self._get_filter_key(filters)
+        cells = {key: sketch for key, sketch in self.cells.items() if not self._match(key, filter_key)}
+        cells.update(self._fetch(self.queryset.filter(**filters)))
+
+        self._cells = cells
+        self._cache.clear()
+
+    def _get_filter_key(self, filters):  # type: (Dict[str, Any]) -> FilterKey
+        """
+        Normalizes filters to hashable key. Every dimension gets a set of allowed values.
+        """
+        result = {}
+        for name, value in filters.items():
+            if name.endswith('__in'):
+                name, values = name[:-4], frozenset(value)
+            else:
+                values = frozenset((value,))
+
+            if name not in self.dimensions:
+                raise ValueError('Unknown dimension: %s' % name)
+
+            result[name] = result[name] & values if name in result else values
+
+        return tuple(sorted(result.items()))
+
+    def _match(self, cell_key, filter_key):  # type: (Tuple[Any, ...], FilterKey) -> bool
+        return all(cell_key[self.dimensions.index(name)] in values for name, values in filter_key)
+
+    def _cache_set(self, filter_key, sketch):  # type: (FilterKey, Optional[HllSketch]) -> None
+        self._cache[filter_key] = sketch
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _unite(self, sketches):  # type: (Iterable[HllSketch]) -> Optional[HllSketch]
+        result = None
+        for sketch in sketches:
+            if result is None:
+                result = sketch.copy()
+            else:
+                result.union_update(sketch)
+
+        return result
+
+    def _union(self, filter_key, cells=None):
+        # type: (FilterKey, Optional[List[HllSketch]]) -> Optional[HllSketch]
+        """
+        Returns cached union of cells matching filter_key. Returned sketch must not be modified.
+        :param cells: Cells matching filter_key, if they have already been found
+        """
+        if filter_key in self._cache:
+            self._cache.move_to_end(filter_key)
+            return self._cache[filter_key]
+
+        if cells is None:
+            cells = [sketch for key, sketch in self.cells.items() if self._match(key, filter_key)]
+
+        result = self._unite(cells)
+        self._cache_set(filter_key, result)
+        return result
+
+    def union(self, **filters):  # type: (**Any) -> Optional[HllSketch]
+        """
+        Unites cells matching filters
+        :param filters: See cardinality()
+        :return: HllSketch or None, if no cells match filters
+        """
+        result = self._union(self._get_filter_key(filters))
+        return result.copy() if result is not None else None
+
+    def cardinality(self, **filters):  # type: (**Any) -> float
+        """
+        Counts cardinality of union of cells matching filters
+        :param filters: Dimension filters. Can be dimension=value or dimension__in=iterable of values
+        :return: Cardinality. 0, if no cells match filters
+        """
+        result = self._union(self._get_filter_key(filters))
+        return result.cardinality() if result is not None else 0
+
+    def rollup(self, *dimensions, **filters):  # type: (*str, **Any) -> Dict[Tuple[Any, ...], float]
+        """
+        Counts cardinality of cells matching filters, grouped by given dimensions
+        :param dimensions: Dimensions to group by
+        :param filters: Dimension filters. See cardinality()
+        :return: Dictionary of dimension values tuple: cardinality
+        """
+        for name in dimensions:
+            if name not in self.dimensions:
+                raise ValueError('Unknown dimension: %s' % name)
+
+        filter_key = self._get_filter_key(filters)
+        indexes = [self.dimensions.index(name) for name in dimensions]
+
+        groups = defaultdict(list)
+        for key, sketch in self.cells.items():
+            if self._match(key, filter_key):
+                groups[tuple(key[i] for i in indexes)].append(sketch)
+
+        result = {}
+        for group_key, cells in groups.items():
+            # Every group is a slice of cube, so its union is cached for further calls
+            group_filter = dict(filter_key)
+            group_filter.update((name, frozenset((value,))) for name, value in zip(dimensions, group_key))
+            result[group_key] = self._union(tuple(sorted(group_filter.items())), cells=cells).cardinality()
+
+        return result
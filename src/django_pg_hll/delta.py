@@ -0,0 +1,175 @@
+"""
+Append-only ingestion of hll updates.
+Instead of updating hll row (which locks it and rewrites the whole hll), writers insert small delta rows
+into a side table. Deltas are folded into main rows by compact() job. Reads unite main row with pending deltas.
+"""
+from typing import Any, Dict, Iterable, Optional, Type
+
+from django.db import connections, transaction
+from django.db.models import F, Model, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from .aggregate import UnionAgg, UnionAggCardinality
+from .fields import HllField
+from .values import HllCombinedExpression, HllEmpty, parse_hll_value
+
+__all__ = ['HllDeltaStore']
+
+
+class HllDeltaStore:
+    """
+    Stores hll updates of model field as rows of delta model.
+    Delta model should have a foreign key to model and an HllField with the same parameters as model field has:
+
+    class CounterDelta(models.Model):
+        counter = models.ForeignKey(Counter, on_delete=models.CASCADE)
+        hll = HllField()
+
+    store = HllDeltaStore(Counter, 'hll', CounterDelta, 'counter', 'hll')
+    """
+    def __init__(self, model, field_name, delta_model, delta_key_field_name, delta_field_name):
+        # type: (Type[Model], str, Type[Model], str, str) -> None
+        """
+        :param model: Model, containing main rows
+        :param field_name: HllField name in model
+        :param delta_model: Model, containing deltas
+        :param delta_key_field_name: Name of delta model foreign key to model
+        :param delta_field_name: HllField name in delta model
+        """
+        self.model = model
+        self.field_name = field_name
+        self.delta_model = delta_model
+        self.delta_key_field_name = delta_key_field_name
+        self.delta_field_name = delta_field_name
+
+    @property
+    def _delta_key_attname(self):  # type: () -> str
+        return self.delta_model._meta.get_field(self.delta_key_field_name).attname
+
+    def _get_delta_field(self):  # type: () -> HllField
+        return self.delta_model._meta.get_field(self.delta_field_name)
+
+    def _make_delta(self, key, value, using):  # type: (Any, Any, str) -> Model
+        db_type = self._get_delta_field().db_type(connections[using])
+        return self.delta_model(**{
+            self._delta_key_attname: key,
+            self.delta_field_name: parse_hll_value(value, db_type=db_type)
+        })
+
+    def add(self, key, value, using=None):  # type: (Any, Any, Optional[str]) -> None
+        """
+        Inserts delta for the row with given primary key
+        :param key: Main row primary key
+        :param value: Any value, which can be saved to HllField or iterable of values
+        :param using: Database alias to use
+        :return: None
+        """
+        self.add_many({key: value}, using=using)
+
+    def add_many(self, data, using=None):  # type: (Dict[Any, Any], Optional[str]) -> None
+        """
+        Inserts deltas for multiple rows with a single query
+        :param data: Dictionary of main row primary key: value. See add() for value description
+        :param using: Database alias to use
+        :return: None
+        """
+        using = using or self.delta_model._default_manager.db
+        self.delta_model._default_manager.using(using).bulk_create([self._make_delta(key, value, using)
+                                                                    for key, value in data.items()])
+
+    def _main_hll(self):  # type: () -> Coalesce
+        """
+        Returns main row hll. NULL is replaced with empty hll, as uniting NULL with deltas gives NULL
+        """
+        field = self.model._meta.get_field(self.field_name)
+        return Coalesce(F(self.field_name), HllEmpty(*field.params), output_field=HllField())
+
+    def _pending_union(self, delta_queryset):  # type: (QuerySet) -> Subquery
+        """
+        Returns subquery, uniting deltas for the outer main row
+        """
+        return Subquery(
+            delta_queryset.filter(**{self.delta_key_field_name: OuterRef('pk')}).order_by().
+            values(self.delta_key_field_name).annotate(_union=UnionAgg(self.delta_field_name)).values('_union'),
+            output_field=HllField()
+        )
+
+    def annotate_with_deltas(self, queryset=None, alias='hll_with_deltas'):
+        # type: (Optional[QuerySet], str) -> QuerySet
+        """
+        Annotates main rows queryset with hll, united with all pending deltas
+        :param queryset: QuerySet of main model. Defaults to all objects
+        :param alias: Annotation name
+        :return: Annotated QuerySet
+        """
+        queryset = self.model._default_manager.all() if queryset is None else queryset
+        pending = self._pending_union(self.delta_model._default_manager.using(queryset.db))
+
+        # If there are no deltas, hll is united with itself, which gives the same hll
+        return queryset.annotate(**{
+            alias: HllCombinedExpression(self._main_hll(), HllCombinedExpression.CONCAT,
+                                         Coalesce(pending, F(self.field_name)), output_field=HllField())
+        })
+
+    def cardinality(self, *keys, using=None):  # type: (*Any, Optional[str]) -> float
+        """
+        Counts cardinality of union of main rows with given primary keys and their pending deltas
+        :param keys: Main row primary keys
+        :param using: Database alias to use
+        :return: Cardinality
+        """
+        queryset = self.annotate_with_deltas(self.model._default_manager.using(using).filter(pk__in=keys), alias='_hll')
+        return queryset.aggregate(card=UnionAggCardinality('_hll'))['card'] or 0
+
+    def compact(self, batch_size=10000, max_batches=None, using=None):
+        # type: (int, Optional[int], Optional[str]) -> int
+        """
+        Folds deltas into main rows and deletes them. Every batch is processed in a separate transaction.
+        Deltas are locked with SKIP LOCKED and main rows are locked in primary key order,
+        so multiple compact() jobs can run concurrently.
+        Main rows with NULL hll get union of their deltas.
+        :param batch_size: Maximum number of deltas, processed in a single transaction
+        :param max_batches: If given, stops after this number of batches. Otherwise, processes all deltas
+        :param using: Database alias to use
+        :return: Number of deltas compacted
+        """
+        using = using or self.delta_model._default_manager.db
+        delta_objects = self.delta_model._default_manager.using(using)
+
+        total, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            with transaction.atomic(using=using):
+                batch = list(delta_objects.select_for_update(skip_locked=True).order_by('pk').
+                             values_list('pk', flat=True)[:batch_size])
+                if not batch:
+                    break
+
+                deltas = delta_objects.filter(pk__in=batch)
+
+                # Main rows are locked in primary key order, so concurrent jobs can't deadlock
+                main_objects = self.model._default_manager.using(using)
+                pks = list(main_objects.filter(pk__in=deltas.values(self.delta_key_field_name)).order_by('pk').
+                           select_for_update().values_list('pk', flat=True))
+                main_objects.filter(pk__in=pks).update(**{
+                    self.field_name: HllCombinedExpression(self._main_hll(), HllCombinedExpression.CONCAT,
+                                                           self._pending_union(deltas), output_field=HllField())
+                })
+                deltas.delete()
+
+            total += len(batch)
+            batches += 1
+
+        return total
+
+    def pending_count(self, keys=None, using=None):  # type: (Optional[Iterable[Any]], Optional[str]) -> int
+        """
+        Counts deltas, which have not been compacted yet
+        :param keys: If given, counts only deltas of these main rows
+        :param using: Database alias to use
+        :return: Number of deltas
+        """
+        queryset = self.delta_model._default_manager.using(using or self.delta_model._default_manager.db)
+        if keys is not None:
+            queryset = queryset.filter(**{'%s__in' % self.delta_key_field_name: list(keys)})
+
+        return queryset.count()
@@ -2,10 +2,13 @@
 This file contains a field to use in django models
 """
 import re
+from typing import Tuple
+
 from django.contrib.postgres.fields import ArrayField
 from django.db.models import BinaryField
 
 from .compatibility import string_types
+from .sketch import HllSketch
 from .values import HllEmpty, HllFromHex
 
 __all__ = ['HllField']
@@ -37,6 +40,13 @@ class HllField(BinaryField):
 
         super(HllField, self).__init__(*args, **kwargs)
 
+    @property
+    def params(self):  # type: () -> Tuple[int, int, int, int]
+        """
+        (log2m, regwidth, expthresh, sparseon) of the field. Parameters, which are not set, get hll_empty() defaults.
+        """
+        return tuple(self.hll_arg_params + list(HllSketch().params)[len(self.hll_arg_params):])
+
     def deconstruct(self):
         name, path, args, kwargs = super(HllField, self).deconstruct()
 
@@ -46,10 +56,14 @@ class HllField(BinaryField):
         return name, path, args, kwargs
 
     def db_type(self, connection):
+        # SQLite type names can't have more than 2 arguments. Hll functions are emulated on binary data there
+        if connection.vendor == 'sqlite':
+            return 'blob'
+
         return ('hll(%s)' % ", ".join(str(val) for val in self.hll_arg_params)) if self.hll_arg_params else 'hll'
 
     def rel_db_type(self, connection):
-        return 'hll'
+        return 'blob' if connection.vendor == 'sqlite' else 'hll'
 
     def get_internal_type(self):
         return self.__class__.__name__
@@ -58,7 +72,7 @@ class HllField(BinaryField):
         # Psycopg2 returns Binary results as hex string, prefixed by \x
         # BinaryField requires bytes to be saved
         # But none of these can be converted to HLL by postgres directly
-        if isinstance(value, bytes) or isinstance(value, string_types) and value.startswith(r'\x'):
+        if isinstance(value, (bytes, HllSketch)) or isinstance(value, string_types) and value.startswith(r'\x'):
             return HllFromHex(value, db_type=self.db_type(connection))
         else:
             return super(HllField, self).get_db_prep_value(value, connection, prepared=prepared)
@@ -0,0 +1,57 @@
+"""
+Folding huge querysets of HllField values into python defined groups with constant memory usage
+"""
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.db.models import QuerySet
+
+from .profiler import Params
+from .sketch import HllSketch
+
+__all__ = ['hll_fold']
+
+
+def hll_fold(queryset, field_name, key=None, fields=(), chunk_size=2000, params=None, fold_registers=False):
+    # type: (QuerySet, str, Optional[Callable], Iterable[str], int, Optional[Params], bool) -> Dict[Any, HllSketch]
+    """
+    Unites HllField values of queryset into groups, defined by python function.
+    Rows are fetched by chunks with QuerySet.iterator(), which uses named server side cursor on postgres.
+    Every value is united into its group sketch without creating intermediate objects,
+    so memory usage depends on number of groups, not on number of rows.
+    NULL values are skipped, as hll_union_agg() does.
+    :param queryset: QuerySet of rows to fold
+    :param field_name: HllField name
+    :param key: Function, returning group key for a row. It gets values of fields as positional arguments.
+        If not given, all rows are united into a single group with None key.
+    :param fields: Field names or lookups, which values are passed to key function
+    :param chunk_size: Number of rows, fetched from database at once
+    :param params: (log2m, regwidth, expthresh, sparseon) of values. Defaults to field parameters.
+    :param fold_registers: Convert values with other parameters (compacted by hll_compact(), for instance)
+        to params instead of raising ValueError. log2m of values should not be less than params log2m.
+    :return: Dictionary of group key: HllSketch
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive')
+
+    fields = list(fields)
+    if key is None and fields:
+        raise ValueError('fields can be used with key function only')
+
+    if params is None:
+        params = queryset.model._meta.get_field(field_name).params
+
+    # FULL hll registers of every row are decoded into the same buffer
+    buffer = bytearray(1 << params[0])
+    groups = {}  # type: Dict[Any, HllSketch]
+
+    rows = queryset.filter(**{'%s__isnull' % field_name: False}).values_list(field_name, *fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        group = key(*row[1:]) if key is not None else None
+
+        sketch = groups.get(group)
+        if sketch is None:
+            sketch = groups[group] = HllSketch(*params)
+
+        sketch.union_update_bytes(row[0], buffer=buffer, fold_registers=fold_registers)
+
+    return groups
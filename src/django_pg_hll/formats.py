@@ -0,0 +1,174 @@
+"""
+Conversion of sketches from other hll implementations to postgresql-hll format and back without rehashing values.
+Registers can be moved between implementations only if they are filled the same way, postgresql-hll does:
+register index is the lowest log2m bits of hash value, register value is position of the lowest set bit of the rest.
+Besides, values should be hashed with the same function (and seed). Otherwise, converted sketch estimates
+its own cardinality correctly, but can't be united with hlls, built by hll_hash_* functions.
+"""
+from typing import Iterable, Union
+
+from .sketch import HllSketch
+
+__all__ = ['hll_from_redis', 'hll_to_redis', 'hll_from_registers', 'hll_to_registers', 'hll_from_storage_spec',
+           'hll_to_storage_spec']
+
+# Hash functions, used by postgresql-hll hll_hash_* functions
+COMPATIBLE_HASH_FUNCTIONS = ('murmur3_x64_128',)
+
+# Redis HyperLogLog constants. See https://github.com/redis/redis/blob/unstable/src/hyperloglog.c
+REDIS_MAGIC = b'HYLL'
+REDIS_DENSE = 0
+REDIS_SPARSE = 1
+REDIS_HEADER_SIZE = 16
+REDIS_LOG2M = 14
+REDIS_REGWIDTH = 6
+REDIS_DENSE_SIZE = ((1 << REDIS_LOG2M) * REDIS_REGWIDTH + 7) // 8
+
+HllData = Union[HllSketch, bytes, bytearray, memoryview, str]
+
+
+def _to_sketch(value):  # type: (HllData) -> HllSketch
+    return value if isinstance(value, HllSketch) else HllSketch.from_bytes(value)
+
+
+def _check_hash(compatible, implementation, allow_incompatible_hash):  # type: (bool, str, bool) -> None
+    if not compatible and not allow_incompatible_hash:
+        raise ValueError("%s hashes values differently from postgresql-hll, so its registers can't be united "
+                         "with hlls, built by hll_hash_* functions. Pass allow_incompatible_hash=True, "
+                         "if converted sketch is never united with them." % implementation)
+
+
+def hll_from_storage_spec(data, **params):  # type: (Union[bytes, bytearray, memoryview, str], **int) -> HllSketch
+    """
+    Imports hll in storage specification format (https://github.com/aggregateknowledge/hll-storage-spec),
+    used by java-hll (and Spark jobs, based on it). It is the format of postgresql-hll,
+    so data is only validated and optionally converted to other parameters (see HllSketch.convert()).
+    java-hll gets hash values from caller. They are compatible with hll_hash_* functions,
+    if values were hashed with 128-bit MurmurHash3 (x64 variant) with seed 0 and its first 64 bits were used,
+    as Guava Hashing.murmur3_128().hashLong(value).asLong() does for bigint values.
+    :param data: Serialized hll
+    :param params: Optional log2m, regwidth, expthresh and sparseon to convert hll to
+    :return: HllSketch instance
+    """
+    sketch = HllSketch.from_bytes(data)
+    return sketch.convert(**params) if params else sketch
+
+
+def hll_to_storage_spec(value):  # type: (HllData) -> bytes
+    """
+    Exports hll to storage specification format, java-hll reads with HLL.fromBytes()
+    :param value: HllSketch or HllField value
+    :return: Serialized hll
+    """
+    return _to_sketch(value).to_bytes()
+
+
+def hll_from_registers(registers, hash_function, regwidth=5, expthresh=-1, sparseon=1, allow_incompatible_hash=False):
+    # type: (Iterable[int], str, int, int, int, bool) -> HllSketch
+    """
+    Imports hll from register values array (list, bytes, numpy array, etc.), as python sketch libraries keep it.
+    :param registers: Iterable of 2 ** log2m register values
+    :param hash_function: Name of hash function values were hashed with.
+        Only murmur3_x64_128 (first 64 bits) is compatible with hll_hash_* functions.
+    :param regwidth: The number of bits used per register in resulting sketch
+    :param expthresh: See HllSketch.__init__()
+    :param sparseon: See HllSketch.__init__()
+    :param allow_incompatible_hash: Import registers, filled by incompatible hash function
+    :return: HllSketch instance
+    """
+    _check_hash(hash_function in COMPATIBLE_HASH_FUNCTIONS, 'Hash function %s' % hash_function,
+                allow_incompatible_hash)
+    return HllSketch.from_registers(registers, regwidth=regwidth, expthresh=expthresh, sparseon=sparseon)
+
+
+def hll_to_registers(value):  # type: (HllData) -> bytearray
+    """
+    Exports register values of hll. EMPTY and EXPLICIT hlls are converted to registers.
+    :param value: HllSketch or HllField value
+    :return: bytearray of 2 ** log2m register values
+    """
+    return bytearray(_to_sketch(value).registers)
+
+
+def _parse_redis_sparse(body):  # type: (bytes) -> bytearray
+    registers = bytearray()
+    pos = 0
+    while pos < len(body):
+        opcode = body[pos]
+        if opcode & 0x80:
+            # VAL: 1vvvvvxx - run of xx + 1 registers with value vvvvv + 1
+            registers.extend(bytes((((opcode >> 2) & 0x1F) + 1,)) * ((opcode & 0x03) + 1))
+            pos += 1
+        elif opcode & 0x40:
+            # XZERO: 01xxxxxx yyyyyyyy - run of xxxxxxyyyyyyyy + 1 zero registers
+            if pos + 1 >= len(body):
+                raise ValueError('Redis sparse hll data is truncated')
+            registers.extend(bytes((((opcode & 0x3F) << 8) | body[pos + 1]) + 1))
+            pos += 2
+        else:
+            # ZERO: 00xxxxxx - run of xxxxxx + 1 zero registers
+            registers.extend(bytes((opcode & 0x3F) + 1))
+            pos += 1
+
+    return registers
+
+
+def hll_from_redis(data, expthresh=-1, sparseon=1, allow_incompatible_hash=False):
+    # type: (Union[bytes, bytearray, memoryview], int, int, bool) -> HllSketch
+    """
+    Imports Redis HyperLogLog string (as GET command returns it, not DUMP) in dense or sparse encoding.
+    Redis registers are indexed and filled the same way, postgresql-hll does (log2m=14, regwidth=6),
+    but values are hashed with MurmurHash64A. So imported sketch can be united only with other imported
+    Redis sketches and allow_incompatible_hash flag should be set explicitly.
+    :param data: Redis HyperLogLog string
+    :param expthresh: See HllSketch.__init__()
+    :param sparseon: See HllSketch.__init__()
+    :param allow_incompatible_hash: Confirms, that imported sketch is never united with hll_hash_* hlls
+    :return: HllSketch with log2m=14, regwidth=6
+    """
+    _check_hash(False, 'Redis HyperLogLog', allow_incompatible_hash)
+
+    data = bytes(data)
+    if len(data) < REDIS_HEADER_SIZE or data[:4] != REDIS_MAGIC:
+        raise ValueError('Data is not a Redis HyperLogLog')
+
+    encoding, body = data[4], data[REDIS_HEADER_SIZE:]
+    if encoding == REDIS_DENSE:
+        if len(body) != REDIS_DENSE_SIZE:
+            raise ValueError('Redis dense hll data should be %d bytes' % REDIS_DENSE_SIZE)
+
+        # Registers are packed least significant bit first
+        bits = format(int.from_bytes(body, 'little'), '0%db' % (len(body) * 8))[::-1]
+        registers = bytearray(int(bits[i:i + REDIS_REGWIDTH][::-1], 2)
+                              for i in range(0, REDIS_REGWIDTH << REDIS_LOG2M, REDIS_REGWIDTH))
+    elif encoding == REDIS_SPARSE:
+        registers = _parse_redis_sparse(body)
+        if len(registers) != 1 << REDIS_LOG2M:
+            raise ValueError('Redis sparse hll data should describe %d registers' % (1 << REDIS_LOG2M))
+    else:
+        raise ValueError('Unsupported Redis hll encoding: %d' % encoding)
+
+    return HllSketch.from_registers(registers, regwidth=REDIS_REGWIDTH, expthresh=expthresh, sparseon=sparseon)
+
+
+def hll_to_redis(value, allow_incompatible_hash=False):  # type: (HllData, bool) -> bytes
+    """
+    Exports hll to Redis HyperLogLog string in dense encoding, which can be saved with SET command.
+    Register values are capped to 6 bits. Cached cardinality is marked invalid, so Redis recounts it.
+    :param value: HllSketch or HllField value with log2m=14
+    :param allow_incompatible_hash: Confirms, that exported sketch is never united with sketches, built by Redis
+    :return: Redis HyperLogLog string
+    """
+    _check_hash(False, 'Redis HyperLogLog', allow_incompatible_hash)
+
+    sketch = _to_sketch(value)
+    if sketch.log2m != REDIS_LOG2M:
+        raise ValueError('Redis HyperLogLog requires log2m=%d' % REDIS_LOG2M)
+
+    max_value = (1 << REDIS_REGWIDTH) - 1
+    bits = ''.join(format(min(val, max_value), '0%db' % REDIS_REGWIDTH)[::-1] for val in sketch.registers)
+    body = int(bits[::-1], 2).to_bytes(REDIS_DENSE_SIZE, 'little')
+
+    # Magic, encoding, 3 unused bytes and 8 bytes of cached cardinality with "invalid" bit set
+    header = REDIS_MAGIC + bytes((REDIS_DENSE, 0, 0, 0)) + bytes(7) + b'\x80'
+    return header + body
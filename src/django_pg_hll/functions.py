@@ -0,0 +1,66 @@
+"""
+Composable hll expressions. Unlike UnionAggCardinality and CardinalitySum aggregates with hardcoded templates,
+they can be nested with each other, aggregates, Case/When, F() and other expressions,
+so computations over multiple hll columns are done in database.
+"""
+from typing import Any
+
+from django.db.models import FloatField, Func
+
+from .compatibility import string_types
+from .fields import HllField
+from .values import parse_hll_value
+
+__all__ = ['HllCardinalityOf', 'HllUnion']
+
+
+def _parse_hll_expression(value):  # type: (Any) -> Any
+    # Field names are converted to F() by Func. Other values (HllSketch, serialized hll, iterables) become hll values
+    if hasattr(value, 'resolve_expression') or isinstance(value, string_types) and not value.startswith(r'\x'):
+        return value
+
+    return parse_hll_value(value)
+
+
+class HllUnion(Func):
+    """
+    Row level union of 2 or more hll expressions: hll_union(hll_union(a, b), c).
+    As hll_union() does, returns NULL if any expression is NULL. Wrap nullable expressions into Coalesce(..., HllEmpty()).
+
+    MyModel.objects.annotate(card=HllCardinalityOf(HllUnion('hll_a', 'hll_b')))
+    MyModel.objects.aggregate(card=HllCardinalityOf(UnionAgg(HllUnion('hll_a', 'hll_b'))))
+    """
+    function = 'hll_union'
+    output_field = HllField()
+
+    def __init__(self, *expressions, **extra):
+        """
+        :param expressions: Field names, expressions, HllValue instances, HllSketch or serialized hlls
+        """
+        if len(expressions) < 2:
+            raise ValueError('HllUnion requires at least 2 expressions')
+
+        expressions = [_parse_hll_expression(expression) for expression in expressions]
+
+        # hll_union() accepts 2 arguments only
+        if len(expressions) > 2:
+            expressions = [HllUnion(*expressions[:-1]), expressions[-1]]
+
+        super(HllUnion, self).__init__(*expressions, **extra)
+
+
+class HllCardinalityOf(Func):
+    """
+    Cardinality of any hll expression: hll_cardinality(expression)
+
+    MyModel.objects.annotate(card=HllCardinalityOf(Case(When(flag=True, then=F('hll_a')), default=F('hll_b'))))
+    """
+    function = 'hll_cardinality'
+    output_field = FloatField()
+    arity = 1
+
+    def __init__(self, expression, **extra):
+        """
+        :param expression: Field name, expression, HllValue instance, HllSketch or serialized hll
+        """
+        super(HllCardinalityOf, self).__init__(_parse_hll_expression(expression), **extra)
@@ -0,0 +1,183 @@
+"""
+Computing hll aggregates for multiple grouping levels with a single query: GROUPING SETS, ROLLUP and CUBE.
+See https://www.postgresql.org/docs/current/queries-table-expressions.html#QUERIES-GROUPING-SETS
+Django doesn't support them, so queryset is used as a subquery, grouped by the outer query.
+"""
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from django.db import connections
+from django.db.models import Aggregate, Expression, F, QuerySet
+from django.db.models.sql import Query
+
+__all__ = ['Cube', 'GroupingSets', 'Rollup', 'aggregate_grouping_sets']
+
+
+class GroupingSets:
+    """
+    Explicit list of grouping sets:
+    GroupingSets(('country', 'city'), ('country',), ()) is GROUPING SETS ((country, city), (country), ())
+    """
+    def __init__(self, *sets):  # type: (*Sequence[str]) -> None
+        self.sets = [tuple(grouping_set) for grouping_set in sets]
+
+        # Dimensions in order they are first met
+        self.dimensions = tuple(dict.fromkeys(dim for grouping_set in self.sets for dim in grouping_set))
+
+        if not self.dimensions:
+            raise ValueError('At least one dimension is required')
+
+    def get_sets(self):  # type: () -> List[Tuple[str, ...]]
+        """
+        Expands grouping to explicit grouping sets
+        """
+        return self.sets
+
+    def as_sql(self, columns):  # type: (Dict[str, str]) -> str
+        """
+        Forms GROUP BY clause
+        :param columns: Dictionary of dimension: sql column
+        :return: SQL string
+        """
+        return 'GROUPING SETS (%s)' % ', '.join('(%s)' % ', '.join(columns[dim] for dim in grouping_set)
+                                                for grouping_set in self.get_sets())
+
+
+class Rollup(GroupingSets):
+    """
+    Rollup('country', 'city') is ROLLUP (country, city), the same as GROUPING SETS ((country, city), (country), ())
+    """
+    def __init__(self, *dimensions):  # type: (*str) -> None
+        super(Rollup, self).__init__(dimensions)
+
+    def get_sets(self):
+        return [self.dimensions[:i] for i in range(len(self.dimensions), -1, -1)]
+
+    def as_sql(self, columns):
+        return 'ROLLUP (%s)' % ', '.join(columns[dim] for dim in self.dimensions)
+
+
+class Cube(GroupingSets):
+    """
+    Cube('country', 'city') is CUBE (country, city):
+    the same as GROUPING SETS ((country, city), (country), (city), ())
+    """
+    def __init__(self, *dimensions):  # type: (*str) -> None
+        super(Cube, self).__init__(dimensions)
+
+    def get_sets(self):
+        return [grouping_set for size in range(len(self.dimensions), -1, -1)
+                for grouping_set in combinations(self.dimensions, size)]
+
+    def as_sql(self, columns):
+        return 'CUBE (%s)' % ', '.join(columns[dim] for dim in self.dimensions)
+
+
+class _InnerColumn(Expression):
+    # Column of inner query, aggregates are applied to
+    def __init__(self, alias, output_field):  # type: (str, Any) -> None
+        super(_InnerColumn, self).__init__(output_field=output_field)
+        self.alias = alias
+
+    def as_sql(self, compiler, connection):
+        return connection.ops.quote_name(self.alias), []
+
+
+def _grouping_mask(dimensions, grouping_set):  # type: (Sequence[str], Iterable[str]) -> int
+    # The same bit mask, as GROUPING() function returns: bit is set, if dimension is not grouped by
+    # First dimension is the most significant bit
+    return sum(1 << (len(dimensions) - 1 - i) for i, dim in enumerate(dimensions) if dim not in grouping_set)
+
+
+def aggregate_grouping_sets(queryset, grouping, grouping_alias='grouping', **aggregates):
+    # type: (QuerySet, GroupingSets, str, **Aggregate) -> List[Dict[str, Any]]
+    """
+    Computes aggregates for all grouping sets with a single query:
+
+    aggregate_grouping_sets(Visit.objects.filter(date='2024-01-01'), Rollup('country', 'city'),
+                            card=UnionAggCardinality('users'))
+
+    On databases without grouping sets support (SQLite), query is emulated with UNION ALL of simple groupings.
+    :param queryset: QuerySet of rows to aggregate
+    :param grouping: GroupingSets, Rollup or Cube instance
+    :param grouping_alias: Result key, containing tuple of dimensions the row is grouped by
+    :param aggregates: Aggregates, like UnionAgg('hll_field'). Aggregates with filter are not supported.
+    :return: A list of dictionaries with dimension values (None for dimensions, row is not grouped by),
+        aggregate values and grouping_alias key
+    """
+    if not aggregates:
+        raise ValueError('At least one aggregate is required')
+
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    dimensions = grouping.dimensions
+
+    # Outer query expressions are compiled and converted as if they were selected from queryset model
+    query = Query(queryset.model)
+    compiler = query.get_compiler(using=queryset.db)
+
+    # Dimensions and aggregate sources are selected by inner query with generated aliases
+    inner_values = {'_hll_dim_%d' % i: F(dim) for i, dim in enumerate(dimensions)}
+    columns = {dim: qn('_hll_dim_%d' % i) for i, dim in enumerate(dimensions)}
+    select = [F(dim).resolve_expression(query) for dim in dimensions] + [None]  # type: List[Any]
+    aggregate_sql, aggregate_params = [], []  # type: List[str], List[Any]
+    for i, aggregate in enumerate(aggregates.values()):
+        if getattr(aggregate, 'filter', None) is not None:
+            raise ValueError('Aggregates with filter are not supported')
+
+        aggregate = aggregate.copy()
+        sources = []
+        # Aggregate.get_source_expressions() contains filter too in django 2.0+
+        for j, source in enumerate(aggregate.source_expressions):
+            alias = '_hll_src_%d_%d' % (i, j)
+            inner_values[alias] = source
+            sources.append(_InnerColumn(alias, source.resolve_expression(query).output_field))
+        aggregate.source_expressions = sources
+
+        resolved = aggregate.resolve_expression(query)
+        sql, params = compiler.compile(resolved)
+        select.append(resolved)
+        aggregate_sql.append(sql)
+        aggregate_params.extend(params)
+
+    inner_sql, inner_params = queryset.order_by().values(**inner_values).query.get_compiler(using=queryset.db).as_sql()
+    from_sql = '(%s) AS %s' % (inner_sql, qn('_hll_t'))
+
+    if connection.vendor == 'postgresql':
+        dimension_sql = ', '.join(columns[dim] for dim in dimensions)
+        sql = 'SELECT %s, GROUPING(%s), %s FROM %s GROUP BY %s' \
+              % (dimension_sql, dimension_sql, ', '.join(aggregate_sql), from_sql, grouping.as_sql(columns))
+        params = aggregate_params + list(inner_params)
+    else:
+        sql_parts, params = [], []
+        for grouping_set in grouping.get_sets():
+            select_sql = [columns[dim] if dim in grouping_set else 'NULL' for dim in dimensions]
+            select_sql.append(str(_grouping_mask(dimensions, grouping_set)))
+            group_by_sql = ' GROUP BY %s' % ', '.join(columns[dim] for dim in grouping_set) if grouping_set else ''
+
+            sql_parts.append('SELECT %s, %s FROM %s%s'
+                             % (', '.join(select_sql), ', '.join(aggregate_sql), from_sql, group_by_sql))
+            params.extend(aggregate_params)
+            params.extend(inner_params)
+
+        sql = ' UNION ALL '.join(sql_parts)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    # Raw query results are converted by field converters (from_db_value()), as QuerySet does
+    converters = compiler.get_converters(select)
+    if converters:
+        rows = list(compiler.apply_converters(rows, converters))
+
+    result = []
+    for row in rows:
+        item = dict(zip(dimensions, row))
+        mask = row[len(dimensions)]
+        item[grouping_alias] = tuple(dim for i, dim in enumerate(dimensions)
+                                     if not mask & (1 << (len(dimensions) - 1 - i)))
+        item.update(zip(aggregates.keys(), row[len(dimensions) + 1:]))
+        result.append(item)
+
+    return result
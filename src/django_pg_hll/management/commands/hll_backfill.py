@@ -0,0 +1,46 @@
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+
+from django_pg_hll.aggregate import AddAgg
+from django_pg_hll.backfill import hll_backfill
+
+
+class Command(BaseCommand):
+    help = 'Adds values of source model column to HllField of target model rows. See hll_backfill()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Source model label: app_label.ModelName')
+        parser.add_argument('key_field', help='Source field, referencing target row')
+        parser.add_argument('value_field', help='Source field, containing values to add to hll')
+        parser.add_argument('target', help='Target model label: app_label.ModelName')
+        parser.add_argument('target_field', help='Target HllField name')
+        parser.add_argument('--target-key-field', default='pk', help='Target field, key_field references')
+        parser.add_argument('--db-type', default='any', choices=AddAgg.HASH_TYPES, help='Hash function type')
+        parser.add_argument('--hash-seed', type=int, default=None, help='Hash seed')
+        parser.add_argument('--chunk-size', type=int, default=100000,
+                            help='Size of source primary key range, processed with single query')
+        parser.add_argument('--workers', type=int, default=1, help='Number of chunks, processed concurrently')
+        parser.add_argument('--throttle', type=float, default=0, help='Seconds to sleep after every chunk')
+        parser.add_argument('--checkpoint-file', default=None,
+                            help='File to save progress to. If it exists, backfill is resumed from it')
+        parser.add_argument('--database', default=None, help='Database alias to use')
+
+    def _get_model(self, label):
+        try:
+            return apps.get_model(label)
+        except (LookupError, ValueError) as ex:
+            raise CommandError(str(ex))
+
+    def handle(self, *args, **options):
+        source = self._get_model(options['source'])._default_manager.all()
+        target = self._get_model(options['target'])._default_manager.all()
+        if options['database']:
+            source, target = source.using(options['database']), target.using(options['database'])
+
+        chunks = hll_backfill(source, options['key_field'], options['value_field'], target, options['target_field'],
+                              target_key_field=options['target_key_field'], db_type=options['db_type'],
+                              hash_seed=options['hash_seed'], chunk_size=options['chunk_size'],
+                              workers=options['workers'], throttle=options['throttle'],
+                              checkpoint_file=options['checkpoint_file'])
+
+        self.stdout.write('%d chunks processed' % chunks)
@@ -0,0 +1,90 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from django_pg_hll.auto import get_auto_thresholds
+from django_pg_hll.benchmark import BENCHMARK_QUERIES, DEFAULT_PARAMS, DEFAULT_ROW_CARDINALITIES, DEFAULT_SIZES, \
+    DEFAULT_VALUE_COUNTS, run_benchmark, run_value_benchmark
+from django_pg_hll.management.utils import parse_params
+
+
+def _format_optional(value, pattern):
+    return '-' if value is None else pattern % value
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks server side hll functions on synthetic tables with different HllField parameters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--params', type=parse_params, action='append', dest='params_list',
+                            help='Parameters to benchmark: log2m,regwidth,expthresh,sparseon. Can be repeated. '
+                                 'Defaults to: %s' % ' '.join(','.join(map(str, p)) for p in DEFAULT_PARAMS))
+        parser.add_argument('--size', type=int, action='append', dest='sizes',
+                            help='Number of table rows. Can be repeated. Defaults to: %s'
+                                 % ' '.join(map(str, DEFAULT_SIZES)))
+        parser.add_argument('--row-cardinality', type=int, action='append', dest='row_cardinalities',
+                            help='Number of distinct values in every row. Can be repeated. Defaults to: %s'
+                                 % ' '.join(map(str, DEFAULT_ROW_CARDINALITIES)))
+        parser.add_argument('--distinct-values', type=int, default=100000,
+                            help='Number of distinct values in the whole table')
+        parser.add_argument('--query', action='append', dest='queries', choices=list(BENCHMARK_QUERIES.keys()),
+                            help='Query to run. Can be repeated. Defaults to all queries')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of times every query is run')
+        parser.add_argument('--values', action='store_true',
+                            help='Benchmark HllAuto strategies instead of server side functions. '
+                                 '--size sets numbers of values then (defaults to: %s), '
+                                 'the first --params sets hll parameters' % ' '.join(map(str, DEFAULT_VALUE_COUNTS)))
+        parser.add_argument('--json', action='store_true', help='Output report as json')
+        parser.add_argument('--database', default='default', help='Database alias to use')
+
+    def handle(self, *args, **options):
+        if options['values']:
+            self._handle_values(options)
+            return
+
+        try:
+            report = run_benchmark(params_list=options['params_list'],
+                                   sizes=options['sizes'] or DEFAULT_SIZES,
+                                   row_cardinalities=options['row_cardinalities'] or DEFAULT_ROW_CARDINALITIES,
+                                   distinct_values=options['distinct_values'], queries=options['queries'],
+                                   repeat=options['repeat'], using=options['database'])
+        except ValueError as ex:
+            raise CommandError(str(ex))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for table in report:
+            self.stdout.write('Parameters %s, rows=%d, row cardinality=%d: table bytes=%s, column bytes=%d'
+                              % (table['params'], table['rows'], table['row_cardinality'],
+                                 _format_optional(table['table_bytes'], '%d'), table['column_bytes']))
+            for query in table['queries']:
+                self.stdout.write('  %-20s latency=%.2fms (median %.2fms), shared hit=%s, shared read=%s, error=%s'
+                                  % (query['query'], query['latency'] * 1000, query['latency_median'] * 1000,
+                                     _format_optional(query['shared_hit'], '%d'),
+                                     _format_optional(query['shared_read'], '%d'),
+                                     _format_optional(query['error'] and query['error'] * 100, '%.2f%%')))
+
+    def _handle_values(self, options):
+        params = options['params_list'][0] if options['params_list'] else DEFAULT_PARAMS[0]
+        try:
+            report = run_value_benchmark(sizes=options['sizes'] or DEFAULT_VALUE_COUNTS, params=params,
+                                         repeat=options['repeat'], using=options['database'])
+        except ValueError as ex:
+            raise CommandError(str(ex))
+
+        thresholds = get_auto_thresholds(report)
+        if options['json']:
+            self.stdout.write(json.dumps({'results': report, 'thresholds': thresholds}, indent=2))
+            return
+
+        for item in report:
+            if item['error'] is not None:
+                self.stdout.write('%8d values %-8s failed: %s' % (item['size'], item['strategy'], item['error']))
+            else:
+                self.stdout.write('%8d values %-8s latency=%.2fms (median %.2fms)'
+                                  % (item['size'], item['strategy'], item['latency'] * 1000,
+                                     item['latency_median'] * 1000))
+
+        self.stdout.write('HllAuto thresholds: %s' % thresholds)
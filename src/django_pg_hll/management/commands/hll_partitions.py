@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+
+from django_pg_hll.partitioning import TimePartitioning, maintain_partitions
+
+
+class Command(BaseCommand):
+    help = 'Creates future partitions and drops expired partitions of models with hll_partitioning attribute'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*',
+                            help='Model labels: app_label.ModelName. Defaults to all models with hll_partitioning')
+        parser.add_argument('--database', default='default', help='Database alias to use')
+
+    def handle(self, *args, **options):
+        try:
+            models = [apps.get_model(label) for label in options['models']]
+        except (LookupError, ValueError) as ex:
+            raise CommandError(str(ex))
+
+        if not models:
+            models = [model for model in apps.get_models()
+                      if isinstance(getattr(model, 'hll_partitioning', None), TimePartitioning)]
+
+        for model in models:
+            try:
+                created, dropped = maintain_partitions(model, using=options['database'])
+            except ValueError as ex:
+                raise CommandError(str(ex))
+
+            self.stdout.write('%s: created %d partitions, dropped %d partitions'
+                              % (model._meta.label, len(created), len(dropped)))
+            for name in created:
+                self.stdout.write('  + %s' % name)
+            for name in dropped:
+                self.stdout.write('  - %s' % name)
@@ -0,0 +1,45 @@
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+
+from django_pg_hll.management.utils import parse_params
+from django_pg_hll.profiler import profile_hll_field
+
+
+class Command(BaseCommand):
+    help = 'Reports storage statistics of HllField column and simulates alternative hll parameters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='Model label: app_label.ModelName')
+        parser.add_argument('field', help='HllField name')
+        parser.add_argument('--sample-size', type=int, default=1000,
+                            help='Number of random rows to profile. 0 means all rows')
+        parser.add_argument('--candidate', type=parse_params, action='append', dest='candidates',
+                            help='Parameters to simulate: log2m,regwidth,expthresh,sparseon. Can be repeated')
+        parser.add_argument('--database', default=None, help='Database alias to use')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as ex:
+            raise CommandError(str(ex))
+
+        queryset = model._default_manager.using(options['database'])
+        report = profile_hll_field(queryset, options['field'], sample_size=options['sample_size'] or None,
+                                   candidates=options['candidates'])
+
+        self.stdout.write('Rows sampled: %d' % report['rows'])
+        self.stdout.write('Parameters (log2m, regwidth, expthresh, sparseon): %s' % (report['params'],))
+        self.stdout.write('Types: %s' % ', '.join('%s=%d' % item for item in report['types'].items()))
+        self.stdout.write('Stored bytes: %d, raw bytes: %d, values over TOAST threshold: %d'
+                          % (report['bytes'], report['raw_bytes'], report['toasted']))
+        if report['toast_relation_bytes'] is not None:
+            self.stdout.write('TOAST table bytes: %d' % report['toast_relation_bytes'])
+
+        self.stdout.write('Cardinality: %s' % ', '.join('%s=%s' % item for item in report['cardinality'].items()))
+
+        self.stdout.write('Candidates:')
+        for candidate in report['candidates']:
+            change = (float(candidate['bytes']) / report['raw_bytes'] - 1.0) * 100 if report['raw_bytes'] else 0.0
+            self.stdout.write('  %s: bytes=%d (%+.1f%%), toasted=%d, estimated=%d, error=%.2f%%'
+                              % (candidate['params'], candidate['bytes'], change, candidate['toasted'],
+                                 candidate['estimated'], candidate['error'] * 100))
@@ -0,0 +1,22 @@
+"""
+Helpers, shared by management commands
+"""
+from typing import Tuple
+
+
+def parse_params(value):  # type: (str) -> Tuple[int, ...]
+    """
+    Parses hll parameters command line argument
+    :param value: Comma separated parameters: log2m,regwidth,expthresh,sparseon
+    :return: Tuple of 4 integers
+    :raises ValueError: If value is not 4 comma separated integers
+    """
+    try:
+        params = tuple(int(param) for param in value.split(','))
+    except ValueError:
+        params = ()
+
+    if len(params) != 4:
+        raise ValueError('Parameters should be 4 comma separated integers: log2m,regwidth,expthresh,sparseon')
+
+    return params
@@ -1,4 +1,15 @@
+import warnings
+from typing import Any, Dict
+
 from django.contrib.postgres.operations import CreateExtension
+from django.db import transaction
+from django.db.backends.utils import truncate_name
+from django.db.migrations import AddField, AlterField, CreateModel, RemoveField, RenameField
+from django.db.models import Model
+
+from .fields import HllField
+from .partitioning import TimePartitioning
+from .sketch import HllSketch
 
 
 class HllExtension(CreateExtension):
@@ -7,3 +18,237 @@ class HllExtension(CreateExtension):
     #   migrations.RunSQL('CREATE EXTENSION IF NOT EXISTS hll;', reverse_sql='DROP EXTENSION hll;')
     def __init__(self):
         self.name = 'hll'
+
+
+class AlterHllField(AlterField):
+    """
+    Changes HllField parameters (log2m, regwidth, expthresh, sparseon) without rewriting table
+    under exclusive lock, as ALTER COLUMN TYPE does:
+    1. Adds nullable shadow column with new parameters.
+       On postgres a trigger resets shadow value of rows, which old column is written to, to NULL.
+    2. Fills shadow column in batches, ordered by primary key. Batch rows are locked with SELECT ... FOR UPDATE.
+       Rows, which were written to during the pass, are converted by a second pass.
+    3. Locks table for writes (reads are not blocked), converts rows, written to during the second pass,
+       drops old column and trigger and renames shadow column to the old name.
+    4. Restores NOT NULL on postgres with a CHECK constraint, which is validated without blocking writes.
+       postgres 12+ doesn't scan the table to SET NOT NULL then.
+
+    Migration should be non-atomic (set atomic = False in Migration class). Otherwise, every batch is a savepoint
+    of a single transaction, which holds all row locks and lock of step 3 until migration is committed.
+
+    postgresql-hll can't unite hlls with different parameters, so values are converted locally
+    with HllSketch.convert(). If some value can't be converted, migration fails before columns are swapped.
+    """
+    default_batch_size = 10000
+
+    SYNC_FUNCTION_SQL = 'CREATE OR REPLACE FUNCTION %(function)s() RETURNS trigger AS $$ ' \
+                        'BEGIN NEW.%(shadow)s := NULL; RETURN NEW; END $$ LANGUAGE plpgsql'
+    SYNC_TRIGGER_SQL = 'CREATE TRIGGER %(trigger)s BEFORE INSERT OR UPDATE OF %(column)s ON %(table)s ' \
+                       'FOR EACH ROW EXECUTE PROCEDURE %(function)s()'
+    DROP_SYNC_SQL = 'DROP TRIGGER IF EXISTS %(trigger)s ON %(table)s; DROP FUNCTION IF EXISTS %(function)s()'
+
+    def __init__(self, model_name, name, field, preserve_default=True, batch_size=default_batch_size):
+        # type: (str, str, HllField, bool, int) -> None
+        """
+        :param model_name: Model name
+        :param name: HllField name
+        :param field: HllField instance with new parameters
+        :param preserve_default: See AlterField
+        :param batch_size: Number of rows, converted in a single transaction
+        """
+        if not isinstance(field, HllField):
+            raise ValueError('field must be HllField instance')
+
+        if batch_size <= 0:
+            raise ValueError('batch_size must be positive')
+
+        self.batch_size = batch_size
+        super(AlterHllField, self).__init__(model_name, name, field, preserve_default=preserve_default)
+
+    def deconstruct(self):
+        name, args, kwargs = super(AlterHllField, self).deconstruct()
+        if self.batch_size != self.default_batch_size:
+            kwargs['batch_size'] = self.batch_size
+
+        return name, args, kwargs
+
+    def describe(self):
+        return 'Alter hll field %s on %s in batches' % (self.name, self.model_name)
+
+    def _backfill(self, schema_editor, model, old_field, shadow_field):
+        # type: (Any, Model, HllField, HllField) -> int
+        # Converts rows with NULL shadow value. Returns number of rows converted
+        connection = schema_editor.connection
+        qn = connection.ops.quote_name
+        params = dict(zip(HllField.HLL_ARGS, shadow_field.params))
+
+        # SQLite has no hll type. See sqlite.py
+        placeholder = '%s' if connection.vendor == 'sqlite' else '%%s::%s' % shadow_field.db_type(connection)
+        update_sql = 'UPDATE %s SET %s = %s WHERE %s = %%s' \
+                     % (qn(model._meta.db_table), qn(shadow_field.column), placeholder, qn(model._meta.pk.column))
+
+        queryset = model._base_manager.using(connection.alias).order_by('pk').filter(**{
+            '%s__isnull' % shadow_field.name: True,
+            '%s__isnull' % old_field.name: False
+        })
+        last_pk, converted = None, 0
+        while True:
+            with transaction.atomic(using=connection.alias):
+                # Rows are locked, so concurrent writes wait for batch commit and reset shadow value after it
+                batch_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+                batch = list(batch_queryset.select_for_update().values_list('pk', old_field.attname)[:self.batch_size])
+                if not batch:
+                    break
+
+                with connection.cursor() as cursor:
+                    cursor.executemany(update_sql, [(HllSketch.from_bytes(value).convert(**params).to_bytes(), pk)
+                                                    for pk, value in batch])
+
+            last_pk = batch[-1][0]
+            converted += len(batch)
+
+        return converted
+
+    @staticmethod
+    def _get_sync_names(schema_editor, model, old_field, shadow_field):
+        # type: (Any, Model, HllField, HllField) -> Dict[str, str]
+        connection = schema_editor.connection
+        qn = connection.ops.quote_name
+        name = truncate_name('%s_%s_hll_sync' % (model._meta.db_table, old_field.column), connection.ops.max_name_length())
+        return {
+            'table': qn(model._meta.db_table),
+            'column': qn(old_field.column),
+            'shadow': qn(shadow_field.column),
+            'function': qn(name),
+            'trigger': qn(name)
+        }
+
+    @staticmethod
+    def _set_not_null(schema_editor, model, field):  # type: (Any, Model, HllField) -> None
+        # SET NOT NULL scans the table under ACCESS EXCLUSIVE lock, if no valid constraint proves it.
+        # VALIDATE CONSTRAINT scans the table, but doesn't block writes.
+        qn = schema_editor.connection.ops.quote_name
+        names = {
+            'table': qn(model._meta.db_table),
+            'column': qn(field.column),
+            'constraint': qn(truncate_name('%s_%s_hll_not_null' % (model._meta.db_table, field.column),
+                                           schema_editor.connection.ops.max_name_length()))
+        }
+
+        schema_editor.execute('ALTER TABLE %(table)s ADD CONSTRAINT %(constraint)s CHECK (%(column)s IS NOT NULL) '
+                              'NOT VALID' % names)
+        schema_editor.execute('ALTER TABLE %(table)s VALIDATE CONSTRAINT %(constraint)s' % names)
+        schema_editor.execute('ALTER TABLE %(table)s ALTER COLUMN %(column)s SET NOT NULL' % names)
+        schema_editor.execute('ALTER TABLE %(table)s DROP CONSTRAINT %(constraint)s' % names)
+
+    @staticmethod
+    def _apply(operation, app_label, schema_editor, state):  # type: (Any, str, Any, Any) -> Any
+        new_state = state.clone()
+        operation.state_forwards(app_label, new_state)
+        operation.database_forwards(app_label, schema_editor, state, new_state)
+        return new_state
+
+    def _swap_postgresql(self, app_label, schema_editor, state):  # type: (str, Any, Any) -> Any
+        connection = schema_editor.connection
+        if schema_editor.atomic_migration:
+            warnings.warn('AlterHllField of %s.%s is applied in atomic migration: table is locked for writes '
+                          'until migration is committed. Set atomic = False in Migration class.'
+                          % (self.model_name, self.name), RuntimeWarning)
+
+        shadow_name = '%s_hll_shadow' % self.name
+        model = state.apps.get_model(app_label, self.model_name)
+        fields = (model._meta.get_field(self.name), model._meta.get_field(shadow_name))
+        names = self._get_sync_names(schema_editor, model, *fields)
+
+        schema_editor.execute(self.SYNC_FUNCTION_SQL % names)
+        schema_editor.execute(self.SYNC_TRIGGER_SQL % names)
+        try:
+            self._backfill(schema_editor, model, *fields)
+            self._backfill(schema_editor, model, *fields)
+
+            with transaction.atomic(using=connection.alias):
+                # EXCLUSIVE mode blocks writes, but not reads, while the rest of rows is converted
+                schema_editor.execute('LOCK TABLE %(table)s IN EXCLUSIVE MODE' % names)
+                self._backfill(schema_editor, model, *fields)
+                schema_editor.execute(self.DROP_SYNC_SQL % names)
+                state = self._apply(RemoveField(self.model_name, self.name), app_label, schema_editor, state)
+                state = self._apply(RenameField(self.model_name, shadow_name, self.name), app_label, schema_editor,
+                                    state)
+        except Exception:
+            # Trigger is removed by rollback in atomic migration
+            if not connection.in_atomic_block:
+                schema_editor.execute(self.DROP_SYNC_SQL % names)
+            raise
+
+        return state
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        to_model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, to_model):
+            return
+
+        new_field = to_model._meta.get_field(self.name)
+        shadow_name = '%s_hll_shadow' % self.name
+        shadow_field = new_field.clone()
+        shadow_field.null = True
+
+        # Every step is done with standard operations in order to keep intermediate model states consistent
+        state = self._apply(AddField(self.model_name, shadow_name, shadow_field), app_label, schema_editor, from_state)
+
+        if schema_editor.connection.vendor == 'postgresql':
+            state = self._swap_postgresql(app_label, schema_editor, state)
+            if not new_field.null:
+                self._set_not_null(schema_editor, to_model, new_field)
+            return
+
+        model = state.apps.get_model(app_label, self.model_name)
+        self._backfill(schema_editor, model, model._meta.get_field(self.name), model._meta.get_field(shadow_name))
+
+        state = self._apply(RemoveField(self.model_name, self.name), app_label, schema_editor, state)
+        state = self._apply(RenameField(self.model_name, shadow_name, self.name), app_label, schema_editor, state)
+        self._apply(AlterField(self.model_name, self.name, new_field.clone()), app_label, schema_editor, state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # from_state contains altered field here, so conversion is done in opposite direction
+        self.database_forwards(app_label, schema_editor, from_state, to_state)
+
+
+class CreatePartitionedModel(CreateModel):
+    """
+    Creates model table, natively partitioned by time (see TimePartitioning), and its current and premade partitions.
+    Primary key of the table contains partitioning field, as postgres requires.
+    On other databases ordinary table is created.
+    makemigrations generates CreateModel for such models, so it should be replaced with this operation manually.
+    """
+    def __init__(self, name, fields, partitioning, options=None, bases=None, managers=None):
+        # type: (str, Any, TimePartitioning, Any, Any, Any) -> None
+        """
+        :param partitioning: TimePartitioning instance. Other parameters are the same, as CreateModel has.
+        """
+        if not isinstance(partitioning, TimePartitioning):
+            raise ValueError('partitioning must be TimePartitioning instance')
+
+        self.partitioning = partitioning
+        super(CreatePartitionedModel, self).__init__(name, fields, options=options, bases=bases, managers=managers)
+
+    def deconstruct(self):
+        name, args, kwargs = super(CreatePartitionedModel, self).deconstruct()
+        kwargs['partitioning'] = self.partitioning
+        return name, args, kwargs
+
+    def describe(self):
+        return 'Create model %s, partitioned by %s' % (self.name, self.partitioning.field_name)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+
+        if schema_editor.connection.vendor != 'postgresql':
+            schema_editor.create_model(model)
+            return
+
+        sql, params = self.partitioning.get_table_sql(schema_editor, model)
+        schema_editor.execute(sql, params or None)
+        schema_editor.deferred_sql.extend(schema_editor._model_indexes_sql(model))
+        self.partitioning.create_partitions(model, using=schema_editor.connection.alias)
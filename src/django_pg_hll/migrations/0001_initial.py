@@ -0,0 +1,25 @@
+from django.db import models, migrations
+
+from django_pg_hll.fields import HllField
+from django_pg_hll.migration import HllExtension
+
+
+class Migration(migrations.Migration):
+    initial = True
+    dependencies = []
+
+    operations = [
+        HllExtension(),
+        migrations.CreateModel(
+            name='HllCounter',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('hll', HllField())
+            ],
+            options={
+                'db_table': 'django_pg_hll_counter',
+                'abstract': False,
+            }
+        )
+    ]
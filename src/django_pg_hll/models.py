@@ -0,0 +1,27 @@
+"""
+Models, provided by the library. Add django_pg_hll to INSTALLED_APPS and run migrate to use them.
+"""
+from django.db import models
+
+from .fields import HllField
+
+
+class AbstractHllCounter(models.Model):
+    """
+    Base model for named hll counters (see HllCounterStore).
+    Inherit it in order to change HllField parameters or add fields.
+    """
+    id = models.BigAutoField(primary_key=True)
+    key = models.CharField(max_length=255, unique=True)
+    hll = HllField()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.key
+
+
+class HllCounter(AbstractHllCounter):
+    class Meta(AbstractHllCounter.Meta):
+        db_table = 'django_pg_hll_counter'
@@ -0,0 +1,285 @@
+"""
+Native postgres range partitioning of hll tables by time.
+Old data is removed by dropping whole partitions instead of DELETE, which bloats the table.
+Queries, filtered by partitioning field, read only matching partitions (partition pruning).
+Tables are created with django_pg_hll.migration.CreatePartitionedModel operation.
+"""
+import copy
+import datetime
+from typing import Any, List, Optional, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+__all__ = ['TimePartitioning', 'maintain_partitions']
+
+
+@deconstructible
+class TimePartitioning:
+    """
+    Describes range partitioning of a model table by date or datetime field.
+    Set it as hll_partitioning attribute of a model in order to maintain partitions with maintain_partitions()
+    or hll_partitions management command and pass the same instance to CreatePartitionedModel migration operation.
+
+    class Visits(models.Model):
+        time = models.DateTimeField()
+        hll = HllField()
+
+        hll_partitioning = TimePartitioning('time', interval='day', premake=7, retention=datetime.timedelta(days=90))
+    """
+    INTERVALS = ('hour', 'day', 'week', 'month')
+
+    # Partition name suffix format. Partition is named <table>_p<period start>
+    NAME_FORMATS = {
+        'hour': '%Y%m%d%H',
+        'day': '%Y%m%d',
+        'week': '%Y%m%d',
+        'month': '%Y%m'
+    }
+
+    def __init__(self, field_name, interval='day', premake=3, retention=None):
+        # type: (str, str, int, Optional[datetime.timedelta]) -> None
+        """
+        :param field_name: DateField or DateTimeField name to partition table by. Periods are counted in UTC.
+        :param interval: Partition period: hour, day, week (starting from monday) or month
+        :param premake: Number of future partitions, created in advance
+        :param retention: Partitions, which ended earlier than retention ago, are dropped.
+            None means partitions are never dropped.
+        """
+        if interval not in self.INTERVALS:
+            raise ValueError('interval must be one of: %s' % ', '.join(self.INTERVALS))
+
+        if premake < 0:
+            raise ValueError('premake must be non-negative')
+
+        self.field_name = field_name
+        self.interval = interval
+        self.premake = premake
+        self.retention = retention
+
+    def __eq__(self, other):
+        return isinstance(other, TimePartitioning) and self.deconstruct() == other.deconstruct()
+
+    def get_field(self, model):  # type: (Any) -> models.Field
+        field = model._meta.get_field(self.field_name)
+        if not isinstance(field, models.DateField):
+            raise ValueError('Partitioning field should be DateField or DateTimeField')
+
+        if self.interval == 'hour' and not isinstance(field, models.DateTimeField):
+            raise ValueError('hour interval requires DateTimeField')
+
+        return field
+
+    def get_period_start(self, value):  # type: (datetime.date) -> datetime.datetime
+        """
+        Returns start of the period, value belongs to, as naive UTC datetime
+        """
+        if isinstance(value, datetime.datetime):
+            if timezone.is_aware(value):
+                value = timezone.make_naive(value, datetime.timezone.utc)
+        else:
+            value = datetime.datetime(value.year, value.month, value.day)
+
+        if self.interval == 'hour':
+            return value.replace(minute=0, second=0, microsecond=0)
+
+        start = value.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.interval == 'week':
+            return start - datetime.timedelta(days=start.weekday())
+
+        if self.interval == 'month':
+            return start.replace(day=1)
+
+        return start
+
+    def get_next_period_start(self, start):  # type: (datetime.datetime) -> datetime.datetime
+        if self.interval == 'hour':
+            return start + datetime.timedelta(hours=1)
+
+        if self.interval == 'day':
+            return start + datetime.timedelta(days=1)
+
+        if self.interval == 'week':
+            return start + datetime.timedelta(days=7)
+
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+    def get_partition_name(self, model, start):  # type: (Any, datetime.datetime) -> str
+        return '%s_p%s' % (model._meta.db_table, start.strftime(self.NAME_FORMATS[self.interval]))
+
+    def _parse_partition_name(self, model, name):  # type: (Any, str) -> Optional[datetime.datetime]
+        prefix = '%s_p' % model._meta.db_table
+        if not name.startswith(prefix):
+            return None
+
+        try:
+            return datetime.datetime.strptime(name[len(prefix):], self.NAME_FORMATS[self.interval])
+        except ValueError:
+            return None
+
+    def _to_db_value(self, model, value):  # type: (Any, datetime.datetime) -> datetime.date
+        field = self.get_field(model)
+        if not isinstance(field, models.DateTimeField):
+            return value.date()
+
+        return value.replace(tzinfo=datetime.timezone.utc)
+
+    @staticmethod
+    def _add_fk_sql(schema_editor, model, field, definition):  # type: (Any, Any, models.Field, str) -> str
+        # The same way, as BaseDatabaseSchemaEditor.table_sql() does: postgres has no inline foreign key template,
+        # so constraint is added by deferred ALTER TABLE, executed after table is created
+        remote_meta = field.remote_field.model._meta
+        if schema_editor.sql_create_inline_fk:
+            return definition + ' ' + schema_editor.sql_create_inline_fk % {
+                'to_table': schema_editor.quote_name(remote_meta.db_table),
+                'to_column': schema_editor.quote_name(remote_meta.get_field(field.remote_field.field_name).column)
+            }
+
+        if schema_editor.connection.features.supports_foreign_keys:
+            schema_editor.deferred_sql.append(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+
+        return definition
+
+    def get_table_sql(self, schema_editor, model):  # type: (Any, Any) -> Tuple[str, List[Any]]
+        """
+        Returns CREATE TABLE statement of partitioned table for the model.
+        Postgres requires primary key of partitioned table to contain partitioning column,
+        so primary key is composite: (pk, partitioning field). As pk column alone is not unique for postgres,
+        ForeignKey to partitioned model can't be created.
+        Foreign keys of the model are added to schema_editor.deferred_sql on postgres.
+        """
+        if model._meta.unique_together or model._meta.constraints:
+            raise ValueError('unique_together and Meta.constraints are not supported for partitioned models')
+
+        field = self.get_field(model)
+        connection = schema_editor.connection
+        qn = schema_editor.quote_name
+
+        column_sqls, params = [], []  # type: List[str], List[Any]
+        for model_field in model._meta.local_fields:
+            # Primary key is declared as a table constraint
+            column_field = model_field
+            if model_field.primary_key:
+                column_field = copy.copy(model_field)
+                column_field.primary_key = False
+
+            definition, extra_params = schema_editor.column_sql(model, column_field)
+            if definition is None:
+                continue
+
+            db_params = model_field.db_parameters(connection=connection)
+            if db_params.get('check'):
+                definition += ' ' + schema_editor.sql_check_constraint % db_params
+
+            # Identity or autoincrement
+            type_suffix = model_field.db_type_suffix(connection=connection)
+            if type_suffix:
+                definition += ' ' + type_suffix
+
+            if model_field.remote_field and model_field.db_constraint:
+                definition = self._add_fk_sql(schema_editor, model, model_field, definition)
+
+            column_sqls.append('%s %s' % (qn(model_field.column), definition))
+            params.extend(extra_params)
+
+        pk_columns = [qn(model._meta.pk.column)]
+        if not field.primary_key:
+            pk_columns.append(qn(field.column))
+        column_sqls.append('PRIMARY KEY (%s)' % ', '.join(pk_columns))
+
+        sql = schema_editor.sql_create_table % {'table': qn(model._meta.db_table), 'definition': ', '.join(column_sqls)}
+        return '%s PARTITION BY RANGE (%s)' % (sql, qn(field.column)), params
+
+    def get_partitions(self, model, using=DEFAULT_DB_ALIAS):  # type: (Any, str) -> List[Tuple[str, datetime.datetime]]
+        """
+        Returns a list of (partition name, period start) tuples, ordered by period start
+        """
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+                           'WHERE i.inhparent = %s::regclass', [connection.ops.quote_name(model._meta.db_table)])
+            names = [row[0] for row in cursor.fetchall()]
+
+        partitions = [(name, self._parse_partition_name(model, name)) for name in names]
+        return sorted(((name, start) for name, start in partitions if start is not None), key=lambda item: item[1])
+
+    def create_partitions(self, model, start=None, end=None, using=DEFAULT_DB_ALIAS):
+        # type: (Any, Optional[datetime.date], Optional[datetime.date], str) -> List[str]
+        """
+        Creates missing partitions for periods from start to end (inclusive)
+        :param model: Partitioned model
+        :param start: Date or datetime. Defaults to current time.
+        :param end: Date or datetime. Defaults to premake periods after current time.
+        :param using: Database alias
+        :return: A list of created partition names
+        """
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return []
+
+        now = self.get_period_start(timezone.now())
+        period_start = self.get_period_start(start) if start is not None else now
+        if end is not None:
+            last_start = self.get_period_start(end)
+        else:
+            last_start = now
+            for _ in range(self.premake):
+                last_start = self.get_next_period_start(last_start)
+
+        existing = {name for name, _ in self.get_partitions(model, using=using)}
+        qn = connection.ops.quote_name
+        created = []
+
+        with connection.cursor() as cursor:
+            while period_start <= last_start:
+                period_end = self.get_next_period_start(period_start)
+                name = self.get_partition_name(model, period_start)
+                if name not in existing:
+                    cursor.execute('CREATE TABLE IF NOT EXISTS %s PARTITION OF %s FOR VALUES FROM (%%s) TO (%%s)'
+                                   % (qn(name), qn(model._meta.db_table)),
+                                   [self._to_db_value(model, period_start), self._to_db_value(model, period_end)])
+                    created.append(name)
+
+                period_start = period_end
+
+        return created
+
+    def drop_expired_partitions(self, model, using=DEFAULT_DB_ALIAS):  # type: (Any, str) -> List[str]
+        """
+        Drops partitions, which periods ended earlier than retention ago
+        :return: A list of dropped partition names
+        """
+        connection = connections[using]
+        if self.retention is None or connection.vendor != 'postgresql':
+            return []
+
+        threshold = self.get_period_start(timezone.now() - self.retention)
+        dropped = []
+        with connection.cursor() as cursor:
+            for name, start in self.get_partitions(model, using=using):
+                if self.get_next_period_start(start) > threshold:
+                    break
+
+                cursor.execute('DROP TABLE %s' % connection.ops.quote_name(name))
+                dropped.append(name)
+
+        return dropped
+
+
+def maintain_partitions(model, using=DEFAULT_DB_ALIAS):  # type: (Any, str) -> Tuple[List[str], List[str]]
+    """
+    Creates future partitions and drops expired ones for the model with hll_partitioning attribute.
+    Should be run periodically, more often than partition interval.
+    :param model: Model with hll_partitioning attribute
+    :param using: Database alias
+    :return: A tuple of created and dropped partition names lists
+    """
+    partitioning = getattr(model, 'hll_partitioning', None)
+    if not isinstance(partitioning, TimePartitioning):
+        raise ValueError('Model %s has no hll_partitioning attribute' % model._meta.label)
+
+    return partitioning.create_partitions(model, using=using), partitioning.drop_expired_partitions(model, using=using)
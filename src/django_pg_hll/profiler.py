@@ -0,0 +1,209 @@
+"""
+Storage profiling of HllField columns and simulation of alternative hll parameters
+"""
+import math
+from itertools import product
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import connections
+from django.db.models import Func, IntegerField, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .sketch import HllSketch
+from .transforms import CardinalityTransform, TypeTransform
+
+__all__ = ['profile_hll_field']
+
+# Values, bigger than this size (in bytes) are moved to TOAST table by postgres
+TOAST_THRESHOLD = 2032
+
+# TABLESAMPLE percent is chosen to return this times more rows, than requested,
+# as SYSTEM sampling returns approximate number of rows and queryset filters reduce it further
+SAMPLE_OVERSAMPLING = 3
+
+TYPE_NAMES = {
+    HllSketch.UNDEFINED: 'UNDEFINED',
+    HllSketch.EMPTY: 'EMPTY',
+    HllSketch.EXPLICIT: 'EXPLICIT',
+    HllSketch.SPARSE: 'SPARSE',
+    HllSketch.FULL: 'FULL'
+}
+
+Params = Tuple[int, int, int, int]
+
+
+class ColumnSize(Func):
+    """
+    Size of stored value in bytes, after compression
+    """
+    function = 'pg_column_size'
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='length', **extra_context)
+
+
+def _percentile(sorted_values, percent):  # type: (List[float], float) -> Optional[float]
+    if not sorted_values:
+        return None
+
+    # Nearest-rank method
+    return sorted_values[max(0, int(math.ceil(len(sorted_values) * percent / 100.0)) - 1)]
+
+
+def estimate_size(cardinality, params):  # type: (float, Params) -> int
+    """
+    Estimates serialized hll size (in bytes) for given cardinality, as postgresql-hll chooses storage type.
+    Used for sketches, which can't be converted to params exactly.
+    """
+    sketch = HllSketch(*params)
+    if cardinality <= 0:
+        return 3
+
+    if cardinality <= sketch.explicit_cutoff:
+        return 3 + 8 * int(math.ceil(cardinality))
+
+    m = 1 << sketch.log2m
+    full_size = 3 + (sketch.regwidth * m + 7) // 8
+
+    # Expected number of non-zero registers
+    filled = m * (1.0 - math.exp(-cardinality / m))
+    sparse_size = 3 + int(math.ceil(filled * (sketch.log2m + sketch.regwidth) / 8.0))
+
+    return sparse_size if sketch.sparseon and sparse_size < full_size else full_size
+
+
+def _simulate(sketches, params):  # type: (List[HllSketch], Params) -> Dict[str, Any]
+    sizes, estimated = [], 0
+    for sketch in sketches:
+        try:
+            sizes.append(len(sketch.convert(*params).to_bytes()))
+        except ValueError:
+            sizes.append(estimate_size(sketch.cardinality() or 0, params))
+            estimated += 1
+
+    return {
+        'params': params,
+        'bytes': sum(sizes),
+        'toasted': sum(1 for size in sizes if size > TOAST_THRESHOLD),
+        'estimated': estimated,
+        # Standard error of cardinality estimation
+        'error': 1.04 / math.sqrt(1 << params[0])
+    }
+
+
+def _default_candidates(params):  # type: (Params) -> List[Params]
+    log2m, regwidth, _, _ = params
+    return [
+        (candidate_log2m, regwidth, expthresh, sparseon)
+        for candidate_log2m, expthresh, sparseon in product((log2m - 1, log2m, log2m + 1), (-1, 0), (1, 0))
+        if 4 <= candidate_log2m <= 31
+    ]
+
+
+def _get_toast_size(queryset):  # type: (QuerySet) -> Optional[int]
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_relation_size(reltoastrelid) FROM pg_class WHERE oid = %s::regclass "
+                       "AND reltoastrelid != 0", [connection.ops.quote_name(queryset.model._meta.db_table)])
+        row = cursor.fetchone()
+
+    return row[0] if row else 0
+
+
+def _get_sample(queryset, sample_size):  # type: (QuerySet, int) -> QuerySet
+    # ORDER BY random() reads and sorts the whole table. On postgres random pages are read with TABLESAMPLE SYSTEM,
+    # if table statistics is collected and sample is a small part of the table
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        meta = queryset.model._meta
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                           [connection.ops.quote_name(meta.db_table)])
+            row = cursor.fetchone()
+
+        # reltuples is -1 (0 before postgres 14), if table has never been analyzed
+        rows = row[0] if row else 0
+        percent = 100.0 * sample_size * SAMPLE_OVERSAMPLING / rows if rows > 0 else 100.0
+        if percent < 100.0:
+            sql = 'SELECT %s FROM %s TABLESAMPLE SYSTEM (%%s)' % (
+                connection.ops.quote_name(meta.pk.column), connection.ops.quote_name(meta.db_table))
+            return queryset.filter(pk__in=RawSQL(sql, [percent]))[:sample_size]
+
+    return queryset.order_by('?')[:sample_size]
+
+
+def profile_hll_field(queryset, field_name, sample_size=1000, candidates=None):
+    # type: (QuerySet, str, Optional[int], Optional[Iterable[Params]]) -> Dict[str, Any]
+    """
+    Samples HllField values and reports their storage statistics.
+    Then simulates storing the same values with alternative parameters.
+    :param queryset: QuerySet of rows to profile
+    :param field_name: HllField name
+    :param sample_size: Number of random rows to profile. None means all rows.
+        Postgres samples random table pages (TABLESAMPLE SYSTEM) of analyzed tables,
+        so rows are random, but neighbour rows are sampled together.
+    :param candidates: Iterable of (log2m, regwidth, expthresh, sparseon) tuples to simulate.
+        By default, field parameters with neighbour log2m and all expthresh auto/disabled and sparseon variants.
+    :return: Dictionary with keys:
+        rows: Number of rows sampled
+        params: Field parameters tuple
+        types: Dictionary of hll type name: number of rows
+        bytes: Total size of sampled values, as stored by database (after compression)
+        raw_bytes: Total size of sampled values before compression
+        toasted: Number of sampled values, bigger than TOAST threshold
+        toast_relation_bytes: Size of TOAST table (postgres only)
+        cardinality: Dictionary with min, max, mean, p50, p90 and p99 cardinality of sampled values
+        candidates: A list of dictionaries, ordered by bytes:
+            params, bytes (total raw size of sampled values), toasted,
+            estimated (number of values, which size was estimated, as they can't be converted exactly),
+            error (standard error of cardinality estimation)
+    """
+    field = queryset.model._meta.get_field(field_name)
+    params = field.params
+
+    sample = queryset.filter(**{'%s__isnull' % field_name: False}).annotate(
+        _hll_type=TypeTransform(field_name),
+        _hll_cardinality=CardinalityTransform(field_name),
+        _hll_size=ColumnSize(field_name)
+    )
+    if sample_size is not None:
+        sample = _get_sample(sample, sample_size)
+
+    types = {name: 0 for name in TYPE_NAMES.values()}
+    sketches, cardinalities, stored_bytes = [], [], 0
+    for value, hll_type, cardinality, size in sample.values_list(field_name, '_hll_type', '_hll_cardinality',
+                                                                 '_hll_size'):
+        sketch = HllSketch.from_bytes(value)
+        sketches.append(sketch)
+        types[TYPE_NAMES[hll_type]] += 1
+        stored_bytes += size
+        if cardinality is not None:
+            cardinalities.append(cardinality)
+
+    raw_sizes = [len(sketch.to_bytes()) for sketch in sketches]
+    cardinalities.sort()
+
+    return {
+        'rows': len(sketches),
+        'params': params,
+        'types': types,
+        'bytes': stored_bytes,
+        'raw_bytes': sum(raw_sizes),
+        'toasted': sum(1 for size in raw_sizes if size > TOAST_THRESHOLD),
+        'toast_relation_bytes': _get_toast_size(queryset),
+        'cardinality': {
+            'min': cardinalities[0] if cardinalities else None,
+            'max': cardinalities[-1] if cardinalities else None,
+            'mean': sum(cardinalities) / len(cardinalities) if cardinalities else None,
+            'p50': _percentile(cardinalities, 50),
+            'p90': _percentile(cardinalities, 90),
+            'p99': _percentile(cardinalities, 99)
+        },
+        'candidates': sorted((_simulate(sketches, tuple(candidate))
+                              for candidate in (candidates or _default_candidates(params))),
+                             key=lambda item: item['bytes'])
+    }
@@ -0,0 +1,215 @@
+"""
+Progressive union aggregation. Queryset is split into ranges of a field (primary key or time),
+UnionAgg of every range is queried concurrently and running union estimate is yielded after every range is done,
+so dashboards can show a refining estimate instead of waiting for the full aggregation.
+"""
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from django.db import DatabaseError, connections
+from django.db.models import Max, Min, Q, QuerySet
+
+from .aggregate import UnionAgg
+from .sharding import _to_bytes
+from .sketch import HllSketch
+
+__all__ = ['ProgressiveUnionResult', 'hll_progressive_union']
+
+
+# cardinality: Cardinality of union of completed ranges (0, if there is no data yet)
+# hll: Serialized union of completed ranges (bytes) or None, if there is no data yet
+# completed: Number of completed ranges
+# total: Total number of ranges
+ProgressiveUnionResult = namedtuple('ProgressiveUnionResult', ('cardinality', 'hll', 'completed', 'total'))
+
+# Seconds between cancel_event checks, while waiting for ranges
+CANCEL_POLL_INTERVAL = 0.05
+
+
+def _split_bounds(low, high, partitions):  # type: (Any, Any, int) -> List[Any]
+    # Inner bounds, splitting [low, high] into equal ranges. Works for numbers, dates and datetimes.
+    # Integer ranges are discrete, so high value is counted too
+    span = high - low
+    bounds = []  # type: List[Any]
+    for i in range(1, partitions):
+        bound = low + ((span + 1) * i // partitions if isinstance(span, int) else span * i / partitions)
+        if bound > low and (not bounds or bound > bounds[-1]):
+            bounds.append(bound)
+
+    return bounds
+
+
+def _get_ranges(queryset, split_field, bounds):  # type: (QuerySet, str, Sequence[Any]) -> List[Q]
+    # Ranges are open at both ends, so rows out of bounds (or inserted after bounds were computed) are not lost.
+    # Rows with NULL split field value are included to the first range.
+    if not bounds:
+        return [Q()]
+
+    ranges = [Q(**{'%s__lt' % split_field: bounds[0]}) | Q(**{'%s__isnull' % split_field: True})]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        ranges.append(Q(**{'%s__gte' % split_field: start, '%s__lt' % split_field: end}))
+    ranges.append(Q(**{'%s__gte' % split_field: bounds[-1]}))
+
+    return ranges
+
+
+def _cancel_query(connection):  # type: (Any) -> None
+    # Interrupts query, executed by connection in another thread (psycopg cancel(), sqlite3 interrupt())
+    raw_connection = connection.connection
+    if raw_connection is None:
+        return
+
+    cancel = getattr(raw_connection, 'cancel', None) or getattr(raw_connection, 'interrupt', None)
+    if cancel is not None:
+        try:
+            cancel()
+        except Exception:
+            # Cancellation is best effort: query may be already finished or connection closed
+            pass
+
+
+def _range_union(queryset, field_name, running, cancelled):
+    # type: (QuerySet, str, Dict[int, Any], threading.Event) -> Optional[bytes]
+    connection = connections[queryset.db]
+    ident = threading.get_ident()
+
+    # Connection is registered before cancelled check, so cancellation either skips the query or interrupts it
+    running[ident] = connection
+    try:
+        if cancelled.is_set():
+            return None
+
+        return _to_bytes(queryset.aggregate(_union=UnionAgg(field_name))['_union'])
+    except DatabaseError:
+        if cancelled.is_set():
+            return None
+        raise
+    finally:
+        running.pop(ident, None)
+        # Connections are thread local. Connection opened by worker thread should not be left open
+        connection.close()
+
+
+def _is_cancelled(cancel_event):  # type: (Optional[threading.Event]) -> bool
+    return cancel_event is not None and cancel_event.is_set()
+
+
+def _get_workers(queryset, workers):  # type: (QuerySet, int) -> int
+    connection = connections[queryset.db]
+    if connection.in_atomic_block:
+        # Worker threads open their own connections, which don't see uncommitted changes of current transaction
+        # and read different snapshots. Ranges are queried in current transaction to get consistent result
+        return 1
+
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        # Connections to in-memory database share the cache. Python hll functions (see sqlite module),
+        # executed by concurrent connections, deadlock on it
+        return 1
+
+    return workers
+
+
+def _serial_unions(querysets, field_name, cancel_event):
+    # type: (List[QuerySet], str, Optional[threading.Event]) -> Iterator[Optional[bytes]]
+    # Ranges are queried one by one in current thread
+    for range_queryset in querysets:
+        if _is_cancelled(cancel_event):
+            return
+
+        yield _to_bytes(range_queryset.aggregate(_union=UnionAgg(field_name))['_union'])
+
+
+def _parallel_unions(querysets, field_name, workers, cancel_event):
+    # type: (List[QuerySet], str, int, Optional[threading.Event]) -> Iterator[Optional[bytes]]
+    # Ranges are queried concurrently, unions are yielded in order of completion
+    running = {}  # type: Dict[int, Any]
+    cancelled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(_range_union, range_queryset, field_name, running, cancelled)
+               for range_queryset in querysets]
+
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED,
+                                 timeout=None if cancel_event is None else CANCEL_POLL_INTERVAL)
+            for future in done:
+                if _is_cancelled(cancel_event):
+                    return
+
+                yield future.result()
+
+            if _is_cancelled(cancel_event):
+                return
+    finally:
+        # Generator is finished, closed or failed. Pending ranges are not needed anymore
+        cancelled.set()
+        for future in futures:
+            future.cancel()
+        for connection in list(running.values()):
+            _cancel_query(connection)
+        executor.shutdown(wait=False)
+
+
+def hll_progressive_union(queryset, field_name, split_field='pk', partitions=8, bounds=None, workers=4,
+                          cancel_event=None):
+    # type: (QuerySet, str, str, int, Optional[Sequence[Any]], int, Optional[threading.Event]) -> Iterator[Any]
+    """
+    Generator, splitting queryset into ranges of split_field and querying UnionAgg of every range in parallel.
+    ProgressiveUnionResult with running union of completed ranges is yielded after every range is done,
+    the last one contains the union of the whole queryset.
+    Running estimate is a cardinality of rows, seen so far: it is not extrapolated to the rest of ranges.
+    Closing the generator (generator.close(), or StreamingHttpResponse closing, when client disconnects)
+    or setting cancel_event cancels pending ranges and interrupts running queries.
+
+    for result in hll_progressive_union(MyModel.objects.all(), 'hll_field', split_field='date'):
+        print('%d of %d: %d' % (result.completed, result.total, result.cardinality))
+
+    :param queryset: QuerySet of rows to unite
+    :param field_name: HllField name
+    :param split_field: Field to split queryset by: primary key, integer, date or datetime field.
+        Should be indexed, so every range is read separately.
+    :param partitions: Number of equal ranges between minimum and maximum split_field values of queryset
+    :param bounds: Explicit sorted inner bounds of ranges (month starts, for instance).
+        Minimum and maximum are not queried, if given. partitions is ignored.
+    :param workers: Number of threads to query ranges in. 1 means, that ranges are queried one by one in current thread.
+        Every thread queries its range in a separate connection and transaction (snapshot), so running result
+        is not a consistent snapshot of the table. Ranges are queried in current thread
+        inside transaction.atomic() (including ATOMIC_REQUESTS and TestCase) and on in-memory SQLite databases.
+    :param cancel_event: threading.Event, which stops the generator, when it is set from another thread
+    :return: Iterator of ProgressiveUnionResult
+    """
+    if partitions <= 0:
+        raise ValueError('partitions must be positive')
+
+    if workers <= 0:
+        raise ValueError('workers must be positive')
+
+    if bounds is None:
+        limits = queryset.aggregate(_low=Min(split_field), _high=Max(split_field))
+        bounds = [] if limits['_low'] is None else _split_bounds(limits['_low'], limits['_high'], partitions)
+
+    querysets = [queryset.filter(condition) for condition in _get_ranges(queryset, split_field, bounds)]
+    if _get_workers(queryset, workers) == 1:
+        unions = _serial_unions(querysets, field_name, cancel_event)
+    else:
+        unions = _parallel_unions(querysets, field_name, workers, cancel_event)
+
+    sketch = None  # type: Optional[HllSketch]
+    try:
+        for completed, data in enumerate(unions, start=1):
+            if data is not None:
+                if sketch is None:
+                    sketch = HllSketch.from_bytes(data)
+                else:
+                    sketch.union_update_bytes(data)
+
+            if sketch is None:
+                yield ProgressiveUnionResult(0, None, completed, len(querysets))
+            else:
+                yield ProgressiveUnionResult(sketch.cardinality(), sketch.to_bytes(), completed, len(querysets))
+    finally:
+        # Pending ranges are cancelled, when this generator is closed
+        unions.close()
@@ -0,0 +1,174 @@
+"""
+Routing of read-only hll analytics queries (cardinality, unions, hll transforms) to read replicas.
+Such queries are heavy, but tolerate slight replication lag, so they can be moved off the primary database.
+"""
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+from django.db.models import Manager, QuerySet
+
+__all__ = ['HllManager', 'HllQuerySet', 'HllReplicaRouter', 'hll_analytics']
+
+# Router hint, marking hll analytics queries
+HLL_ANALYTICS_HINT = 'hll_analytics'
+
+# Replica lag in seconds. Replica, which has replayed all received WAL, is not lagging, even if primary is idle.
+REPLICA_LAG_SQL = 'SELECT CASE WHEN NOT pg_is_in_recovery() ' \
+                  'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 ' \
+                  'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+
+
+def _contains_hll(expression):  # type: (Any) -> bool
+    """
+    Searches expression tree (including WhereNode and lookups) for hll functions and transforms
+    """
+    if expression is None or isinstance(expression, (str, bytes, int, float)):
+        return False
+
+    function = getattr(expression, 'function', None)
+    if isinstance(function, str) and function.startswith('hll_'):
+        return True
+
+    children = getattr(expression, 'children', None)
+    if children is not None:
+        return any(_contains_hll(child) for child in children)
+
+    sources = expression.get_source_expressions() if hasattr(expression, 'get_source_expressions') else []
+    sources += [getattr(expression, attr, None) for attr in ('lhs', 'rhs')]
+    return any(_contains_hll(source) for source in sources)
+
+
+def hll_analytics(queryset):  # type: (QuerySet) -> QuerySet
+    """
+    Marks queryset as hll analytics query, so HllReplicaRouter sends it to replica.
+    Required for plain querysets only: HllQuerySet detects hll queries itself.
+    :param queryset: QuerySet to mark
+    :return: A copy of queryset
+    """
+    clone = queryset.all()
+    clone._hints = dict(clone._hints, **{HLL_ANALYTICS_HINT: True})
+    return clone
+
+
+class HllQuerySet(QuerySet):
+    """
+    QuerySet, which passes hll_analytics hint to database routers, if it aggregates, annotates
+    or filters by hll functions. Explicit using() always has priority.
+
+    class MyModel(models.Model):
+        hll = HllField()
+
+        objects = HllManager()
+
+    MyModel.objects.aggregate(card=UnionAggCardinality('hll'))  # Read by replica, if HllReplicaRouter is configured
+    """
+    def _is_hll_analytics(self):  # type: () -> bool
+        if self._hints.get(HLL_ANALYTICS_HINT):
+            return True
+
+        query = self.query
+        return any(_contains_hll(annotation) for annotation in query.annotations.values()) \
+            or _contains_hll(query.where)
+
+    @property
+    def db(self):  # type: () -> str
+        if self._db is None and not self._for_write and self._is_hll_analytics():
+            return router.db_for_read(self.model, **dict(self._hints, **{HLL_ANALYTICS_HINT: True}))
+
+        return super(HllQuerySet, self).db
+
+    def hll_analytics(self):  # type: () -> HllQuerySet
+        """
+        Marks queryset as hll analytics query explicitly. See hll_analytics().
+        """
+        return hll_analytics(self)
+
+    def aggregate(self, *args, **kwargs):
+        # Aggregates are added to a copy of query, so they are not visible to db property
+        if any(_contains_hll(expression) for expression in list(args) + list(kwargs.values())):
+            return super(HllQuerySet, hll_analytics(self)).aggregate(*args, **kwargs)
+
+        return super(HllQuerySet, self).aggregate(*args, **kwargs)
+
+
+HllManager = Manager.from_queryset(HllQuerySet)
+
+
+class HllReplicaRouter:
+    """
+    Database router, sending hll analytics queries (see HllQuerySet and hll_analytics()) to replicas.
+    Replica is used only if it is available and its lag doesn't exceed max_lag.
+    Otherwise, router returns None and the query is routed by the next routers (primary database by default).
+    Replica states are checked at most once in check_interval seconds.
+
+    DATABASE_ROUTERS = ['django_pg_hll.routers.HllReplicaRouter']
+    HLL_REPLICA_DATABASES = ['replica1', 'replica2']
+    HLL_REPLICA_MAX_LAG = 30  # Seconds, None disables lag check
+    HLL_REPLICA_CHECK_INTERVAL = 5  # Seconds
+    """
+    def __init__(self, replicas=None, max_lag=None, check_interval=None):
+        # type: (Optional[Sequence[str]], Optional[float], Optional[float]) -> None
+        """
+        :param replicas: Database aliases of replicas. Defaults to HLL_REPLICA_DATABASES setting.
+        :param max_lag: Maximum replication lag in seconds. Defaults to HLL_REPLICA_MAX_LAG setting.
+        :param check_interval: Seconds to cache replica state for. Defaults to HLL_REPLICA_CHECK_INTERVAL setting or 5.
+        """
+        self.replicas = tuple(replicas if replicas is not None else getattr(settings, 'HLL_REPLICA_DATABASES', ()))
+        self.max_lag = max_lag if max_lag is not None else getattr(settings, 'HLL_REPLICA_MAX_LAG', None)
+        self.check_interval = check_interval if check_interval is not None \
+            else getattr(settings, 'HLL_REPLICA_CHECK_INTERVAL', 5)
+
+        self._states = {}  # type: Dict[str, Tuple[float, bool]]
+        self._lock = threading.Lock()
+
+    def get_lag(self, using):  # type: (str) -> float
+        """
+        Returns replication lag of the database in seconds. Databases, other than postgres, are not lagging.
+        :raises DatabaseError: If database is not available
+        """
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            connection.ensure_connection()
+            return 0.0
+
+        with connection.cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            return float(cursor.fetchone()[0])
+
+    def is_available(self, using):  # type: (str) -> bool
+        """
+        Checks if replica is available and not lagging more than max_lag. Result is cached for check_interval seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            checked, available = self._states.get(using, (None, False))
+            if checked is not None and now - checked < self.check_interval:
+                return available
+
+        try:
+            lag = self.get_lag(using)
+            available = self.max_lag is None or lag <= self.max_lag
+        except DatabaseError:
+            available = False
+
+        with self._lock:
+            self._states[using] = (now, available)
+
+        return available
+
+    def get_replica(self):  # type: () -> Optional[str]
+        """
+        Returns random available replica alias or None, if all replicas are lagging or down
+        """
+        available = [alias for alias in self.replicas if self.is_available(alias)]
+        return random.choice(available) if available else None
+
+    def db_for_read(self, model, **hints):  # type: (Any, **Any) -> Optional[str]
+        if not hints.get(HLL_ANALYTICS_HINT):
+            return None
+
+        return self.get_replica()
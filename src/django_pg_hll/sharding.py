@@ -0,0 +1,123 @@
+"""
+Union aggregation over tables, sharded across multiple databases (DATABASES aliases)
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.sql import Query
+
+from .aggregate import UnionAgg
+from .compatibility import string_types
+from .sketch import HllSketch
+from .values import HllCombinedExpression, HllFromHex
+
+__all__ = ['ShardedUnionResult', 'sharded_union']
+
+
+# cardinality: Cardinality of union of all shards (0, if there is no data)
+# hll: Serialized hll union (bytes) or None, if there is no data
+# timings: Dictionary of database alias: seconds, spent to get shard union
+ShardedUnionResult = namedtuple('ShardedUnionResult', ('cardinality', 'hll', 'timings'))
+
+MERGE_LOCAL = 'local'
+MERGE_DATABASE = 'database'
+
+
+def _to_bytes(value):  # type: (Any) -> Optional[bytes]
+    # Database drivers return binary data as bytes, memoryview or hex string, prefixed by \x
+    if value is None:
+        return None
+
+    if isinstance(value, string_types):
+        return bytes.fromhex(value[2:])
+
+    return bytes(value)
+
+
+def _shard_union(queryset, field_name, using, close_connection):
+    # type: (QuerySet, str, str, bool) -> Tuple[Optional[bytes], float]
+    start = time.monotonic()
+    try:
+        result = queryset.using(using).aggregate(_union=UnionAgg(field_name))['_union']
+    finally:
+        # Connections are thread local. Connection opened by worker thread should not be left open
+        if close_connection:
+            connections[using].close()
+
+    return _to_bytes(result), time.monotonic() - start
+
+
+def _merge_local(partials):  # type: (List[bytes]) -> Tuple[bytes, float]
+    sketch = HllSketch.from_bytes(partials[0])
+    for data in partials[1:]:
+        sketch.union_update(HllSketch.from_bytes(data))
+
+    return sketch.to_bytes(), sketch.cardinality()
+
+
+def _merge_database(model, partials, using):  # type: (Any, List[bytes], str) -> Tuple[bytes, float]
+    expression = HllFromHex(partials[0])
+    for data in partials[1:]:
+        expression = HllCombinedExpression(expression, HllCombinedExpression.CONCAT, HllFromHex(data))
+
+    compiler = Query(model).get_compiler(using=using)
+    sql, params = compiler.compile(expression)
+
+    with connections[using].cursor() as cursor:
+        # Partial hlls are sent once: the union is computed in subquery and its cardinality is taken from it
+        cursor.execute('SELECT _hll_union, hll_cardinality(_hll_union) FROM (SELECT %s AS _hll_union) _hll_merged'
+                       % sql, params)
+        union, cardinality = cursor.fetchone()
+
+    return _to_bytes(union), cardinality
+
+
+def sharded_union(queryset, field_name, databases, merge=MERGE_LOCAL, merge_using=None, workers=None):
+    # type: (QuerySet, str, Sequence[str], str, Optional[str], Optional[int]) -> ShardedUnionResult
+    """
+    Runs UnionAgg of queryset field on every database concurrently and unites partial results.
+    :param queryset: QuerySet of rows to unite. It is executed on every database from databases
+    :param field_name: HllField name
+    :param databases: Database aliases, containing shards
+    :param merge: How to unite partial results:
+        'local' decodes hlls and unites registers in python (see HllSketch).
+        'database' sends partial hlls to merge_using database and unites them with hll functions
+    :param merge_using: Database alias to merge on, if merge='database'. Defaults to the first of databases
+    :param workers: Number of threads to query databases in. Defaults to number of databases.
+        1 means, that databases are queried one by one in current thread.
+    :return: ShardedUnionResult instance
+    """
+    if merge not in (MERGE_LOCAL, MERGE_DATABASE):
+        raise ValueError("merge must be one of '%s', '%s'" % (MERGE_LOCAL, MERGE_DATABASE))
+
+    if not databases:
+        raise ValueError('At least one database is required')
+
+    workers = workers or len(databases)
+    timings = {}  # type: Dict[str, float]
+    partials = []  # type: List[bytes]
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda using: _shard_union(queryset, field_name, using, True), databases))
+    else:
+        results = [_shard_union(queryset, field_name, using, False) for using in databases]
+
+    for using, (data, seconds) in zip(databases, results):
+        timings[using] = seconds
+        if data is not None:
+            partials.append(data)
+
+    if not partials:
+        return ShardedUnionResult(0, None, timings)
+
+    if merge == MERGE_LOCAL:
+        union, cardinality = _merge_local(partials)
+    else:
+        union, cardinality = _merge_database(queryset.model, partials, merge_using or databases[0])
+
+    return ShardedUnionResult(cardinality, union, timings)
@@ -0,0 +1,667 @@
+"""
+This file contains python implementation of postgresql-hll data structure.
+It is binary compatible with postgresql-hll storage format (see
+https://github.com/aggregateknowledge/hll-storage-spec/blob/v1.0.0/STORAGE.md)
+and hashes values the same way hll_hash_* functions do, so sketches can be built locally and saved to HllField.
+"""
+import math
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Iterable, Optional, Tuple, Union
+
+from .compatibility import string_types
+from .utils import chunks
+
+__all__ = ['HllSketch', 'build_sketch']
+
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_C1 = 0x87c37b91114253d5
+_C2 = 0x4cf5ad432745937f
+
+
+def _rotl64(x, r):  # type: (int, int) -> int
+    return ((x << r) | (x >> (64 - r))) & _MASK64
+
+
+def _fmix64(k):  # type: (int) -> int
+    k ^= k >> 33
+    k = (k * 0xff51afd7ed558ccd) & _MASK64
+    k ^= k >> 33
+    k = (k * 0xc4ceb9fe1a85ec53) & _MASK64
+    k ^= k >> 33
+    return k
+
+
+def murmurhash3_x64_128(data, seed=0):  # type: (bytes, int) -> Tuple[int, int]
+    """
+    MurmurHash3_x64_128 implementation, used by postgresql-hll
+    :param data: Bytes to hash
+    :param seed: Hash seed. postgresql-hll passes it as unsigned 32-bit integer
+    :return: A tuple of two unsigned 64-bit integers
+    """
+    length = len(data)
+    nblocks = length // 16
+    h1 = h2 = seed & 0xFFFFFFFF
+
+    for i in range(nblocks):
+        k1, k2 = struct.unpack_from('<QQ', data, i * 16)
+
+        k1 = _rotl64((k1 * _C1) & _MASK64, 31)
+        h1 ^= (k1 * _C2) & _MASK64
+        h1 = (((_rotl64(h1, 27) + h2) & _MASK64) * 5 + 0x52dce729) & _MASK64
+
+        k2 = _rotl64((k2 * _C2) & _MASK64, 33)
+        h2 ^= (k2 * _C1) & _MASK64
+        h2 = (((_rotl64(h2, 31) + h1) & _MASK64) * 5 + 0x38495ab5) & _MASK64
+
+    tail = data[nblocks * 16:]
+    if len(tail) > 8:
+        k2 = _rotl64((int.from_bytes(tail[8:], 'little') * _C2) & _MASK64, 33)
+        h2 ^= (k2 * _C1) & _MASK64
+    if tail:
+        k1 = _rotl64((int.from_bytes(tail[:8], 'little') * _C1) & _MASK64, 31)
+        h1 ^= (k1 * _C2) & _MASK64
+
+    h1 ^= length
+    h2 ^= length
+    h1 = (h1 + h2) & _MASK64
+    h2 = (h2 + h1) & _MASK64
+    h1 = _fmix64(h1)
+    h2 = _fmix64(h2)
+    h1 = (h1 + h2) & _MASK64
+    h2 = (h2 + h1) & _MASK64
+
+    return h1, h2
+
+
+# Converts value to bytes, the same way corresponding hll_hash_* function sees it
+_VALUE_ENCODERS = {
+    'boolean': lambda val: b'\x01' if val else b'\x00',
+    'smallint': struct.Struct('<h').pack,
+    'integer': struct.Struct('<i').pack,
+    'bigint': struct.Struct('<q').pack,
+    'bytea': bytes,
+    'text': lambda val: val.encode('utf-8')
+}
+
+# !!! Order is important here!!! It is the same, as HllDataValue.parse_data uses
+_INTEGER_TYPES = (
+    ('smallint', -32768, 32767),
+    ('integer', -2147483648, 2147483647),
+    ('bigint', -9223372036854775808, 9223372036854775807)
+)
+
+
+def _detect_db_type(value):  # type: (Any) -> str
+    """
+    Detects hash function for python value, the same way HllDataValue.parse_data does
+    :param value: Value to detect type for
+    :return: Hash function argument type
+    """
+    if type(value) is bool:
+        return 'boolean'
+
+    if type(value) is int:
+        for db_type, min_val, max_val in _INTEGER_TYPES:
+            if min_val <= value <= max_val:
+                return db_type
+
+    if isinstance(value, bytes):
+        return 'bytea'
+
+    if isinstance(value, string_types):
+        return 'text'
+
+    raise ValueError('Value of type %s can not be hashed locally' % str(type(value)))
+
+
+def hash_value(value, db_type=None, hash_seed=0):  # type: (Any, Optional[str], int) -> int
+    """
+    Hashes value the same way hll_hash_* functions do
+    :param value: Value to hash
+    :param db_type: Hash function type (boolean, smallint, integer, bigint, bytea, text).
+        If not given, it is detected from value the same way HllDataValue.parse_data does.
+    :param hash_seed: Optional hash seed
+    :return: Signed 64-bit hash value, as hll_hashval is
+    """
+    if db_type is None:
+        db_type = _detect_db_type(value)
+
+    if db_type not in _VALUE_ENCODERS:
+        raise ValueError('Hashing %s values locally is not supported' % db_type)
+
+    hashval = murmurhash3_x64_128(_VALUE_ENCODERS[db_type](value), hash_seed)[0]
+    return hashval - (1 << 64) if hashval >= (1 << 63) else hashval
+
+
+def _pack_bits(values, width):  # type: (Iterable[int], int) -> bytes
+    """
+    Packs integers of given bit width to bytes, most significant bit first. Last byte is padded with zeros.
+    """
+    bits = ''.join(format(val, '0%db' % width) for val in values)
+    if not bits:
+        return b''
+
+    bits += '0' * (-len(bits) % 8)
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+
+def _unpack_bits(data, width, count):  # type: (bytes, int, int) -> Iterable[int]
+    """
+    Unpacks count integers of given bit width, packed with _pack_bits
+    """
+    if not data or not count:
+        return []
+
+    bits = format(int.from_bytes(data, 'big'), '0%db' % (len(data) * 8))
+    return [int(bits[i * width:(i + 1) * width], 2) for i in range(count)]
+
+
+class HllSketch:
+    """
+    Local hll data structure, compatible with postgresql-hll.
+    It can be built from values, deserialized from HllField data and saved to HllField.
+    """
+    SCHEMA_VERSION = 1
+
+    # Storage types. The same values are returned by hll_type() database function
+    UNDEFINED = 0
+    EMPTY = 1
+    EXPLICIT = 2
+    SPARSE = 3
+    FULL = 4
+
+    def __init__(self, log2m=11, regwidth=5, expthresh=-1, sparseon=1):  # type: (int, int, int, int) -> None
+        """
+        Creates empty sketch. Parameters have the same meaning and defaults, as hll_empty() parameters have.
+        :param log2m: The log-base-2 of the number of registers
+        :param regwidth: The number of bits used per register
+        :param expthresh: EXPLICIT representation cutoff. -1 means auto, 0 disables EXPLICIT representation.
+        :param sparseon: 1 enables SPARSE representation, 0 disables it
+        """
+        if not 0 <= log2m <= 31:
+            raise ValueError('log2m must be between 0 and 31')
+
+        if not 1 <= regwidth <= 8:
+            raise ValueError('regwidth must be between 1 and 8')
+
+        if expthresh not in (-1, 0) and (expthresh < 0 or expthresh & (expthresh - 1)):
+            raise ValueError('expthresh must be -1, 0 or a power of 2')
+
+        if sparseon not in (0, 1):
+            raise ValueError('sparseon must be 0 or 1')
+
+        self.log2m = log2m
+        self.regwidth = regwidth
+        self.expthresh = expthresh
+        self.sparseon = sparseon
+
+        self._undefined = False
+
+        # Unsigned 64-bit hash values. Used in EMPTY and EXPLICIT representation.
+        self._explicit = set()
+
+        # Register values. Used in SPARSE and FULL representation. None, if sketch is not compressed yet.
+        self._registers = None  # type: Optional[bytearray]
+
+    @property
+    def params(self):  # type: () -> Tuple[int, int, int, int]
+        return self.log2m, self.regwidth, self.expthresh, self.sparseon
+
+    @property
+    def max_register_value(self):  # type: () -> int
+        return (1 << self.regwidth) - 1
+
+    @property
+    def explicit_cutoff(self):  # type: () -> int
+        """
+        Effective number of values stored in EXPLICIT representation before promoting it
+        """
+        if self.expthresh == -1:
+            # Auto: as many values, as fit into FULL representation size
+            return (((self.regwidth << self.log2m) + 7) // 8) // 8
+
+        return self.expthresh
+
+    @property
+    def registers(self):  # type: () -> bytearray
+        """
+        Register values of the sketch. EMPTY and EXPLICIT sketches are converted to registers on the fly.
+        """
+        if self._registers is not None:
+            return self._registers
+
+        registers = bytearray(1 << self.log2m)
+        for hashval in self._explicit:
+            self._add_to_registers(registers, hashval)
+
+        return registers
+
+    @property
+    def type(self):  # type: () -> int
+        """
+        Storage type of serialized sketch. The same, as hll_type() database function returns.
+        """
+        if self._undefined:
+            return self.UNDEFINED
+
+        if self._registers is not None:
+            return self.SPARSE if self._use_sparse() else self.FULL
+
+        return self.EXPLICIT if self._explicit else self.EMPTY
+
+    def copy(self):  # type: () -> HllSketch
+        result = self.__class__(*self.params)
+        result._undefined = self._undefined
+        result._explicit = set(self._explicit)
+        result._registers = bytearray(self._registers) if self._registers is not None else None
+        return result
+
+    def _add_to_registers(self, registers, hashval):  # type: (bytearray, int) -> None
+        index = hashval & ((1 << self.log2m) - 1)
+        substream = hashval >> self.log2m
+
+        # Position of the lowest set bit (starting from 1) of the rest of the hash value
+        value = (substream & -substream).bit_length()
+        value = min(value, self.max_register_value)
+
+        if registers[index] < value:
+            registers[index] = value
+
+    def _promote(self):  # type: () -> None
+        self._registers = self.registers
+        self._explicit = set()
+
+    def add_hash(self, hashval):  # type: (int) -> None
+        """
+        Adds hash value (as hll_hash_* functions return) to sketch
+        :param hashval: Signed or unsigned 64-bit integer
+        :return: None
+        """
+        hashval &= _MASK64
+
+        if self._undefined:
+            return
+
+        if self._registers is not None:
+            self._add_to_registers(self._registers, hashval)
+        elif hashval not in self._explicit:
+            if len(self._explicit) < self.explicit_cutoff:
+                self._explicit.add(hashval)
+            else:
+                self._promote()
+                self._add_to_registers(self._registers, hashval)
+
+    def add(self, value, db_type=None, hash_seed=0):  # type: (Any, Optional[str], int) -> None
+        """
+        Hashes value the same way hll_hash_* functions do and adds it to sketch
+        :param value: Value to add
+        :param db_type: Hash function type (boolean, smallint, integer, bigint, bytea, text).
+            If not given, it is detected from value the same way HllDataValue.parse_data does.
+        :param hash_seed: Optional hash seed
+        :return: None
+        """
+        self.add_hash(hash_value(value, db_type=db_type, hash_seed=hash_seed))
+
+    def update(self, values, db_type=None, hash_seed=0):  # type: (Iterable[Any], Optional[str], int) -> None
+        """
+        Adds all values from iterable to sketch. See add() for parameters description.
+        """
+        for value in values:
+            self.add(value, db_type=db_type, hash_seed=hash_seed)
+
+    def union_update(self, other, fold_registers=False):  # type: (HllSketch, bool) -> None
+        """
+        Unions other sketch into this one, as hll_union() does
+        :param other: HllSketch with the same parameters
+        :param fold_registers: Convert other sketch with different parameters to parameters of this one
+            instead of raising ValueError. Other sketch log2m should not be less than this sketch log2m.
+            See convert() for details.
+        :return: None
+        """
+        if self.params != other.params:
+            if not fold_registers:
+                raise ValueError('Sketch parameters do not match: %s and %s' % (self.params, other.params))
+
+            other = other.convert(*self.params)
+
+        if self._undefined or other._undefined:
+            self._undefined = True
+            self._explicit, self._registers = set(), None
+        elif other._registers is not None:
+            if self._registers is None:
+                self._promote()
+            self._registers[:] = bytes(map(max, self._registers, other._registers))
+        else:
+            for hashval in other._explicit:
+                self.add_hash(hashval)
+
+    def convert(self, log2m=None, regwidth=None, expthresh=None, sparseon=None):
+        # type: (Optional[int], Optional[int], Optional[int], Optional[int]) -> HllSketch
+        """
+        Converts sketch to other parameters. postgresql-hll can't unite hlls with different parameters,
+        so this can be done only locally. Parameters, which are not given, are kept as is.
+        EMPTY and EXPLICIT sketches are converted exactly, as they contain hash values.
+        Registers are capped to new regwidth. If log2m is decreased, registers are folded:
+        the result is the same, as if hash values were added to a sketch with lower log2m
+        (except for registers, saturated at max register value). log2m of registers can't be increased.
+        :return: New HllSketch instance
+        """
+        result = self.__class__(self.log2m if log2m is None else log2m,
+                                self.regwidth if regwidth is None else regwidth,
+                                self.expthresh if expthresh is None else expthresh,
+                                self.sparseon if sparseon is None else sparseon)
+
+        if self._undefined:
+            result._undefined = True
+        elif self._registers is None:
+            for hashval in self._explicit:
+                result.add_hash(hashval)
+        elif result.log2m > self.log2m:
+            raise ValueError("Can't increase log2m of sketch in %s representation"
+                             % ('SPARSE' if self.type == self.SPARSE else 'FULL'))
+        else:
+            registers = self._registers if result.log2m == self.log2m else self._fold_registers(result.log2m)
+            result._registers = bytearray(min(val, result.max_register_value) for val in registers)
+
+        return result
+
+    def _fold_registers(self, log2m):  # type: (int) -> bytearray
+        """
+        Folds registers to lower log2m. Register index bits, which don't fit new log2m,
+        become the lowest bits of the rest of the hash value, register value is counted from.
+        """
+        shift = self.log2m - log2m
+        mask = (1 << log2m) - 1
+        registers = bytearray(1 << log2m)
+
+        for index, value in enumerate(self._registers):
+            if not value:
+                continue
+
+            high = index >> log2m
+            value = (high & -high).bit_length() if high else value + shift
+            if value > registers[index & mask]:
+                registers[index & mask] = value
+
+        return registers
+
+    def union(self, other):  # type: (HllSketch) -> HllSketch
+        result = self.copy()
+        result.union_update(other)
+        return result
+
+    def __or__(self, other):  # type: (HllSketch) -> HllSketch
+        return self.union(other)
+
+    def __eq__(self, other):
+        return isinstance(other, HllSketch) and self.to_bytes() == other.to_bytes()
+
+    def cardinality(self):  # type: () -> Optional[float]
+        """
+        Estimates cardinality the same way hll_cardinality() does
+        :return: Cardinality estimation. None for UNDEFINED sketch
+        """
+        if self._undefined:
+            return None
+
+        if self._registers is None:
+            return float(len(self._explicit))
+
+        m = 1 << self.log2m
+        alpha = {4: 0.673, 5: 0.697, 6: 0.709}.get(self.log2m, 0.7213 / (1.0 + 1.079 / m))
+
+        total = sum(2.0 ** -val for val in self._registers)
+        zeros = self._registers.count(0)
+
+        estimator = alpha * m * m / total
+        two_to_l = float(1 << (self.max_register_value - 1 + self.log2m))
+
+        if zeros and estimator < 5.0 * m / 2.0:
+            return m * math.log(float(m) / zeros)
+
+        if estimator <= two_to_l / 30.0:
+            return estimator
+
+        # Sketch is saturated. postgresql-hll gets the same results from C log() function here
+        ratio = 1.0 - estimator / two_to_l
+        if ratio <= 0:
+            return float('inf') if ratio == 0 else float('nan')
+
+        return -two_to_l * math.log(ratio)
+
+    def _use_sparse(self):  # type: () -> bool
+        filled = len(self._registers) - self._registers.count(0)
+        sparse_size = (filled * (self.log2m + self.regwidth) + 7) // 8
+        full_size = ((self.regwidth << self.log2m) + 7) // 8
+        return bool(self.sparseon) and sparse_size < full_size
+
+    def to_bytes(self):  # type: () -> bytes
+        """
+        Serializes sketch to postgresql-hll storage format
+        :return: Bytes, which can be saved to HllField
+        """
+        sketch_type = self.type
+
+        if self.expthresh == -1:
+            cutoff = 63
+        elif self.expthresh == 0:
+            cutoff = 0
+        else:
+            cutoff = self.expthresh.bit_length()
+
+        header = bytes((
+            (self.SCHEMA_VERSION << 4) | sketch_type,
+            ((self.regwidth - 1) << 5) | self.log2m,
+            (self.sparseon << 6) | cutoff
+        ))
+
+        if sketch_type == self.EXPLICIT:
+            values = sorted(val - (1 << 64) if val >= (1 << 63) else val for val in self._explicit)
+            data = struct.pack('>%dq' % len(values), *values)
+        elif sketch_type == self.SPARSE:
+            data = _pack_bits(((index << self.regwidth) | val for index, val in enumerate(self._registers) if val),
+                              self.log2m + self.regwidth)
+        elif sketch_type == self.FULL:
+            data = _pack_bits(self._registers, self.regwidth)
+        else:
+            data = b''
+
+        return header + data
+
+    def to_hex(self):  # type: () -> str
+        """
+        Serializes sketch to hex string, as psycopg2 returns HllField values
+        """
+        return r'\x' + self.to_bytes().hex()
+
+    @classmethod
+    def _parse_header(cls, data):
+        # type: (Union[bytes, bytearray, memoryview, str]) -> Tuple[int, Tuple[int, int, int, int], bytes]
+        """
+        Parses postgresql-hll storage format header
+        :return: A tuple of storage type, parameters tuple and data body
+        """
+        if isinstance(data, string_types):
+            if not data.startswith(r'\x'):
+                raise ValueError('String data should start with \\x')
+            data = bytes.fromhex(data[2:])
+        else:
+            data = bytes(data)
+
+        if len(data) < 3:
+            raise ValueError('Data is too short to be hll')
+
+        version, sketch_type = data[0] >> 4, data[0] & 0x0F
+        if version != cls.SCHEMA_VERSION:
+            raise ValueError('Unsupported hll schema version: %d' % version)
+
+        regwidth, log2m = (data[1] >> 5) + 1, data[1] & 0x1F
+        sparseon, cutoff = (data[2] >> 6) & 1, data[2] & 0x3F
+        expthresh = -1 if cutoff == 63 else (0 if cutoff == 0 else 1 << (cutoff - 1))
+
+        return sketch_type, (log2m, regwidth, expthresh, sparseon), data[3:]
+
+    def union_update_bytes(self, data, buffer=None, fold_registers=False):
+        # type: (Union[bytes, bytearray, memoryview, str], Optional[bytearray], bool) -> None
+        """
+        Unions serialized hll into this sketch, as union_update(HllSketch.from_bytes(data)) does,
+        but without creating intermediate sketch.
+        :param data: Bytes or hex string, starting with \\x (as psycopg2 returns HllField values)
+        :param buffer: Optional bytearray of 2 ** log2m size. FULL hll registers are decoded into it.
+            Passing the same buffer for many values saves allocations.
+        :param fold_registers: Convert hll with different parameters instead of raising ValueError.
+            See union_update().
+        :return: None
+        """
+        sketch_type, params, body = self._parse_header(data)
+        if sketch_type not in (self.UNDEFINED, self.EMPTY, self.EXPLICIT, self.SPARSE, self.FULL):
+            raise ValueError('Unsupported hll type: %d' % sketch_type)
+
+        if self.params != params:
+            if not fold_registers:
+                raise ValueError('Sketch parameters do not match: %s and %s' % (self.params, params))
+
+            self.union_update(self.from_bytes(data), fold_registers=True)
+            return
+
+        if sketch_type == self.UNDEFINED:
+            self._undefined = True
+            self._explicit, self._registers = set(), None
+        elif self._undefined or sketch_type == self.EMPTY:
+            return
+        elif sketch_type == self.EXPLICIT:
+            self._union_explicit_body(body)
+        elif sketch_type == self.SPARSE:
+            self._union_sparse_body(body)
+        elif sketch_type == self.FULL:
+            self._union_full_body(body, buffer)
+
+    def _union_explicit_body(self, body):  # type: (bytes) -> None
+        if len(body) % 8:
+            raise ValueError('EXPLICIT hll data size should be a multiple of 8')
+        for hashval in struct.unpack('>%dq' % (len(body) // 8), body):
+            self.add_hash(hashval)
+
+    def _union_sparse_body(self, body):  # type: (bytes) -> None
+        if self._registers is None:
+            self._promote()
+
+        chunk_width = self.log2m + self.regwidth
+        for chunk in _unpack_bits(body, chunk_width, len(body) * 8 // chunk_width):
+            index, value = chunk >> self.regwidth, chunk & self.max_register_value
+            # Zero chunks can only be padding
+            if value > self._registers[index]:
+                self._registers[index] = value
+
+    def _union_full_body(self, body, buffer):  # type: (bytes, Optional[bytearray]) -> None
+        if self._registers is None:
+            self._promote()
+
+        if buffer is None:
+            buffer = bytearray(1 << self.log2m)
+        elif len(buffer) != 1 << self.log2m:
+            raise ValueError('buffer size should be 2 ** log2m')
+
+        buffer[:] = _unpack_bits(body, self.regwidth, 1 << self.log2m)
+        self._registers[:] = bytes(map(max, self._registers, buffer))
+
+    @classmethod
+    def from_registers(cls, registers, regwidth=5, expthresh=-1, sparseon=1):
+        # type: (Iterable[int], int, int, int) -> HllSketch
+        """
+        Creates sketch from register values. Registers should be indexed and filled the way postgresql-hll does:
+        index is the lowest log2m bits of hash value, value is position of the lowest set bit of the rest of it.
+        :param registers: Iterable of 2 ** log2m register values
+        :param regwidth: The number of bits used per register. Register values should fit into it.
+        :param expthresh: See __init__()
+        :param sparseon: See __init__()
+        :return: HllSketch instance. EMPTY, if all registers are zero.
+        """
+        registers = bytearray(registers)
+        log2m = len(registers).bit_length() - 1
+        if not registers or len(registers) != 1 << log2m:
+            raise ValueError('Number of registers should be a power of 2')
+
+        result = cls(log2m=log2m, regwidth=regwidth, expthresh=expthresh, sparseon=sparseon)
+        if max(registers) > result.max_register_value:
+            raise ValueError('Register values should fit into %d bits' % regwidth)
+
+        if any(registers):
+            result._registers = registers
+
+        return result
+
+    @classmethod
+    def from_bytes(cls, data):  # type: (Union[bytes, bytearray, memoryview, str]) -> HllSketch
+        """
+        Deserializes sketch from postgresql-hll storage format
+        :param data: Bytes or hex string, starting with \\x (as psycopg2 returns HllField values)
+        :return: HllSketch instance
+        """
+        sketch_type, params, _ = cls._parse_header(data)
+        result = cls(*params)
+        result.union_update_bytes(data)
+        return result
+
+    def __sizeof__(self):
+        # Memory, used by sketch data. Hash values in EXPLICIT representation are python integers
+        size = super(HllSketch, self).__sizeof__() + sys.getsizeof(self._explicit) + 36 * len(self._explicit)
+        if self._registers is not None:
+            size += sys.getsizeof(self._registers)
+
+        return size
+
+    def __repr__(self):
+        return '<%s: log2m=%d, regwidth=%d, expthresh=%d, sparseon=%d, cardinality=%s>' \
+               % ((self.__class__.__name__,) + self.params + (self.cardinality(),))
+
+
+def _build_partial_sketch(values, db_type, hash_seed, params):
+    # type: (Iterable[Any], Optional[str], int, Tuple[int, int, int, int]) -> bytes
+    """
+    Builds sketch in worker process.
+    Sketch is returned in storage format, as it is much more compact, than pickled sketch.
+    """
+    sketch = HllSketch(*params)
+    sketch.update(values, db_type=db_type, hash_seed=hash_seed)
+    return sketch.to_bytes()
+
+
+def build_sketch(data, db_type=None, hash_seed=0, workers=1, chunk_size=100000, **params):
+    # type: (Iterable[Any], Optional[str], int, int, int, **int) -> HllSketch
+    """
+    Builds HllSketch from (possibly huge) iterable of values.
+    If workers > 1, values are hashed in a pool of processes. Every process builds a partial sketch
+    for each chunk of values and returns it serialized. Partial sketches are united in current process.
+    At most 2 * workers chunks are processed at a time, so iterable is not loaded to memory at once.
+    :param data: Iterable of values
+    :param db_type: Hash function type. See HllSketch.add()
+    :param hash_seed: Optional hash seed
+    :param workers: Number of processes to hash values in. 1 means hashing in current process.
+    :param chunk_size: Number of values, sent to worker process at once
+    :param params: Sketch parameters: log2m, regwidth, expthresh, sparseon. See HllSketch.__init__()
+    :return: HllSketch instance
+    """
+    sketch = HllSketch(**params)
+
+    if workers <= 1:
+        sketch.update(data, db_type=db_type, hash_seed=hash_seed)
+        return sketch
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in chunks(data, chunk_size):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sketch.union_update(HllSketch.from_bytes(future.result()))
+
+            pending.add(executor.submit(_build_partial_sketch, chunk, db_type, hash_seed, sketch.params))
+
+        for future in pending:
+            sketch.union_update(HllSketch.from_bytes(future.result()))
+
+    return sketch
@@ -0,0 +1,245 @@
+"""
+Snapshot files of HllField registers for offline analytics.
+Registers of every row are stored as a fixed-width array of 2 ** log2m bytes (one byte per register),
+so reader memory-maps the file and unites any subset of rows without database queries and full file reads.
+numpy is not required, but makes unions vectorized (see HllSnapshot.array).
+"""
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+
+from .compatibility import numpy_available
+from .profiler import Params
+from .sketch import HllSketch
+
+# As numpy library is not required, import only if it exists
+if numpy_available():
+    import numpy
+else:
+    numpy = None
+
+__all__ = ['HllSnapshot', 'hll_snapshot']
+
+SNAPSHOT_MAGIC = b'PGHLLSNP'
+SNAPSHOT_VERSION = 1
+
+# Magic, format version, log2m, regwidth, expthresh, sparseon, number of rows, keys offset, keys size.
+# Header is padded to DATA_OFFSET bytes, registers of rows follow it, JSON list of keys follows registers.
+HEADER = struct.Struct('<8sBBBiBQQQ')
+DATA_OFFSET = 64
+
+
+def _to_key(value):  # type: (Any) -> Hashable
+    # JSON has no tuples
+    return tuple(_to_key(item) for item in value) if isinstance(value, list) else value
+
+
+def hll_snapshot(queryset, field_name, path, key_field='pk', chunk_size=2000, params=None, fold_registers=False):
+    # type: (QuerySet, str, str, str, int, Optional[Params], bool) -> int
+    """
+    Writes HllField values of queryset with their keys to a snapshot file, HllSnapshot reads.
+    Rows are fetched by chunks with QuerySet.iterator() and written one by one, so memory usage is constant.
+    File is written to a temporary file and moved to path in the end, so readers never see partial snapshot.
+    NULL values are skipped.
+    :param queryset: QuerySet of rows to export
+    :param field_name: HllField name
+    :param path: Snapshot file path
+    :param key_field: Field name or lookup with unique value of a row. Values should be JSON serializable
+        (values, DjangoJSONEncoder converts to strings, like dates and UUIDs, are read as strings).
+    :param chunk_size: Number of rows, fetched from database at once
+    :param params: (log2m, regwidth, expthresh, sparseon) of values. Defaults to field parameters.
+    :param fold_registers: Convert values with other parameters to params. See HllSketch.union_update().
+    :return: Number of rows written
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive')
+
+    if params is None:
+        params = queryset.model._meta.get_field(field_name).params
+
+    buffer = bytearray(1 << params[0])
+    keys = []  # type: List[Any]
+    seen = set()
+
+    tmp_path = '%s.tmp' % path
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(bytes(DATA_OFFSET))
+
+            rows = queryset.filter(**{'%s__isnull' % field_name: False}).values_list(key_field, field_name)
+            for key, data in rows.iterator(chunk_size=chunk_size):
+                if key in seen:
+                    raise ValueError('Key %r is not unique' % (key,))
+
+                sketch = HllSketch(*params)
+                sketch.union_update_bytes(data, buffer=buffer, fold_registers=fold_registers)
+                if sketch.type == HllSketch.UNDEFINED:
+                    raise ValueError("UNDEFINED hll of key %r can't be saved to snapshot" % (key,))
+
+                f.write(sketch.registers)
+                keys.append(key)
+                seen.add(key)
+
+            keys_data = json.dumps(keys, cls=DjangoJSONEncoder).encode('utf-8')
+            keys_offset = f.tell()
+            f.write(keys_data)
+
+            f.seek(0)
+            f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, params[0], params[1], params[2], params[3],
+                                len(keys), keys_offset, len(keys_data)))
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return len(keys)
+
+
+class HllSnapshot:
+    """
+    Memory-mapped snapshot file, written by hll_snapshot().
+    Registers are read from disk only for rows, which are used.
+
+    with HllSnapshot('visits.hll') as snapshot:
+        snapshot.cardinality()  # Union of all rows
+        snapshot.cardinality([1, 2, 3])  # Union of rows with given keys
+        snapshot.array[snapshot.index[1]]  # numpy view of row registers (requires numpy)
+    """
+    def __init__(self, path):  # type: (str) -> None
+        """
+        :param path: Snapshot file path
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file can't be mapped
+            self._file.close()
+            raise ValueError('%s is not an hll snapshot' % path)
+
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self):  # type: () -> None
+        if len(self._mmap) < DATA_OFFSET:
+            raise ValueError('%s is not an hll snapshot' % self.path)
+
+        magic, version, log2m, regwidth, expthresh, sparseon, rows, keys_offset, keys_size = \
+            HEADER.unpack_from(self._mmap)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError('%s is not an hll snapshot' % self.path)
+
+        if version != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported hll snapshot version: %d' % version)
+
+        self.params = (log2m, regwidth, expthresh, sparseon)
+        self.row_size = 1 << log2m
+        if keys_offset != DATA_OFFSET + rows * self.row_size or keys_offset + keys_size > len(self._mmap):
+            raise ValueError('%s is truncated or corrupted' % self.path)
+
+        keys_data = self._mmap[keys_offset:keys_offset + keys_size].decode('utf-8')
+        self.keys = [_to_key(key) for key in json.loads(keys_data)]
+        self.index = {key: i for i, key in enumerate(self.keys)}  # type: Dict[Hashable, int]
+
+    def close(self):  # type: () -> None
+        """
+        Closes the file. Registers views and arrays, returned earlier, should be deleted before.
+        """
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):  # type: () -> HllSnapshot
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):  # type: () -> int
+        return len(self.keys)
+
+    def __iter__(self):  # type: () -> Iterator[Hashable]
+        return iter(self.keys)
+
+    def __contains__(self, key):  # type: (Hashable) -> bool
+        return key in self.index
+
+    @property
+    def array(self):  # type: () -> Any
+        """
+        Zero-copy numpy.ndarray view of all registers with (rows, 2 ** log2m) shape and uint8 type.
+        Row number of a key is self.index[key].
+        """
+        if numpy is None:
+            raise ImportError('numpy is required to get registers array')
+
+        return numpy.frombuffer(self._mmap, dtype=numpy.uint8, count=len(self.keys) * self.row_size,
+                                offset=DATA_OFFSET).reshape(len(self.keys), self.row_size)
+
+    def registers(self, key):  # type: (Hashable) -> memoryview
+        """
+        Returns zero-copy view of registers of the row
+        :raises KeyError: If key is not in snapshot
+        """
+        start = DATA_OFFSET + self.index[key] * self.row_size
+        return memoryview(self._mmap)[start:start + self.row_size]
+
+    def get(self, key):  # type: (Hashable) -> HllSketch
+        """
+        Returns HllSketch of the row. EXPLICIT hlls are stored as registers, so they are returned as registers too.
+        :raises KeyError: If key is not in snapshot
+        """
+        with self.registers(key) as registers:
+            return HllSketch.from_registers(registers, *self.params[1:])
+
+    def _get_rows(self, keys):  # type: (Optional[Iterable[Hashable]]) -> List[int]
+        if keys is None:
+            return list(range(len(self.keys)))
+
+        # Sorted rows are read from disk sequentially
+        return sorted({self.index[key] for key in keys})
+
+    def union(self, keys=None, chunk_size=1024):  # type: (Optional[Iterable[Hashable]], int) -> HllSketch
+        """
+        Unites rows. Registers are read directly from memory-mapped file, vectorized with numpy, if it is installed.
+        :param keys: Keys of rows to unite. None unites all rows.
+        :param chunk_size: Number of rows, united by numpy at once. Limits memory, used for copies of rows.
+        :return: HllSketch instance. EMPTY, if there are no rows.
+        :raises KeyError: If any key is not in snapshot
+        """
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+
+        rows = self._get_rows(keys)
+        if numpy is not None:
+            array = self.array
+            result = numpy.zeros(self.row_size, dtype=numpy.uint8)
+            for start in range(0, len(rows), chunk_size):
+                numpy.maximum(result, array[rows[start:start + chunk_size]].max(axis=0), out=result)
+            registers = result.tobytes()
+            del array
+        else:
+            registers = bytearray(self.row_size)
+            with memoryview(self._mmap) as view:
+                for row in rows:
+                    start = DATA_OFFSET + row * self.row_size
+                    registers[:] = bytes(map(max, registers, view[start:start + self.row_size]))
+
+        return HllSketch.from_registers(registers, *self.params[1:])
+
+    def cardinality(self, keys=None):  # type: (Optional[Iterable[Hashable]]) -> float
+        """
+        Estimates cardinality of rows union. See union() for parameters.
+        """
+        return self.union(keys).cardinality()
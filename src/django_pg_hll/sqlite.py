@@ -0,0 +1,150 @@
+"""
+This file contains in-process emulation of postgresql-hll functions for SQLite.
+Functions are registered on every new SQLite connection, so HllField models can be tested
+on in-memory SQLite database without postgres and hll extension installed.
+All functions are built on HllSketch, so data is binary compatible with postgresql-hll.
+SQLite can't overload || operator, so expressions compile it to hll_union() function on this backend.
+"""
+from typing import Any, Optional
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .sketch import HllSketch, hash_value
+
+__all__ = ['register_hll_functions']
+
+
+def _to_sketch(value):  # type: (Any) -> HllSketch
+    if not isinstance(value, (bytes, bytearray, memoryview)):
+        raise ValueError('hll value expected, got %s' % str(type(value)))
+
+    return HllSketch.from_bytes(value)
+
+
+def _hll_empty(*params):  # type: (*int) -> bytes
+    return HllSketch(*params).to_bytes()
+
+
+def _make_hash_function(db_type):
+    def _hash(value, hash_seed=0):  # type: (Any, int) -> Optional[int]
+        if value is None:
+            return None
+
+        if db_type == 'boolean':
+            value = bool(value)
+
+        return hash_value(value, db_type=None if db_type == 'any' else db_type, hash_seed=hash_seed)
+
+    return _hash
+
+
+def _hll_union(*values):  # type: (*Any) -> Optional[bytes]
+    """
+    Emulates || operator: unites hlls and adds hash values (integers) to the first hll given.
+    As postgres operator does, returns NULL if any argument is NULL.
+    """
+    if any(val is None for val in values):
+        return None
+
+    sketch = None
+    for val in values:
+        if not isinstance(val, int):
+            sketch = _to_sketch(val) if sketch is None else sketch.union(_to_sketch(val))
+
+    if sketch is None:
+        raise ValueError('At least one hll value is required')
+
+    for val in values:
+        if isinstance(val, int):
+            sketch.add_hash(val)
+
+    return sketch.to_bytes()
+
+
+def _hll_cardinality(value):  # type: (Any) -> Optional[float]
+    return None if value is None else _to_sketch(value).cardinality()
+
+
+def _hll_unhex(value):  # type: (Optional[str]) -> Optional[bytes]
+    return None if value is None else bytes.fromhex(value)
+
+
+def _make_config_function(getter):
+    def _config(value):
+        return None if value is None else getter(_to_sketch(value))
+
+    return _config
+
+
+class _HllAddAgg:
+    def __init__(self):
+        self.sketch = None  # type: Optional[HllSketch]
+
+    def step(self, hashval, *params):  # type: (Optional[int], *int) -> None
+        if hashval is None:
+            return
+
+        if self.sketch is None:
+            self.sketch = HllSketch(*params)
+
+        self.sketch.add_hash(hashval)
+
+    def finalize(self):  # type: () -> Optional[bytes]
+        return self.sketch.to_bytes() if self.sketch is not None else None
+
+
+class _HllUnionAgg:
+    def __init__(self):
+        self.sketch = None  # type: Optional[HllSketch]
+
+    def step(self, value):  # type: (Any) -> None
+        if value is None:
+            return
+
+        if self.sketch is None:
+            self.sketch = _to_sketch(value)
+        else:
+            self.sketch.union_update(_to_sketch(value))
+
+    def finalize(self):  # type: () -> Optional[bytes]
+        return self.sketch.to_bytes() if self.sketch is not None else None
+
+
+_CONFIG_FUNCTIONS = {
+    'hll_schema_version': lambda sketch: sketch.SCHEMA_VERSION,
+    'hll_type': lambda sketch: sketch.type,
+    'hll_regwidth': lambda sketch: sketch.regwidth,
+    'hll_log2m': lambda sketch: sketch.log2m,
+    'hll_sparseon': lambda sketch: sketch.sparseon,
+    # Postgres returns a record of specified and effective thresholds
+    'hll_expthresh': lambda sketch: '(%d,%d)' % (sketch.expthresh, sketch.explicit_cutoff),
+}
+
+
+def register_hll_functions(connection):  # type: (Any) -> None
+    """
+    Registers hll functions and aggregates on sqlite3 connection.
+    It is done automatically for every SQLite connection django opens.
+    :param connection: sqlite3.Connection instance
+    :return: None
+    """
+    connection.create_function('hll_empty', -1, _hll_empty, deterministic=True)
+    connection.create_function('hll_union', -1, _hll_union, deterministic=True)
+    connection.create_function('hll_cardinality', 1, _hll_cardinality, deterministic=True)
+    connection.create_function('hll_unhex', 1, _hll_unhex, deterministic=True)
+
+    for db_type in ('boolean', 'smallint', 'integer', 'bigint', 'bytea', 'text', 'any'):
+        connection.create_function('hll_hash_%s' % db_type, -1, _make_hash_function(db_type), deterministic=True)
+
+    for name, getter in _CONFIG_FUNCTIONS.items():
+        connection.create_function(name, 1, _make_config_function(getter), deterministic=True)
+
+    connection.create_aggregate('hll_add_agg', -1, _HllAddAgg)
+    connection.create_aggregate('hll_union_agg', 1, _HllUnionAgg)
+
+
+@receiver(connection_created)
+def _register_on_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        register_hll_functions(connection.connection)
@@ -0,0 +1,85 @@
+"""
+Ingestion of large iterables (generators, files, etc.) into HllField with bounded memory usage
+"""
+from contextlib import nullcontext
+from typing import Any, Iterable, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, QuerySet, When
+
+from .fields import HllField
+from .utils import chunks
+from .values import HllBulkSet
+
+__all__ = ['hll_stream_update', 'hll_stream_update_many']
+
+
+def _chunk_transaction(queryset, atomic):
+    # If atomic flag is set, the whole process is a single transaction and chunks are savepoints inside it
+    return transaction.atomic(using=queryset.db) if atomic else nullcontext()
+
+
+def hll_stream_update(queryset, field_name, data, chunk_size=10000, atomic=True, stable_sql=False):
+    # type: (QuerySet, str, Iterable[Any], int, bool, bool) -> int
+    """
+    Adds values from iterable to HllField of all rows in queryset.
+    Iterable is consumed by chunks, each chunk is sent with single HllBulkSet query.
+    So memory usage depends on chunk_size, not on data size.
+    :param queryset: QuerySet of rows to update
+    :param field_name: HllField name
+    :param data: Iterable of values or HllPrimitiveValue instances
+    :param chunk_size: Number of values, sent to database in single query
+    :param atomic: If True, all chunks are saved in single transaction.
+        Otherwise, every chunk is committed separately (if function is not called inside another transaction).
+    :param stable_sql: Passed to HllBulkSet, making queries for all chunks use the same SQL
+    :return: Number of values processed
+    """
+    total = 0
+    with _chunk_transaction(queryset, atomic):
+        for chunk in chunks(data, chunk_size):
+            with transaction.atomic(using=queryset.db):
+                queryset.update(**{field_name: HllBulkSet(chunk, stable_sql=stable_sql) | F(field_name)})
+
+            total += len(chunk)
+
+    return total
+
+
+def hll_stream_update_many(queryset, field_name, data, key_field='pk', chunk_size=10000, atomic=True,
+                           stable_sql=False):
+    # type: (QuerySet, str, Iterable[Tuple[Any, Any]], str, int, bool, bool) -> int
+    """
+    Adds values from iterable of (key, value) pairs to HllField of rows, found by key_field.
+    Every chunk is grouped by key and saved with single UPDATE query.
+    Keys, which are not found in queryset, are ignored.
+    :param queryset: QuerySet of rows to update
+    :param field_name: HllField name
+    :param data: Iterable of (key, value) tuples. Value can be anything, supported by HllBulkSet.
+    :param key_field: Model field name to search rows by
+    :param chunk_size: Number of pairs, sent to database in single query
+    :param atomic: If True, all chunks are saved in single transaction.
+        Otherwise, every chunk is committed separately (if function is not called inside another transaction).
+    :param stable_sql: Passed to HllBulkSet
+    :return: Number of pairs processed
+    """
+    total = 0
+    with _chunk_transaction(queryset, atomic):
+        for chunk in chunks(data, chunk_size):
+            values_by_key = {}
+            for key, value in chunk:
+                values_by_key.setdefault(key, []).append(value)
+
+            update_expr = Case(
+                *(When(**{key_field: key, 'then': HllBulkSet(values, stable_sql=stable_sql) | F(field_name)})
+                  for key, values in values_by_key.items()),
+                default=F(field_name),
+                output_field=HllField()
+            )
+
+            with transaction.atomic(using=queryset.db):
+                queryset.filter(**{'%s__in' % key_field: list(values_by_key.keys())}).\
+                    update(**{field_name: update_expr})
+
+            total += len(chunk)
+
+    return total
@@ -1,4 +1,5 @@
-from typing import TypeVar, Set
+from itertools import islice
+from typing import Generator, Iterable, List, TypeVar, Set
 
 T = TypeVar('T')
 
@@ -18,3 +19,22 @@ def get_subclasses(cls, recursive=False):  # type: (T, bool) -> Set[T]
             subclasses.update(get_subclasses(subcls, recursive=True))
 
     return subclasses
+
+
+def chunks(iterable, size):  # type: (Iterable[T], int) -> Generator[List[T], None, None]
+    """
+    Splits iterable into lists of given size. Iterable is consumed lazily, so it can be a generator.
+    :param iterable: Iterable to split
+    :param size: Chunk size. Last chunk can be smaller
+    :return: Generator of lists
+    """
+    if size <= 0:
+        raise ValueError('size must be positive')
+
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+
+        yield chunk
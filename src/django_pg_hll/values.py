@@ -1,11 +1,13 @@
+import json
 from collections import defaultdict
 from copy import deepcopy
-from typing import Any
+from typing import Any, Union
 
 from abc import abstractmethod, ABCMeta
 from django.db.models.expressions import CombinedExpression, F, Func, Value
 
 from .compatibility import string_types, Iterable
+from .sketch import HllSketch
 
 
 class HllJoinMixin:
@@ -13,7 +15,9 @@ class HllJoinMixin:
 
     def __or__(self, other):  # type: (Any) -> HllCombinedExpression
         # Functions, field references and other HllValues shouldn't be parsed
-        if not isinstance(other, (F, HllValue, Func)):
+        if isinstance(other, HllSketch):
+            other = HllFromHex(other)
+        elif not isinstance(other, (F, HllValue, Func)):
             other = HllDataValue.parse_data(other)
         else:
             other = deepcopy(other)
@@ -25,28 +29,38 @@ class HllJoinMixin:
 
 
 class HllCombinedExpression(HllJoinMixin, CombinedExpression):
-    pass
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite can't overload || operator, so it is emulated by hll_union() function. See sqlite.py
+        lhs_sql, lhs_params = compiler.compile(self.lhs)
+        rhs_sql, rhs_params = compiler.compile(self.rhs)
+        return 'hll_union(%s, %s)' % (lhs_sql, rhs_sql), [*lhs_params, *rhs_params]
 
 
 class HllFromHex(Func, metaclass=ABCMeta):
     """
-    Constructs hll that can be saved from binary data (or it's psycopg representation)
+    Constructs hll that can be saved from binary data (or it's psycopg representation) or HllSketch
     """
     def __init__(self, data, *args, **extra):
         db_type = extra.pop('db_type', 'hll')
 
         # Psycopg2 returns Binary results as hex string, prefixed by \x but requires bytes for saving.
-        if isinstance(data, string_types) and data.startswith(r'\x'):
+        if isinstance(data, HllSketch):
+            data = data.to_bytes()
+        elif isinstance(data, string_types) and data.startswith(r'\x'):
             data = bytearray.fromhex(data[2:])
         elif isinstance(data, bytes):
             pass
         else:
-            raise ValueError('data should be bytes instance or string starting with \\x')
+            raise ValueError('data should be bytes instance, HllSketch or string starting with \\x')
 
         self.template = extra.get('template', '%(expressions)s::{}'.format(db_type))
 
         super(HllFromHex, self).__init__(Value(data), *args, **extra)
 
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite has no hll type, data is saved as is
+        return compiler.compile(self.source_expressions[0])
+
 
 class HllValue(HllJoinMixin, Func, metaclass=ABCMeta):
     pass
@@ -74,6 +88,14 @@ class HllDataValue(HllValue):
         # Remove hll_empty() prefix from value, it will be added by set
         self.extra['template'] = self.base_template
 
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite has no type casts and can't overload || operator. See sqlite.py
+        template = '%(function)s(%(expressions)s)'
+        if self.extra['template'] != self.base_template:
+            template = 'hll_union(hll_empty(), %s)' % template
+
+        return self.as_sql(compiler, connection, template=template, **extra_context)
+
     @classmethod
     @abstractmethod
     def check(cls, data):  # type: (Any) -> bool
@@ -226,6 +248,34 @@ class HllSet(HllValue):
 
         return sql, params
 
+    def as_sqlite(self, compiler, connection, **extra_context):
+        """
+        SQLite can't pass arrays as query parameters. Values are grouped by hash function and passed as json arrays.
+        Functions used are emulated in sqlite.py
+        """
+        values_by_function = defaultdict(list)
+        sql_parts, params = ['hll_empty()'], []
+        for item in self.data:
+            if not isinstance(item, HllPrimitiveValue):
+                item_sql, item_params = compiler.compile(item)
+                sql_parts.append(item_sql)
+                params.extend(item_params)
+                continue
+
+            value, *hash_seed = [expr.value for expr in item.get_source_expressions()]
+            values_by_function[(item.function, tuple(hash_seed))].append(value.hex() if isinstance(value, bytes)
+                                                                         else value)
+
+        for (function, hash_seed), values in values_by_function.items():
+            # Json doesn't support binary data. It is passed hex encoded
+            value_sql = 'hll_unhex(value)' if function == 'hll_hash_bytea' else 'value'
+            args_sql = ', '.join([value_sql] + ['%s'] * len(hash_seed))
+            sql_parts.append('(SELECT hll_add_agg(%s(%s)) FROM json_each(%%s))' % (function, args_sql))
+            params.extend(hash_seed)
+            params.append(json.dumps(values))
+
+        return 'hll_union(%s)' % ', '.join(sql_parts), params
+
 
 class HllBulkSet(HllSet):
     """
@@ -233,8 +283,49 @@ class HllBulkSet(HllSet):
     This can lead to max_stack_depth limit error, if lots of values are inserted at once.
     This class is a workaround for this problem.
     It groups primitive values by its sql and passes all values as an array of base type.
+
+    If stable_sql=True is passed, SQL doesn't depend on data:
+    every supported hash type gets its own (possibly empty) typed array parameter.
+    This allows postgres to reuse prepared statement plans and groups queries in pg_stat_statements.
     """
+    # Value types, which get their own array parameter in stable_sql mode.
+    # !!! Order is important here!!! It defines parameters order.
+    STABLE_SQL_CLASSES = (HllBoolean, HllSmallInt, HllInteger, HllBigint, HllByteA, HllText)
+
+    def __init__(self, *args, **extra):
+        self.stable_sql = extra.pop('stable_sql', False)
+        super(HllBulkSet, self).__init__(*args, **extra)
+
+    def _as_stable_sql(self, compiler, connection):
+        values_by_type = {klass.db_type: [] for klass in self.STABLE_SQL_CLASSES}
+        for item in self.data:
+            db_type = getattr(item, 'db_type', None)
+            if db_type not in values_by_type:
+                raise ValueError("%s can't be used in stable_sql mode" % item.__class__.__name__)
+
+            if len(item.get_source_expressions()) > 1:
+                raise ValueError("hash_seed can't be used in stable_sql mode")
+
+            _, params = item.as_sql(compiler, connection)
+            values_by_type[db_type].extend(params)
+
+        sql_parts, params = [], []
+        for klass in self.STABLE_SQL_CLASSES:
+            hash_sql = klass.base_template % {'function': 'hll_hash_%s' % klass.db_type, 'expressions': 'item',
+                                              'db_type': klass.db_type}
+            sql_parts.append(f"SELECT {hash_sql} FROM UNNEST(%s::{klass.db_type}[]) AS t(item)")
+            params.append(values_by_type[klass.db_type])
+
+        # hll_add_agg returns NULL, if no values are passed
+        sql = "COALESCE((SELECT hll_add_agg(hashval) FROM (%s) AS t(hashval)), hll_empty())" \
+              % " UNION ALL ".join(sql_parts)
+
+        return sql, params
+
     def as_sql(self, compiler, connection, function=None, template=None):
+        if self.stable_sql:
+            return self._as_stable_sql(compiler, connection)
+
         items_by_sql = defaultdict(list)
         for item in self.data:
             sql, params = item.as_sql(compiler, connection)
@@ -252,3 +343,25 @@ class HllBulkSet(HllSet):
             return HllEmpty().as_sql(compiler, connection)
 
         return " || ".join(sql_parts), params
+
+
+def parse_hll_value(value, db_type='hll', stable_sql=False):
+    # type: (Any, str, bool) -> Union[HllValue, HllCombinedExpression, HllFromHex]
+    """
+    Converts value, which can be saved to HllField, to hll expression
+    :param value: HllValue instance, HllSketch, serialized hll (bytes or string starting with \\x)
+        or iterable of values (converted to HllBulkSet)
+    :param db_type: Database type to cast serialized hll to
+    :param stable_sql: Passed to HllBulkSet, created for iterable values
+    :return: Expression, which can be saved to HllField
+    """
+    if isinstance(value, (HllValue, HllCombinedExpression)):
+        return value
+
+    if isinstance(value, (bytes, HllSketch)) or isinstance(value, string_types) and value.startswith(r'\x'):
+        return HllFromHex(value, db_type=db_type)
+
+    if isinstance(value, Iterable) and not isinstance(value, string_types):
+        return HllBulkSet(value, stable_sql=stable_sql)
+
+    raise ValueError('value should be HllValue instance, HllSketch, serialized hll or iterable of values')
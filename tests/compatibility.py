@@ -1,6 +1,11 @@
 from typing import Union
+from unittest import skipIf
 
 import django
+from django.db import connection
+
+# Decorates tests, which check postgres specific behaviour and can't be run with emulated hll functions
+postgres_only = skipIf(connection.vendor != 'postgresql', 'Test requires postgres with hll extension')
 
 
 def psycopg_binary_to_bytes(data):  # type: (Union[bytes, 'Binary']) -> bytes
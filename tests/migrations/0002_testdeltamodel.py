@@ -0,0 +1,23 @@
+from django.db import models, migrations
+
+from django_pg_hll import HllField
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('tests', '0001_initial')
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestDeltaModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hll_field', HllField()),
+                ('main', models.ForeignKey('TestModel', on_delete=models.CASCADE))
+            ],
+            options={
+                'abstract': False,
+            }
+        )
+    ]
@@ -0,0 +1,24 @@
+from django.db import models, migrations
+
+from django_pg_hll import HllField
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('tests', '0002_testdeltamodel')
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestDimensionModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=16)),
+                ('city', models.CharField(max_length=16)),
+                ('hll_field', HllField())
+            ],
+            options={
+                'abstract': False,
+            }
+        )
+    ]
@@ -0,0 +1,21 @@
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('tests', '0003_testdimensionmodel')
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestEventModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.ForeignKey('TestModel', on_delete=models.CASCADE)),
+                ('value', models.IntegerField(null=True))
+            ],
+            options={
+                'abstract': False,
+            }
+        )
+    ]
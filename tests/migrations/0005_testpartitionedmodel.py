@@ -0,0 +1,28 @@
+import datetime
+
+from django.db import models, migrations
+
+from django_pg_hll import HllField
+from django_pg_hll.migration import CreatePartitionedModel
+from django_pg_hll.partitioning import TimePartitioning
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('tests', '0004_testeventmodel')
+    ]
+
+    operations = [
+        CreatePartitionedModel(
+            name='TestPartitionedModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time', models.DateTimeField()),
+                ('hll_field', HllField())
+            ],
+            partitioning=TimePartitioning('time', interval='day', premake=2, retention=datetime.timedelta(days=7)),
+            options={
+                'abstract': False,
+            }
+        )
+    ]
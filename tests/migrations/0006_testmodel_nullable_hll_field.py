@@ -0,0 +1,17 @@
+from django.db import models, migrations
+
+from django_pg_hll import HllField
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('tests', '0005_testpartitionedmodel')
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='TestModel',
+            name='nullable_hll_field',
+            field=HllField(null=True, blank=True)
+        )
+    ]
@@ -1,6 +1,8 @@
+import datetime
+
 from django.db import models
 
-from django_pg_hll import HllField
+from django_pg_hll import HllField, TimePartitioning
 
 
 class FKModel(models.Model):
@@ -10,7 +12,31 @@ class FKModel(models.Model):
 class TestModel(models.Model):
     hll_field = HllField()
     fk = models.ForeignKey(FKModel, null=True, blank=True, on_delete=models.CASCADE)
+    nullable_hll_field = HllField(null=True, blank=True)
 
 
 class TestConfiguredModel(models.Model):
     hll_field = HllField(log2m=13, regwidth=2, expthresh=1, sparseon=0)
+
+
+class TestDeltaModel(models.Model):
+    hll_field = HllField()
+    main = models.ForeignKey(TestModel, on_delete=models.CASCADE)
+
+
+class TestDimensionModel(models.Model):
+    country = models.CharField(max_length=16)
+    city = models.CharField(max_length=16)
+    hll_field = HllField()
+
+
+class TestEventModel(models.Model):
+    target = models.ForeignKey(TestModel, on_delete=models.CASCADE)
+    value = models.IntegerField(null=True)
+
+
+class TestPartitionedModel(models.Model):
+    time = models.DateTimeField()
+    hll_field = HllField()
+
+    hll_partitioning = TimePartitioning('time', interval='day', premake=2, retention=datetime.timedelta(days=7))
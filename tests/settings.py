@@ -13,10 +13,20 @@ DATABASES = {
         'PASSWORD': os.environ.get('PGPASS', 'test'),
         'HOST': os.environ.get('PGHOST', '127.0.0.1'),
         'PORT': '5432'
+    },
+    # Used to test multiple database features
+    'secondary': {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': 'test_secondary',
+        'USER': os.environ.get('PGUSER', 'test'),
+        'PASSWORD': os.environ.get('PGPASS', 'test'),
+        'HOST': os.environ.get('PGHOST', '127.0.0.1'),
+        'PORT': '5432'
     }
 }
 
 INSTALLED_APPS = [
     "src",
+    "django_pg_hll",
     "tests"
 ]
@@ -0,0 +1,16 @@
+"""
+This file contains django settings to run tests on in-memory SQLite database with emulated hll functions:
+DJANGO_SETTINGS_MODULE=tests.settings_sqlite python runtests.py
+"""
+from tests.settings import *  # noqa: F401, F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:'
+    },
+    'secondary': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:'
+    }
+}
@@ -0,0 +1,72 @@
+from django.test import TestCase
+
+from django_pg_hll.accumulator import HllAccumulator
+from django_pg_hll.sketch import HllSketch, build_sketch
+from django_pg_hll.values import HllBulkSet, HllEmpty
+
+from tests.models import TestConfiguredModel, TestModel
+
+
+class HllAccumulatorTest(TestCase):
+    def test_exact(self):
+        acc = HllAccumulator(max_values=10)
+        acc.update([1, 2, 2, 3, 'test', 'test', b'test', True] * 100)
+
+        self.assertTrue(acc.exact)
+        # Text and bytes are hashed the same way
+        self.assertEqual(5, acc.cardinality())
+        self.assertEqual(build_sketch([1, 2, 3, 'test', b'test', True]), acc.get_sketch())
+
+    def test_switch_to_sketch(self):
+        acc = HllAccumulator(max_values=10)
+        acc.update(range(1000))
+        acc.update(range(1000))
+
+        self.assertFalse(acc.exact)
+        self.assertEqual(build_sketch(range(1000)), acc.get_sketch())
+        self.assertEqual(build_sketch(range(1000)).cardinality(), acc.cardinality())
+
+        acc.clear()
+        self.assertTrue(acc.exact)
+        self.assertEqual(0, acc.cardinality())
+
+    def test_to_hll_value(self):
+        acc = HllAccumulator()
+        acc.update([1, 2, 3])
+        self.assertIsInstance(acc.to_hll_value(), HllBulkSet)
+
+        # Long strings are bigger than their hashes
+        acc = HllAccumulator()
+        acc.update(['a' * 100, 'b' * 100])
+        self.assertEqual(build_sketch(['a' * 100, 'b' * 100]), acc.to_hll_value())
+
+        # Values, hashed not the way database does, are sent as hll
+        acc = HllAccumulator(db_type='bigint')
+        acc.update([1, 2, 3])
+        self.assertEqual(build_sketch([1, 2, 3], db_type='bigint'), acc.to_hll_value())
+
+        acc = HllAccumulator(max_values=10)
+        acc.update(range(100))
+        self.assertEqual(build_sketch(range(100)), acc.to_hll_value())
+
+    def test_merge_into(self):
+        instance = TestModel.objects.create(hll_field=HllEmpty() | 1)
+        for values in ([1, 2, 3] * 10, ['a' * 100, 'b' * 100], range(1000)):
+            with self.subTest(values=values):
+                acc = HllAccumulator(max_values=100)
+                acc.update(values)
+
+                self.assertEqual(1, acc.merge_into(TestModel.objects.filter(pk=instance.pk), 'hll_field'))
+
+        self.assertEqual(build_sketch([1, 2, 3, 'a' * 100, 'b' * 100] + list(range(1000))),
+                         HllSketch.from_bytes(TestModel.objects.get(pk=instance.pk).hll_field))
+
+    def test_merge_into_configured(self):
+        instance = TestConfiguredModel.objects.create(hll_field=HllSketch(13, 2, 1, 0))
+
+        acc = HllAccumulator(log2m=13, regwidth=2, expthresh=1, sparseon=0)
+        acc.update([1, 2, 3])
+        acc.merge_into(TestConfiguredModel.objects.filter(pk=instance.pk), 'hll_field')
+
+        self.assertEqual(build_sketch([1, 2, 3], log2m=13, regwidth=2, expthresh=1, sparseon=0),
+                         HllSketch.from_bytes(TestConfiguredModel.objects.get(pk=instance.pk).hll_field))
@@ -0,0 +1,104 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from django_pg_hll.auto import HllAuto, get_auto_thresholds
+from django_pg_hll.benchmark import run_value_benchmark
+from django_pg_hll.sketch import HllSketch, build_sketch
+from django_pg_hll.values import HllBulkSet, HllEmpty, HllInteger
+
+from tests.compatibility import postgres_only
+from tests.models import TestModel
+
+
+class HllAutoTest(TestCase):
+    def test_strategy(self):
+        params = (11, 5, -1, 1)
+        self.assertEqual('inline', HllAuto([1, 2, 3], params=params).strategy)
+        self.assertEqual('bulk', HllAuto(range(100), params=params).strategy)
+        self.assertEqual('local', HllAuto(range(100), params=params, thresholds={'local_min_values': 50}).strategy)
+
+        # Local strategy requires params and locally hashable values
+        self.assertEqual('bulk', HllAuto(range(100), thresholds={'local_min_values': 50}).strategy)
+        self.assertEqual('bulk', HllAuto(list(range(99)) + [1.5], params=params,
+                                         thresholds={'local_min_values': 50}).strategy)
+        self.assertEqual('bulk', HllAuto(list(range(99)) + [HllInteger(1)], params=params,
+                                         thresholds={'local_min_values': 50}).strategy)
+        self.assertEqual('bulk', HllAuto(range(100), params=params,
+                                         thresholds={'local_min_values': None}).strategy)
+
+        self.assertEqual('inline', HllAuto(range(100), thresholds={'inline_max_values': 100}).strategy)
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            HllAuto([1], strategy='invalid')
+
+        with self.assertRaises(ValueError):
+            HllAuto([1], strategy='local')
+
+    def test_save(self):
+        values = list(range(100)) + ['test', b'bytes', True]
+        instance = TestModel.objects.create(hll_field=HllBulkSet(values))
+        expected = TestModel.objects.get(pk=instance.pk).hll_field
+
+        for strategy in ('inline', 'bulk', 'local'):
+            with self.subTest(strategy=strategy):
+                instance = TestModel.objects.create(hll_field=HllAuto(values, params=(11, 5, -1, 1),
+                                                                      strategy=strategy))
+                self.assertEqual(HllSketch.from_bytes(expected),
+                                 HllSketch.from_bytes(TestModel.objects.get(pk=instance.pk).hll_field))
+
+    def test_union(self):
+        for strategy in ('inline', 'bulk', 'local'):
+            with self.subTest(strategy=strategy):
+                instance = TestModel.objects.create(hll_field=HllBulkSet(range(10)))
+                value = HllAuto(range(5, 20), params=(11, 5, -1, 1), strategy=strategy)
+                TestModel.objects.filter(pk=instance.pk).update(hll_field=HllEmpty() | F('hll_field') | value)
+                self.assertEqual(build_sketch(range(20)),
+                                 HllSketch.from_bytes(TestModel.objects.get(pk=instance.pk).hll_field))
+
+
+class HllAutoThresholdsTest(TestCase):
+    def test_thresholds(self):
+        report = [
+            {'size': 1, 'strategy': 'inline', 'latency': 0.001},
+            {'size': 1, 'strategy': 'bulk', 'latency': 0.002},
+            {'size': 1, 'strategy': 'local', 'latency': 0.003},
+            {'size': 10, 'strategy': 'inline', 'latency': 0.002},
+            {'size': 10, 'strategy': 'bulk', 'latency': 0.002},
+            {'size': 10, 'strategy': 'local', 'latency': 0.004},
+            {'size': 100, 'strategy': 'inline', 'latency': None},
+            {'size': 100, 'strategy': 'bulk', 'latency': 0.01},
+            {'size': 100, 'strategy': 'local', 'latency': 0.005}
+        ]
+        self.assertDictEqual({'inline_max_values': 10, 'local_min_values': 100}, get_auto_thresholds(report))
+        self.assertDictEqual({'inline_max_values': 10, 'local_min_values': None}, get_auto_thresholds(report[:6]))
+
+    def test_benchmark(self):
+        report = run_value_benchmark(sizes=[1, 50], repeat=2)
+        self.assertListEqual([(1, 'inline'), (1, 'bulk'), (1, 'local'), (50, 'inline'), (50, 'bulk'), (50, 'local')],
+                             [(item['size'], item['strategy']) for item in report])
+        for item in report:
+            self.assertIsNone(item['error'])
+            self.assertGreater(item['latency'], 0)
+            self.assertGreaterEqual(item['latency_median'], item['latency'])
+
+        with self.assertRaises(ValueError):
+            run_value_benchmark(strategies=['invalid'])
+
+    @postgres_only
+    def test_benchmark_errors(self):
+        # Long chain of hll_hash_* expressions exceeds postgres stack depth limit
+        report = run_value_benchmark(sizes=[100000], strategies=['inline'], repeat=1)
+        self.assertIsNotNone(report[0]['error'])
+        self.assertIsNone(report[0]['latency'])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('hll_benchmark', '--values', '--size', '10', '--repeat', '1', '--json', stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(3, len(result['results']))
+        self.assertSetEqual({'inline_max_values', 'local_min_values'}, set(result['thresholds'].keys()))
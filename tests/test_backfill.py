@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from django_pg_hll.aggregate import AddAgg
+from django_pg_hll.backfill import hll_backfill
+from django_pg_hll.sketch import HllSketch, build_sketch
+from django_pg_hll.values import HllEmpty
+
+from tests.compatibility import postgres_only
+from tests.models import TestEventModel, TestModel
+
+
+class BackfillTestMixin:
+    def setUp(self):
+        self.targets = TestModel.objects.bulk_create([TestModel(hll_field=HllEmpty()) for _ in range(3)])
+        self.targets.append(TestModel.objects.create(hll_field=build_sketch([1000], db_type='integer')))
+
+        events = []
+        for i in range(100):
+            events.append(TestEventModel(target=self.targets[i % 2], value=i))
+        events.append(TestEventModel(target=self.targets[3], value=None))
+        events.append(TestEventModel(target=self.targets[3], value=1001))
+        TestEventModel.objects.bulk_create(events)
+
+    def _get_sketch(self, instance):
+        return HllSketch.from_bytes(TestModel.objects.get(pk=instance.pk).hll_field)
+
+    def assertBackfilled(self):
+        self.assertEqual(build_sketch(range(0, 100, 2), db_type='integer'), self._get_sketch(self.targets[0]))
+        self.assertEqual(build_sketch(range(1, 100, 2), db_type='integer'), self._get_sketch(self.targets[1]))
+        self.assertEqual(HllSketch(), self._get_sketch(self.targets[2]))
+        self.assertEqual(build_sketch([1000, 1001], db_type='integer'), self._get_sketch(self.targets[3]))
+
+
+class HllBackfillTest(BackfillTestMixin, TestCase):
+    def test_backfill(self):
+        chunks = hll_backfill(TestEventModel.objects.all(), 'target', 'value', TestModel.objects.all(), 'hll_field',
+                              db_type='integer', chunk_size=30)
+        self.assertEqual(4, chunks)
+        self.assertBackfilled()
+
+        # Repeated backfill doesn't change hll
+        hll_backfill(TestEventModel.objects.all(), 'target', 'value', TestModel.objects.all(), 'hll_field',
+                     db_type='integer')
+        self.assertBackfilled()
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_file = os.path.join(tmp_dir, 'checkpoint.json')
+            first_pk = TestEventModel.objects.order_by('pk').first().pk
+            with open(checkpoint_file, 'w') as f:
+                json.dump({'next_pk': first_pk + 50}, f)
+
+            chunks = hll_backfill(TestEventModel.objects.all(), 'target', 'value', TestModel.objects.all(),
+                                  'hll_field', db_type='integer', chunk_size=30, checkpoint_file=checkpoint_file)
+            self.assertEqual(2, chunks)
+            self.assertEqual(build_sketch(range(50, 100, 2), db_type='integer'), self._get_sketch(self.targets[0]))
+
+            with open(checkpoint_file) as f:
+                self.assertEqual(first_pk + 110, json.load(f)['next_pk'])
+
+    def test_empty_source(self):
+        self.assertEqual(0, hll_backfill(TestEventModel.objects.filter(pk__lt=0), 'target', 'value',
+                                         TestModel.objects.all(), 'hll_field'))
+
+    def test_command(self):
+        call_command('hll_backfill', 'tests.TestEventModel', 'target', 'value', 'tests.TestModel', 'hll_field',
+                     '--db-type', 'integer', '--chunk-size', '30', stdout=open(os.devnull, 'w'))
+        self.assertBackfilled()
+
+    def test_add_agg(self):
+        with self.assertRaises(ValueError):
+            AddAgg('value', db_type='float')
+
+        result = TestEventModel.objects.filter(value__in=[1, 2, 3]).aggregate(hll=AddAgg('value', db_type='integer'))
+        self.assertEqual(build_sketch([1, 2, 3], db_type='integer'), HllSketch.from_bytes(result['hll']))
+
+        result = TestEventModel.objects.filter(value__in=[1, 2, 3]).\
+            aggregate(hll=AddAgg('value', db_type='integer', hash_seed=1))
+        self.assertEqual(build_sketch([1, 2, 3], db_type='integer', hash_seed=1), HllSketch.from_bytes(result['hll']))
+
+
+class HllBackfillWorkersTest(BackfillTestMixin, TransactionTestCase):
+    # SQLite doesn't support concurrent writes to in-memory database
+    @postgres_only
+    def test_workers(self):
+        hll_backfill(TestEventModel.objects.all(), 'target', 'value', TestModel.objects.all(), 'hll_field',
+                     db_type='integer', chunk_size=10, workers=3)
+        self.assertBackfilled()
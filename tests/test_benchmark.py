@@ -0,0 +1,54 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from django_pg_hll.benchmark import BENCHMARK_QUERIES, run_benchmark
+
+
+class BenchmarkTest(TransactionTestCase):
+    def test_benchmark(self):
+        report = run_benchmark(params_list=[(11, 5, -1, 1), (10, 4, 0, 0)], sizes=[20], row_cardinalities=[10, 200],
+                               distinct_values=200, repeat=2)
+
+        self.assertEqual(4, len(report))
+        self.assertListEqual([((11, 5, -1, 1), 10), ((11, 5, -1, 1), 200), ((10, 4, 0, 0), 10), ((10, 4, 0, 0), 200)],
+                             [(table['params'], table['row_cardinality']) for table in report])
+
+        for table in report:
+            self.assertEqual(20, table['rows'])
+            self.assertGreater(table['column_bytes'], 0)
+            self.assertListEqual(list(BENCHMARK_QUERIES.keys()), [query['query'] for query in table['queries']])
+
+            queries = {query['query']: query for query in table['queries']}
+            for query in queries.values():
+                self.assertGreater(query['latency'], 0)
+                self.assertGreaterEqual(query['latency_median'], query['latency'])
+
+            for name in ('Cardinality', 'UnionAgg', 'UnionAggCardinality', 'CardinalitySum', 'cardinality'):
+                self.assertLess(queries[name]['error'], 0.2)
+
+            self.assertIsNone(queries['type']['error'])
+
+        # Explicit hll is exact
+        self.assertEqual(0, report[0]['queries'][0]['error'])
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            run_benchmark(row_cardinalities=[3], distinct_values=10)
+
+        with self.assertRaises(ValueError):
+            run_benchmark(queries=['invalid'])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('hll_benchmark', '--params', '11,5,-1,1', '--size', '10', '--row-cardinality', '10',
+                     '--distinct-values', '100', '--query', 'UnionAggCardinality', '--repeat', '1', stdout=out)
+        self.assertIn('UnionAggCardinality', out.getvalue())
+        self.assertIn('rows=10', out.getvalue())
+
+        out = StringIO()
+        call_command('hll_benchmark', '--params', '11,5,-1,1', '--size', '10', '--row-cardinality', '10',
+                     '--distinct-values', '100', '--query', 'type', '--repeat', '1', '--json', stdout=out)
+        self.assertEqual('type', json.loads(out.getvalue())[0]['queries'][0]['query'])
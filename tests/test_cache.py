@@ -0,0 +1,106 @@
+import sys
+
+from django.db import connection
+from django.test import TestCase
+
+from django_pg_hll.cache import HllSketchCache
+from django_pg_hll.sketch import build_sketch
+
+from tests.compatibility import postgres_only
+from tests.models import TestDimensionModel, TestModel
+
+
+class HllSketchCacheTest(TestCase):
+    def setUp(self):
+        # city field plays row version role here, as sqlite has no xmin
+        self.rows = [
+            TestDimensionModel.objects.create(country='US', city='v1', hll_field=build_sketch(range(100))),
+            TestDimensionModel.objects.create(country='US', city='v1', hll_field=build_sketch(range(50, 1000))),
+            TestDimensionModel.objects.create(country='DE', city='v1', hll_field=build_sketch(range(10)))
+        ]
+        self.cache = HllSketchCache(version_field='city')
+        self.queryset = TestDimensionModel.objects.all()
+
+    def test_get(self):
+        self.assertEqual(build_sketch(range(100)), self.cache.get(self.queryset, self.rows[0].pk, 'hll_field'))
+        self.assertIsNone(self.cache.get(self.queryset, -1, 'hll_field'))
+        self.assertEqual(1, len(self.cache))
+
+        self.assertIsNone(self.cache.get(self.queryset.filter(country='DE'), self.rows[0].pk, 'hll_field'))
+        self.assertEqual(0, len(self.cache))
+
+    def test_hit(self):
+        self.cache.get_many(self.queryset, [row.pk for row in self.rows], 'hll_field')
+        with self.assertNumQueries(1):
+            self.assertEqual(build_sketch(range(1000)),
+                             self.cache.union(self.queryset, [row.pk for row in self.rows], 'hll_field'))
+
+        with self.assertNumQueries(1):
+            self.assertAlmostEqual(100, self.cache.cardinality(self.queryset, self.rows[0].pk, 'hll_field'), delta=5)
+
+    def test_string_pk(self):
+        pk = str(self.rows[0].pk)
+        self.assertEqual(build_sketch(range(100)), self.cache.get(self.queryset, pk, 'hll_field'))
+        self.assertEqual(1, len(self.cache))
+
+        # Entry, cached by string primary key, is reused
+        with self.assertNumQueries(1):
+            self.assertAlmostEqual(100, self.cache.cardinality(self.queryset, pk, 'hll_field'), delta=5)
+
+        with self.assertNumQueries(1):
+            self.assertListEqual([self.rows[0].pk],
+                                 list(self.cache.get_many(self.queryset, [pk, self.rows[0].pk], 'hll_field')))
+
+    def test_copy(self):
+        self.cache.get(self.queryset, self.rows[0].pk, 'hll_field').update(range(10000))
+        self.assertEqual(build_sketch(range(100)), self.cache.get(self.queryset, self.rows[0].pk, 'hll_field'))
+
+    def test_invalidation(self):
+        self.assertEqual(build_sketch(range(100)), self.cache.get(self.queryset, self.rows[0].pk, 'hll_field'))
+
+        TestDimensionModel.objects.filter(pk=self.rows[0].pk).update(city='v2', hll_field=build_sketch(range(200)))
+        with self.assertNumQueries(2):
+            self.assertEqual(build_sketch(range(200)), self.cache.get(self.queryset, self.rows[0].pk, 'hll_field'))
+
+        TestDimensionModel.objects.filter(pk=self.rows[0].pk).delete()
+        self.assertIsNone(self.cache.get(self.queryset, self.rows[0].pk, 'hll_field'))
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual(0, self.cache.size)
+
+    def test_eviction(self):
+        size = sys.getsizeof(build_sketch(range(100)))
+        cache = HllSketchCache(max_bytes=size + sys.getsizeof(build_sketch(range(50, 1000))) - 1,
+                               version_field='city')
+        cache.get(self.queryset, self.rows[0].pk, 'hll_field')
+        cache.get(self.queryset, self.rows[1].pk, 'hll_field')
+        self.assertEqual(1, len(cache))
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+        with self.assertNumQueries(2):
+            cache.get(self.queryset, self.rows[0].pk, 'hll_field')
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            HllSketchCache(max_bytes=0)
+
+
+class HllSketchCacheXminTest(TestCase):
+    @postgres_only
+    def test_xmin(self):
+        row = TestModel.objects.create(hll_field=build_sketch(range(100)))
+        cache = HllSketchCache()
+        self.assertEqual(build_sketch(range(100)), cache.get(TestModel.objects.all(), row.pk, 'hll_field'))
+
+        with self.assertNumQueries(1):
+            cache.get(TestModel.objects.all(), row.pk, 'hll_field')
+
+        TestModel.objects.filter(pk=row.pk).update(hll_field=build_sketch(range(200)))
+        with self.assertNumQueries(2):
+            self.assertEqual(build_sketch(range(200)), cache.get(TestModel.objects.all(), row.pk, 'hll_field'))
+
+    def test_no_versions(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('postgres has xmin')
+
+        with self.assertRaises(ValueError):
+            HllSketchCache().get(TestModel.objects.all(), 1, 'hll_field')
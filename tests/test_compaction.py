@@ -0,0 +1,84 @@
+from django.test import TestCase
+
+from django_pg_hll.compaction import hll_compact, hll_union_mixed
+from django_pg_hll.fold import hll_fold
+from django_pg_hll.sketch import HllSketch, build_sketch
+
+from tests.models import TestConfiguredModel, TestModel
+
+
+class HllUnionMixedTest(TestCase):
+    def test_union(self):
+        result = hll_union_mixed([build_sketch(range(5000), log2m=14), None,
+                                  build_sketch(range(3000, 6000), log2m=11, regwidth=4).to_bytes()])
+        self.assertEqual(build_sketch(range(6000), log2m=11, regwidth=4), result)
+
+    def test_explicit(self):
+        result = hll_union_mixed([build_sketch(range(10), log2m=14), build_sketch(range(5, 20), log2m=12)])
+        self.assertEqual(build_sketch(range(20), log2m=12), result)
+
+    def test_empty(self):
+        self.assertIsNone(hll_union_mixed([]))
+        self.assertIsNone(hll_union_mixed([None]))
+
+
+class HllSketchFoldingTest(TestCase):
+    def test_convert(self):
+        self.assertEqual(build_sketch(range(20000), log2m=10, regwidth=4),
+                         build_sketch(range(20000), log2m=14, regwidth=6).convert(log2m=10, regwidth=4))
+
+    def test_increase_log2m(self):
+        with self.assertRaises(ValueError):
+            build_sketch(range(20000), log2m=11).convert(log2m=12)
+
+    def test_union_update(self):
+        sketch = build_sketch(range(2000), log2m=11)
+        with self.assertRaises(ValueError):
+            sketch.union_update(build_sketch(range(2000, 4000), log2m=13))
+
+        sketch.union_update(build_sketch(range(2000, 4000), log2m=13), fold_registers=True)
+        self.assertEqual(build_sketch(range(4000), log2m=11), sketch)
+
+        sketch.union_update_bytes(build_sketch(range(4000, 5000), log2m=12).to_bytes(), fold_registers=True)
+        self.assertEqual(build_sketch(range(5000), log2m=11), sketch)
+
+
+class HllCompactTest(TestCase):
+    def setUp(self):
+        TestModel.objects.bulk_create([
+            TestModel(hll_field=build_sketch(range(3000))),
+            TestModel(hll_field=build_sketch(range(2000, 5000))),
+            TestModel(hll_field=build_sketch(range(10), log2m=8, regwidth=3))
+        ])
+
+    def test_compact(self):
+        self.assertEqual(2, hll_compact(TestModel.objects.all(), 'hll_field', log2m=9, regwidth=4, chunk_size=1))
+        self.assertListEqual([
+            build_sketch(range(3000), log2m=9, regwidth=4).to_hex(),
+            build_sketch(range(2000, 5000), log2m=9, regwidth=4).to_hex(),
+            build_sketch(range(10), log2m=8, regwidth=3).to_hex()
+        ], [HllSketch.from_bytes(value).to_hex()
+            for value in TestModel.objects.order_by('pk').values_list('hll_field', flat=True)])
+
+        # Already compacted rows are skipped
+        self.assertEqual(0, hll_compact(TestModel.objects.all(), 'hll_field', log2m=9, regwidth=4))
+
+        groups = hll_fold(TestModel.objects.all(), 'hll_field', params=(8, 3, -1, 1), fold_registers=True)
+        self.assertEqual(build_sketch(range(5000), log2m=8, regwidth=3), groups[None])
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            hll_compact(TestModel.objects.all(), 'hll_field')
+
+        with self.assertRaises(ValueError):
+            hll_compact(TestModel.objects.all(), 'hll_field', log2m=9, chunk_size=0)
+
+    def test_declared_params(self):
+        # hll(13, 2, 1, 0) column can't contain values with lower log2m
+        TestConfiguredModel.objects.create(hll_field=build_sketch(range(10), log2m=13, regwidth=2, expthresh=1,
+                                                                  sparseon=0))
+        with self.assertRaises(ValueError):
+            hll_compact(TestConfiguredModel.objects.all(), 'hll_field', log2m=9)
+
+        self.assertEqual(build_sketch(range(10), log2m=13, regwidth=2, expthresh=1, sparseon=0),
+                         HllSketch.from_bytes(TestConfiguredModel.objects.get().hll_field))
@@ -0,0 +1,77 @@
+from django.test import TestCase
+
+from django_pg_hll.counter import HllCounterStore
+from django_pg_hll.models import HllCounter
+from django_pg_hll.sketch import build_sketch
+from django_pg_hll.values import HllEmpty
+
+from tests.models import TestModel
+
+
+class HllCounterStoreTest(TestCase):
+    def setUp(self):
+        self.store = HllCounterStore()
+
+    def test_add(self):
+        self.store.add('a', [1, 2, 3])
+        self.store.add('a', {3, 4})
+        self.store.add('b', build_sketch(range(100)))
+        self.store.add('c', HllEmpty())
+
+        self.assertEqual(3, HllCounter.objects.count())
+        self.assertEqual(4, self.store.count('a'))
+        self.assertEqual(100, self.store.count('b'))
+        self.assertEqual(0, self.store.count('c'))
+
+    def test_add_many(self):
+        self.assertEqual(3, self.store.add_many({'a': [1, 2], 'b': [2, 3], 'c': []}, batch_size=2))
+        self.assertEqual(3, self.store.add_many({'a': [3], 'b': [3], 'd': [5]}, batch_size=2))
+
+        self.assertEqual(4, HllCounter.objects.count())
+        self.assertEqual(3, self.store.count('a'))
+        self.assertEqual(2, self.store.count('b'))
+        self.assertEqual(0, self.store.count('c'))
+
+        with self.assertRaises(ValueError):
+            self.store.add_many({'a': [1]}, batch_size=0)
+
+    def test_count(self):
+        self.store.add_many({'a': [1, 2], 'b': [2, 3], 'c': [4]})
+        self.assertEqual(3, self.store.count('a', 'b'))
+        self.assertEqual(4, self.store.count('a', 'b', 'c', 'missing'))
+        self.assertEqual(0, self.store.count('missing'))
+        self.assertEqual(0, self.store.count())
+
+    def test_merge(self):
+        self.store.add_many({'a': [1, 2], 'b': [2, 3], 'c': [4]})
+
+        self.store.merge(['a', 'b', 'missing'], into='ab')
+        self.assertEqual(3, self.store.count('ab'))
+        self.assertEqual(2, self.store.count('a'))
+
+        self.store.merge(['c'], into='ab')
+        self.assertEqual(4, self.store.count('ab'))
+
+        # Nothing to merge
+        self.store.merge(['missing'], into='new')
+        self.store.merge([], into='new')
+        self.assertFalse(HllCounter.objects.filter(key='new').exists())
+        self.assertEqual('ab', str(HllCounter.objects.get(key='ab')))
+
+    def test_custom_model(self):
+        store = HllCounterStore(TestModel, key_field_name='id', field_name='hll_field')
+        store.add_many({1: [1, 2], 2: [3]})
+        store.add(1, [3])
+        self.assertEqual(3, store.count(1))
+        self.assertEqual(3, store.count(1, 2))
+
+    def test_same_counter_keys(self):
+        # Keys of different types, which are saved as the same counter key
+        store = HllCounterStore(TestModel, key_field_name='id', field_name='hll_field')
+        self.assertEqual(2, store.add_many({1: [1, 2], '1': [3], 2: [4], '2': [4, 5]}))
+        self.assertEqual(3, store.count(1))
+        self.assertEqual(2, store.count(2))
+
+        # Keys are normalized by merge() the same way
+        store.merge(['1', '2'], into='2')
+        self.assertEqual(5, store.count(2))
@@ -0,0 +1,71 @@
+from django.test import TestCase
+
+from django_pg_hll.cube import HllCube
+from django_pg_hll.sketch import build_sketch
+from django_pg_hll.values import HllBulkSet
+
+from tests.models import TestDimensionModel
+
+
+class HllCubeTest(TestCase):
+    def setUp(self):
+        TestDimensionModel.objects.bulk_create([
+            TestDimensionModel(country='US', city='NY', hll_field=HllBulkSet(range(0, 10))),
+            TestDimensionModel(country='US', city='NY', hll_field=HllBulkSet(range(5, 20))),
+            TestDimensionModel(country='US', city='LA', hll_field=HllBulkSet(range(15, 30))),
+            TestDimensionModel(country='DE', city='Berlin', hll_field=HllBulkSet(range(100, 110)))
+        ])
+        self.cube = HllCube(TestDimensionModel.objects.all(), 'hll_field', ['country', 'city'])
+
+    def test_cells(self):
+        with self.assertNumQueries(1):
+            self.assertSetEqual({('US', 'NY'), ('US', 'LA'), ('DE', 'Berlin')}, set(self.cube.cells.keys()))
+            self.assertEqual(build_sketch(range(20)), self.cube.cells[('US', 'NY')])
+
+    def test_cardinality(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(40, self.cube.cardinality())
+            self.assertEqual(30, self.cube.cardinality(country='US'))
+            self.assertEqual(15, self.cube.cardinality(city='LA'))
+            self.assertEqual(25, self.cube.cardinality(city__in=['LA', 'Berlin']))
+            self.assertEqual(0, self.cube.cardinality(country='FR'))
+            self.assertEqual(0, self.cube.cardinality(country='DE', city='NY'))
+
+        with self.assertRaises(ValueError):
+            self.cube.cardinality(unknown=1)
+
+    def test_union(self):
+        self.assertEqual(build_sketch(range(30)), self.cube.union(country='US'))
+        self.assertIsNone(self.cube.union(country='FR'))
+
+        # Cached value should not be changed by caller
+        self.cube.union(country='US').update(range(100))
+        self.assertEqual(30, self.cube.cardinality(country='US'))
+
+    def test_rollup(self):
+        self.assertDictEqual({('US',): 30, ('DE',): 10}, self.cube.rollup('country'))
+        self.assertDictEqual({('US', 'NY'): 20, ('US', 'LA'): 15}, self.cube.rollup('country', 'city', country='US'))
+        self.assertDictEqual({(): 40}, self.cube.rollup())
+
+        with self.assertRaises(ValueError):
+            self.cube.rollup('unknown')
+
+    def test_cache_size(self):
+        cube = HllCube(TestDimensionModel.objects.all(), 'hll_field', ['country', 'city'], cache_size=2)
+        cube.rollup('city')
+        self.assertEqual(2, len(cube._cache))
+
+    def test_refresh(self):
+        self.assertEqual(30, self.cube.cardinality(country='US'))
+
+        TestDimensionModel.objects.create(country='US', city='LA', hll_field=HllBulkSet(range(30, 40)))
+        TestDimensionModel.objects.create(country='DE', city='Munich', hll_field=HllBulkSet(range(200, 210)))
+
+        with self.assertNumQueries(1):
+            self.cube.refresh(country='US')
+
+        self.assertEqual(40, self.cube.cardinality(country='US'))
+        self.assertEqual(10, self.cube.cardinality(country='DE'))
+
+        self.cube.load()
+        self.assertEqual(20, self.cube.cardinality(country='DE'))
@@ -0,0 +1,66 @@
+from django.test import TestCase
+
+from django_pg_hll.delta import HllDeltaStore
+from django_pg_hll.values import HllEmpty, HllInteger
+
+from tests.models import TestModel, TestDeltaModel
+
+
+class HllDeltaStoreTest(TestCase):
+    def setUp(self):
+        TestModel.objects.bulk_create([
+            TestModel(id=100501, hll_field=HllEmpty() | 1),
+            TestModel(id=100502, hll_field=HllEmpty())
+        ])
+        self.store = HllDeltaStore(TestModel, 'hll_field', TestDeltaModel, 'main', 'hll_field')
+
+    def test_add(self):
+        self.store.add(100501, [1, 2, 3])
+        self.store.add_many({100501: HllInteger(4), 100502: {1, 2}})
+
+        self.assertEqual(3, self.store.pending_count())
+        self.assertEqual(1, self.store.pending_count(keys=[100502]))
+
+        # Main rows are not changed
+        self.assertDictEqual({100501: 1, 100502: 0}, dict(TestModel.objects.values_list('id', 'hll_field__cardinality')))
+
+    def test_cardinality(self):
+        self.assertEqual(1, self.store.cardinality(100501))
+        self.assertEqual(0, self.store.cardinality(100502))
+        self.assertEqual(0, self.store.cardinality(1))
+
+        self.store.add_many({100501: [1, 2, 3], 100502: [3, 4]})
+        self.assertEqual(3, self.store.cardinality(100501))
+        self.assertEqual(2, self.store.cardinality(100502))
+        self.assertEqual(4, self.store.cardinality(100501, 100502))
+
+    def test_annotate_with_deltas(self):
+        self.store.add(100501, [2, 3])
+        self.store.add(100501, [4])
+
+        qs = self.store.annotate_with_deltas(alias='total').filter(total__cardinality=4)
+        self.assertListEqual([100501], list(qs.values_list('id', flat=True)))
+
+    def test_compact(self):
+        self.store.add_many({100501: [1, 2, 3], 100502: [3, 4]})
+        self.store.add(100502, [5])
+
+        self.assertEqual(2, self.store.compact(batch_size=2, max_batches=1))
+        self.assertEqual(1, self.store.pending_count())
+        self.assertEqual(1, self.store.compact(batch_size=2))
+        self.assertEqual(0, self.store.pending_count())
+        self.assertEqual(0, self.store.compact())
+
+        self.assertDictEqual({100501: 3, 100502: 3}, dict(TestModel.objects.values_list('id', 'hll_field__cardinality')))
+        self.assertEqual(5, self.store.cardinality(100501, 100502))
+
+    def test_null_main(self):
+        # Deltas of main row with NULL hll are not lost
+        store = HllDeltaStore(TestModel, 'nullable_hll_field', TestDeltaModel, 'main', 'hll_field')
+        store.add_many({100501: [1, 2], 100502: [3]})
+        self.assertEqual(3, store.cardinality(100501, 100502))
+
+        self.assertEqual(2, store.compact())
+        self.assertDictEqual({100501: 2, 100502: 1},
+                             dict(TestModel.objects.values_list('id', 'nullable_hll_field__cardinality')))
+        self.assertEqual(3, store.cardinality(100501, 100502))
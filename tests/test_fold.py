@@ -0,0 +1,53 @@
+from django.test import TestCase
+
+from django_pg_hll.fold import hll_fold
+from django_pg_hll.sketch import HllSketch, build_sketch
+from django_pg_hll.values import HllEmpty
+
+from tests.models import FKModel, TestConfiguredModel, TestModel
+
+
+class HllFoldTest(TestCase):
+    def setUp(self):
+        self.fk1, self.fk2 = FKModel.objects.create(), FKModel.objects.create()
+        TestModel.objects.bulk_create([
+            TestModel(hll_field=HllEmpty(), fk=self.fk1),
+            TestModel(hll_field=build_sketch(range(100)), fk=self.fk1),
+            TestModel(hll_field=build_sketch(range(50, 1000)), fk=self.fk1),
+            TestModel(hll_field=build_sketch(range(10000)), fk=self.fk2),
+            TestModel(hll_field=build_sketch(range(5)), fk=None)
+        ])
+
+    def test_fold(self):
+        groups = hll_fold(TestModel.objects.all(), 'hll_field', chunk_size=2)
+        self.assertListEqual([None], list(groups.keys()))
+        self.assertEqual(build_sketch(range(10000)), groups[None])
+
+    def test_key(self):
+        groups = hll_fold(TestModel.objects.all(), 'hll_field', key=lambda fk_id: fk_id or 0, fields=['fk_id'],
+                          chunk_size=2)
+
+        self.assertDictEqual({
+            self.fk1.pk: build_sketch(range(1000)),
+            self.fk2.pk: build_sketch(range(10000)),
+            0: build_sketch(range(5))
+        }, groups)
+
+    def test_configured(self):
+        TestConfiguredModel.objects.create(hll_field=build_sketch(range(100), log2m=13, regwidth=2, expthresh=1,
+                                                                  sparseon=0))
+        groups = hll_fold(TestConfiguredModel.objects.all(), 'hll_field')
+        self.assertEqual(build_sketch(range(100), log2m=13, regwidth=2, expthresh=1, sparseon=0), groups[None])
+
+    def test_empty(self):
+        self.assertDictEqual({}, hll_fold(TestModel.objects.none(), 'hll_field'))
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            hll_fold(TestModel.objects.all(), 'hll_field', chunk_size=0)
+
+        with self.assertRaises(ValueError):
+            hll_fold(TestModel.objects.all(), 'hll_field', fields=['fk_id'])
+
+        with self.assertRaises(ValueError):
+            hll_fold(TestModel.objects.all(), 'hll_field', params=HllSketch(log2m=12).params)
@@ -0,0 +1,107 @@
+from django.test import TestCase
+
+from django_pg_hll.formats import hll_from_redis, hll_from_registers, hll_from_storage_spec, hll_to_redis, \
+    hll_to_registers, hll_to_storage_spec
+from django_pg_hll.sketch import HllSketch, build_sketch
+
+from tests.models import TestModel
+
+
+class StorageSpecFormatTest(TestCase):
+    def test_import(self):
+        sketch = build_sketch(range(1000))
+        self.assertEqual(sketch, hll_from_storage_spec(sketch.to_bytes()))
+        self.assertEqual(sketch, hll_from_storage_spec(sketch.to_hex()))
+        self.assertEqual(sketch.convert(regwidth=4), hll_from_storage_spec(sketch.to_bytes(), regwidth=4))
+
+        with self.assertRaises(ValueError):
+            hll_from_storage_spec(b'\x21\x8b\x7f')
+
+    def test_export(self):
+        sketch = build_sketch(range(1000))
+        instance = TestModel.objects.create(hll_field=sketch)
+        self.assertEqual(sketch.to_bytes(), hll_to_storage_spec(sketch))
+        self.assertEqual(sketch.to_bytes(), hll_to_storage_spec(TestModel.objects.get(pk=instance.pk).hll_field))
+
+
+class RegistersFormatTest(TestCase):
+    def test_import(self):
+        sketch = build_sketch(range(1000))
+        imported = hll_from_registers(list(sketch.registers), 'murmur3_x64_128')
+        self.assertEqual(sketch, imported)
+        self.assertEqual(HllSketch(), hll_from_registers(bytes(2048), 'murmur3_x64_128'))
+
+        imported = hll_from_registers(sketch.registers, 'sha1', regwidth=6, sparseon=0, allow_incompatible_hash=True)
+        self.assertTupleEqual((11, 6, -1, 0), imported.params)
+        self.assertEqual(sketch.cardinality(), imported.cardinality())
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            hll_from_registers(bytes(2048), 'sha1')
+
+        with self.assertRaises(ValueError):
+            hll_from_registers(bytes(1000), 'murmur3_x64_128')
+
+        with self.assertRaises(ValueError):
+            hll_from_registers([], 'murmur3_x64_128')
+
+        with self.assertRaises(ValueError):
+            hll_from_registers([32] * 2048, 'murmur3_x64_128')
+
+    def test_export(self):
+        sketch = build_sketch(range(100))
+        self.assertEqual(sketch.registers, hll_to_registers(sketch.to_bytes()))
+        self.assertEqual(bytearray(2048), hll_to_registers(HllSketch()))
+
+
+class RedisFormatTest(TestCase):
+    def test_round_trip(self):
+        sketch = build_sketch(range(10000), log2m=14, regwidth=6)
+        data = hll_to_redis(sketch, allow_incompatible_hash=True)
+
+        self.assertEqual(16 + 12288, len(data))
+        self.assertEqual(b'HYLL\x00', data[:5])
+        self.assertEqual(sketch, hll_from_redis(data, allow_incompatible_hash=True))
+
+    def test_dense_layout(self):
+        registers = bytearray(1 << 14)
+        registers[0], registers[1], registers[16383] = 1, 63, 5
+        data = hll_to_redis(HllSketch.from_registers(registers, regwidth=6), allow_incompatible_hash=True)
+
+        # Register 0 is in the lowest bits of the first byte, register 1 continues in the second byte
+        self.assertEqual(bytes((0b11000001, 0b00001111)), data[16:18])
+        self.assertEqual(bytes((5 << 2,)), data[-1:])
+
+    def test_sparse(self):
+        # ZERO run of 3 registers, VAL 2 for 1 register, XZERO run of 16380 registers
+        data = b'HYLL\x01' + bytes(11) + bytes((0x02, 0x84, 0x7F, 0xFB))
+        sketch = hll_from_redis(data, allow_incompatible_hash=True)
+
+        self.assertTupleEqual((14, 6, -1, 1), sketch.params)
+        registers = bytearray(1 << 14)
+        registers[3] = 2
+        self.assertEqual(registers, sketch.registers)
+
+        # Empty hll
+        self.assertEqual(HllSketch(14, 6), hll_from_redis(b'HYLL\x01' + bytes(11) + b'\x7f\xff',
+                                                          allow_incompatible_hash=True))
+
+    def test_validation(self):
+        data = hll_to_redis(HllSketch(14), allow_incompatible_hash=True)
+        with self.assertRaises(ValueError):
+            hll_from_redis(data)
+
+        with self.assertRaises(ValueError):
+            hll_to_redis(HllSketch(14))
+
+        with self.assertRaises(ValueError):
+            hll_to_redis(HllSketch(11), allow_incompatible_hash=True)
+
+        with self.assertRaises(ValueError):
+            hll_from_redis(b'HYLL\x00' + bytes(11) + bytes(10), allow_incompatible_hash=True)
+
+        with self.assertRaises(ValueError):
+            hll_from_redis(b'HYLL\x01' + bytes(11) + b'\x7f', allow_incompatible_hash=True)
+
+        with self.assertRaises(ValueError):
+            hll_from_redis(b'XXXX\x00' + bytes(11), allow_incompatible_hash=True)
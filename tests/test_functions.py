@@ -0,0 +1,62 @@
+from django.db.models import Case, F, Sum, When
+from django.test import TestCase
+
+from django_pg_hll.aggregate import UnionAgg
+from django_pg_hll.functions import HllCardinalityOf, HllUnion
+from django_pg_hll.sketch import build_sketch
+from django_pg_hll.values import HllBulkSet, HllEmpty
+
+from tests.models import TestDeltaModel, TestModel
+
+
+class HllFunctionsTest(TestCase):
+    def setUp(self):
+        self.main1 = TestModel.objects.create(hll_field=build_sketch(range(10)))
+        self.main2 = TestModel.objects.create(hll_field=build_sketch(range(100, 103)))
+        TestDeltaModel.objects.bulk_create([
+            TestDeltaModel(id=1, main=self.main1, hll_field=build_sketch(range(5, 20))),
+            TestDeltaModel(id=2, main=self.main1, hll_field=HllEmpty()),
+            TestDeltaModel(id=3, main=self.main2, hll_field=build_sketch(range(100, 110)))
+        ])
+
+    def test_cardinality_of_union(self):
+        result = TestDeltaModel.objects.annotate(card=HllCardinalityOf(HllUnion('hll_field', 'main__hll_field'))). \
+            order_by('id').values_list('id', 'card')
+        self.assertListEqual([(1, 20), (2, 10), (3, 10)], list(result))
+
+    def test_multiple_expressions(self):
+        result = TestModel.objects.filter(pk=self.main1.pk).annotate(
+            card=HllCardinalityOf(HllUnion('hll_field', build_sketch(range(50, 60)), HllBulkSet([1, 2, 1000]),
+                                           F('hll_field')))
+        ).values_list('card', flat=True)
+        self.assertListEqual([21], list(result))
+
+    def test_aggregates(self):
+        result = TestDeltaModel.objects.aggregate(
+            union=HllCardinalityOf(UnionAgg(HllUnion('hll_field', 'main__hll_field'))),
+            total=Sum(HllCardinalityOf('hll_field'))
+        )
+        self.assertDictEqual({'union': 30, 'total': 25}, result)
+
+        result = TestModel.objects.annotate(card=HllCardinalityOf(UnionAgg('testdeltamodel__hll_field'))). \
+            order_by('id').values_list('card', flat=True)
+        self.assertListEqual([15, 10], list(result))
+
+    def test_case(self):
+        result = TestDeltaModel.objects.annotate(card=HllCardinalityOf(Case(
+            When(id=1, then=F('main__hll_field')),
+            default=HllUnion(F('hll_field'), HllEmpty())
+        ))).order_by('id').values_list('card', flat=True)
+        self.assertListEqual([10, 0, 10], list(result))
+
+    def test_update(self):
+        TestModel.objects.filter(pk=self.main1.pk).update(hll_field=HllUnion('hll_field', build_sketch(range(20))))
+        self.assertEqual(20, TestModel.objects.filter(pk=self.main1.pk).
+                         values_list('hll_field__cardinality', flat=True)[0])
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            HllUnion('hll_field')
+
+        with self.assertRaises(ValueError):
+            HllCardinalityOf(1)
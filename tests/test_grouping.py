@@ -0,0 +1,93 @@
+from django.db.models import Count, Q
+from django.test import TestCase
+
+from django_pg_hll.aggregate import AddAgg, UnionAgg, UnionAggCardinality, CardinalitySum
+from django_pg_hll.grouping import Cube, GroupingSets, Rollup, aggregate_grouping_sets
+from django_pg_hll.sketch import HllSketch, build_sketch
+from django_pg_hll.values import HllBulkSet
+
+from tests.models import TestDimensionModel
+
+
+class GroupingTest(TestCase):
+    def test_get_sets(self):
+        self.assertListEqual([('a', 'b', 'c'), ('a', 'b'), ('a',), ()], Rollup('a', 'b', 'c').get_sets())
+        self.assertListEqual([('a', 'b'), ('a',), ('b',), ()], Cube('a', 'b').get_sets())
+        self.assertListEqual([('a',), ('b', 'c')], GroupingSets(('a',), ('b', 'c')).get_sets())
+        self.assertTupleEqual(('a', 'b', 'c'), GroupingSets(('a',), ('b', 'c'), ('c', 'a')).dimensions)
+
+        with self.assertRaises(ValueError):
+            GroupingSets(())
+
+    def test_as_sql(self):
+        columns = {'a': '"a"', 'b': '"b"'}
+        self.assertEqual('ROLLUP ("a", "b")', Rollup('a', 'b').as_sql(columns))
+        self.assertEqual('CUBE ("a", "b")', Cube('a', 'b').as_sql(columns))
+        self.assertEqual('GROUPING SETS (("a"), ("a", "b"), ())', GroupingSets(('a',), ('a', 'b'), ()).as_sql(columns))
+
+
+class AggregateGroupingSetsTest(TestCase):
+    def setUp(self):
+        TestDimensionModel.objects.bulk_create([
+            TestDimensionModel(country='US', city='NY', hll_field=HllBulkSet(range(0, 10))),
+            TestDimensionModel(country='US', city='NY', hll_field=HllBulkSet(range(5, 20))),
+            TestDimensionModel(country='US', city='LA', hll_field=HllBulkSet(range(15, 30))),
+            TestDimensionModel(country='DE', city='Berlin', hll_field=HllBulkSet(range(100, 110)))
+        ])
+
+    def _to_dict(self, rows, key='card'):
+        return {(row['grouping'], row['country'], row['city']): row[key] for row in rows}
+
+    def test_rollup(self):
+        rows = aggregate_grouping_sets(TestDimensionModel.objects.all(), Rollup('country', 'city'),
+                                       card=UnionAggCardinality('hll_field'), card_sum=CardinalitySum('hll_field'))
+        self.assertDictEqual({
+            (('country', 'city'), 'US', 'NY'): 20,
+            (('country', 'city'), 'US', 'LA'): 15,
+            (('country', 'city'), 'DE', 'Berlin'): 10,
+            (('country',), 'US', None): 30,
+            (('country',), 'DE', None): 10,
+            ((), None, None): 40
+        }, self._to_dict(rows))
+        self.assertEqual(50, self._to_dict(rows, key='card_sum')[((), None, None)])
+
+    def test_cube(self):
+        rows = aggregate_grouping_sets(TestDimensionModel.objects.filter(country='US'), Cube('country', 'city'),
+                                       card=UnionAggCardinality('hll_field'))
+        self.assertDictEqual({
+            (('country', 'city'), 'US', 'NY'): 20,
+            (('country', 'city'), 'US', 'LA'): 15,
+            (('country',), 'US', None): 30,
+            (('city',), None, 'NY'): 20,
+            (('city',), None, 'LA'): 15,
+            ((), None, None): 30
+        }, self._to_dict(rows))
+
+    def test_grouping_sets(self):
+        rows = aggregate_grouping_sets(TestDimensionModel.objects.all(), GroupingSets(('city',), ()),
+                                       grouping_alias='level', union=UnionAgg('hll_field'))
+        result = {(row['level'], row['city']): HllSketch.from_bytes(row['union']) for row in rows}
+        self.assertDictEqual({
+            (('city',), 'NY'): build_sketch(range(20)),
+            (('city',), 'LA'): build_sketch(range(15, 30)),
+            (('city',), 'Berlin'): build_sketch(range(100, 110)),
+            ((), None): build_sketch(list(range(30)) + list(range(100, 110)))
+        }, result)
+
+    def test_compiled_aggregates(self):
+        rows = aggregate_grouping_sets(TestDimensionModel.objects.all(), Rollup('country'),
+                                       cities=AddAgg('city', db_type='text'), count=Count('city', distinct=True))
+        result = {row['country']: (HllSketch.from_bytes(row['cities']), row['count']) for row in rows}
+        self.assertDictEqual({
+            'US': (build_sketch(['NY', 'LA'], db_type='text'), 2),
+            'DE': (build_sketch(['Berlin'], db_type='text'), 1),
+            None: (build_sketch(['NY', 'LA', 'Berlin'], db_type='text'), 3)
+        }, result)
+
+    def test_invalid_aggregates(self):
+        with self.assertRaises(ValueError):
+            aggregate_grouping_sets(TestDimensionModel.objects.all(), Rollup('country'))
+
+        with self.assertRaises(ValueError):
+            aggregate_grouping_sets(TestDimensionModel.objects.all(), Rollup('country'),
+                                    card=UnionAggCardinality('hll_field', filter=Q(city='NY')))
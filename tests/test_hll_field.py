@@ -10,6 +10,7 @@ from django_pg_hll.compatibility import django_pg_bulk_update_available, string_
 from django_pg_hll.fields import HllField
 from django_pg_hll.values import HllEmpty, HllInteger
 
+from tests.compatibility import postgres_only
 from tests.models import TestConfiguredModel, TestModel, FKModel
 
 
@@ -73,6 +74,7 @@ class HllFieldTest(TestCase):
         self.assertEqual(1, TestModel.objects.annotate(card=Cardinality('hll_field')).filter(id=100501).
                          values_list('card', flat=True)[0])
 
+    @postgres_only
     def test_hex_convertion(self):
         instance = TestModel.objects.get(id=100501)
         instance.hll_field = HllInteger(1) | F('hll_field')
@@ -88,18 +90,26 @@ class HllFieldTest(TestCase):
         self.assertEqual(1, TestModel.objects.annotate(card=Cardinality('hll_field')).filter(id=100501).
                          values_list('card', flat=True)[0])
 
+    @postgres_only
     def test_config_args(self):
         f = HllField(log2m=1, regwidth=2, expthresh=3, sparseon=4)
         self.assertEqual(f.db_type(connection), 'hll(1, 2, 3, 4)')
 
+    @postgres_only
     def test_partial_config_args(self):
         f = HllField(log2m=1, regwidth=2)
         self.assertEqual(f.db_type(connection), 'hll(1, 2)')
 
+    @postgres_only
     def test_no_config_args(self):
         f = HllField()
         self.assertEqual(f.db_type(connection), 'hll')
 
+    def test_params(self):
+        self.assertTupleEqual((11, 5, -1, 1), HllField().params)
+        self.assertTupleEqual((12, 4, -1, 1), HllField(log2m=12, regwidth=4).params)
+        self.assertTupleEqual((10, 3, 0, 0), HllField(log2m=10, regwidth=3, expthresh=0, sparseon=0).params)
+
     def test_config_args_wrong_order(self):
         with self.assertRaisesMessage(ValueError, '`regwidth` argument can be set only if [log2m] arguments are set'):
             HllField(regwidth=1)
@@ -133,6 +143,7 @@ class TestAggregation(TestCase):
         self.assertEqual({0, 1, 2}, set(TestModel.objects.annotate(card=Cardinality('hll_field')).
                          values_list('card', flat=True)))
 
+    @postgres_only
     def test_union_aggregate_function(self):
         fk_instance = FKModel.objects.create()
         TestModel.objects.all().update(fk=fk_instance)
@@ -222,6 +233,7 @@ class TestConfigurationAggregation(TestCase):
         self.assertEqual(1, TestConfiguredModel.objects.filter(hll_field__sparseon=0).count())
 
 
+@postgres_only
 @skipIf(not django_pg_bulk_update_available(), 'django-pg-bulk-update library is not installed')
 class TestBulkUpdate(TestCase):
     def setUp(self):
@@ -247,3 +259,35 @@ class TestBulkUpdate(TestCase):
 
         self.assertEqual({(100501, 1), (100502, 2)}, set(TestModel.objects.annotate(card=Cardinality('hll_field')).
                                                          values_list('id', 'card')))
+
+    def test_bulk_update_or_create_raw_values(self):
+        from django_pg_bulk_update import bulk_update_or_create
+
+        TestModel.objects.create(id=100502, hll_field=HllInteger(1) | HllInteger(2))
+        serialized = TestModel.objects.get(id=100502).hll_field
+
+        res = bulk_update_or_create(TestModel, [{'id': 100501, 'hll_field': [1, 2, 'test']},
+                                                {'id': 100502, 'hll_field': {3, 4}},
+                                                {'id': 100503, 'hll_field': serialized}],
+                                    set_functions={'hll_field': 'hll_concat'})
+        self.assertEqual(3, res)
+
+        self.assertEqual({(100501, 3), (100502, 4), (100503, 2)},
+                         set(TestModel.objects.annotate(card=Cardinality('hll_field')).values_list('id', 'card')))
+
+    def test_bulk_update_stable_sql(self):
+        from django_pg_bulk_update import bulk_update
+        from django_pg_hll.bulk_update import HllConcatFunction
+
+        res = bulk_update(TestModel, [{'id': 100501, 'hll_field': range(10)}],
+                          set_functions={'hll_field': HllConcatFunction(stable_sql=True)})
+        self.assertEqual(1, res)
+
+        self.assertEqual(10, TestModel.objects.annotate(card=Cardinality('hll_field')).filter(id=100501).
+                         values_list('card', flat=True)[0])
+
+    def test_bulk_update_invalid_value(self):
+        from django_pg_bulk_update import bulk_update
+
+        with self.assertRaises(ValueError):
+            bulk_update(TestModel, [{'id': 100501, 'hll_field': 'test'}], set_functions={'hll_field': 'hll_concat'})
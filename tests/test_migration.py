@@ -0,0 +1,140 @@
+from django.db import connection, models
+from django.db.migrations.state import ModelState, ProjectState
+from django.test import TestCase, TransactionTestCase
+
+from django_pg_hll.fields import HllField
+from django_pg_hll.migration import AlterHllField
+from django_pg_hll.sketch import HllSketch, build_sketch
+
+from tests.compatibility import postgres_only
+
+
+class HllSketchConvertTest(TestCase):
+    def test_explicit(self):
+        sketch = build_sketch(range(100))
+        converted = sketch.convert(log2m=13, regwidth=2, expthresh=1, sparseon=0)
+
+        self.assertTupleEqual((13, 2, 1, 0), converted.params)
+        self.assertEqual(build_sketch(range(100), log2m=13, regwidth=2, expthresh=1, sparseon=0), converted)
+        self.assertEqual(HllSketch(log2m=12), HllSketch().convert(log2m=12))
+
+    def test_registers(self):
+        sketch = build_sketch(range(1000))
+        self.assertEqual(build_sketch(range(1000), regwidth=2), sketch.convert(regwidth=2))
+        self.assertEqual(build_sketch(range(1000), sparseon=0), sketch.convert(sparseon=0))
+
+        with self.assertRaises(ValueError):
+            sketch.convert(log2m=12)
+
+
+class WritingAlterHllField(AlterHllField):
+    """
+    Writes to old column after the first backfill pass, as concurrent application does
+    """
+    written = False
+
+    def _backfill(self, schema_editor, model, old_field, shadow_field):
+        converted = super(WritingAlterHllField, self)._backfill(schema_editor, model, old_field, shadow_field)
+        if not self.written:
+            self.written = True
+            model._base_manager.filter(pk=1).update(**{old_field.name: build_sketch(range(45))})
+            model._base_manager.create(**{old_field.name: build_sketch(range(35))})
+
+        return converted
+
+
+class AlterHllFieldTest(TransactionTestCase):
+    app_label = 'tests'
+
+    def setUp(self):
+        self.state = ProjectState()
+        self.state.add_model(ModelState(self.app_label, 'HllMigrationModel', [
+            ('id', models.AutoField(primary_key=True)),
+            ('hll', HllField())
+        ]))
+
+        with connection.schema_editor() as editor:
+            editor.create_model(self.state.apps.get_model(self.app_label, 'HllMigrationModel'))
+
+    def tearDown(self):
+        with connection.schema_editor() as editor:
+            editor.delete_model(self.state.apps.get_model(self.app_label, 'HllMigrationModel'))
+
+    def _apply(self, operation):
+        new_state = self.state.clone()
+        operation.state_forwards(self.app_label, new_state)
+
+        with connection.schema_editor(atomic=False) as editor:
+            operation.database_forwards(self.app_label, editor, self.state, new_state)
+
+        return new_state
+
+    def test_alter(self):
+        model = self.state.apps.get_model(self.app_label, 'HllMigrationModel')
+        for i in range(5):
+            model.objects.create(hll=build_sketch(range(i * 10)))
+
+        operation = AlterHllField('HllMigrationModel', 'hll', HllField(log2m=13, regwidth=2, expthresh=1), batch_size=2)
+        new_state = self._apply(operation)
+        new_model = new_state.apps.get_model(self.app_label, 'HllMigrationModel')
+
+        for instance in new_model.objects.order_by('pk'):
+            expected = build_sketch(range((instance.pk - 1) * 10), log2m=13, regwidth=2, expthresh=1)
+            self.assertEqual(expected, HllSketch.from_bytes(instance.hll))
+
+        self.assertListEqual(['id', 'hll'], [f.column for f in new_model._meta.local_fields])
+
+        # Table is dropped by tearDown with new field state
+        self.state = new_state
+
+    def test_backwards(self):
+        operation = AlterHllField('HllMigrationModel', 'hll', HllField(log2m=13))
+        new_state = self._apply(operation)
+        instance = new_state.apps.get_model(self.app_label, 'HllMigrationModel').objects.create(
+            hll=build_sketch(range(10), log2m=13))
+
+        with connection.schema_editor(atomic=False) as editor:
+            operation.database_backwards(self.app_label, editor, new_state, self.state)
+
+        model = self.state.apps.get_model(self.app_label, 'HllMigrationModel')
+        self.assertEqual(build_sketch(range(10)), HllSketch.from_bytes(model.objects.get(pk=instance.pk).hll))
+
+    @postgres_only
+    def test_concurrent_writes(self):
+        model = self.state.apps.get_model(self.app_label, 'HllMigrationModel')
+        for i in range(5):
+            model.objects.create(hll=build_sketch(range(i * 10)))
+
+        operation = WritingAlterHllField('HllMigrationModel', 'hll', HllField(log2m=13), batch_size=2)
+        self.state = self._apply(operation)
+
+        new_model = self.state.apps.get_model(self.app_label, 'HllMigrationModel')
+        self.assertEqual(build_sketch(range(45), log2m=13), HllSketch.from_bytes(new_model.objects.get(pk=1).hll))
+        self.assertEqual(build_sketch(range(35), log2m=13), HllSketch.from_bytes(new_model.objects.get(pk=6).hll))
+
+        with connection.cursor() as cursor:
+            description = connection.introspection.get_table_description(cursor, new_model._meta.db_table)
+            self.assertFalse({column.name: column for column in description}['hll'].null_ok)
+
+            # Sync trigger is removed
+            cursor.execute("SELECT COUNT(*) FROM pg_trigger WHERE tgname LIKE '%%hll_sync'")
+            self.assertEqual(0, cursor.fetchone()[0])
+
+    @postgres_only
+    def test_atomic_warning(self):
+        operation = AlterHllField('HllMigrationModel', 'hll', HllField(log2m=13))
+        new_state = self.state.clone()
+        operation.state_forwards(self.app_label, new_state)
+
+        with self.assertWarns(RuntimeWarning), connection.schema_editor() as editor:
+            operation.database_forwards(self.app_label, editor, self.state, new_state)
+
+        self.state = new_state
+
+    def test_deconstruct(self):
+        name, args, kwargs = AlterHllField('HllMigrationModel', 'hll', HllField(log2m=13), batch_size=100).deconstruct()
+        self.assertEqual('AlterHllField', name)
+        self.assertEqual(100, kwargs['batch_size'])
+
+        with self.assertRaises(ValueError):
+            AlterHllField('HllMigrationModel', 'hll', models.BinaryField())
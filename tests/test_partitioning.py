@@ -0,0 +1,172 @@
+import datetime
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, models, transaction
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import isolate_apps
+from django.utils import timezone
+
+from django_pg_hll.migration import CreatePartitionedModel
+from django_pg_hll.partitioning import TimePartitioning, maintain_partitions
+from django_pg_hll.values import HllEmpty
+
+from tests.compatibility import postgres_only
+from tests.models import FKModel, TestModel, TestPartitionedModel
+
+
+class TimePartitioningTest(TestCase):
+    def test_periods(self):
+        value = datetime.datetime(2024, 12, 18, 15, 30, 10, tzinfo=datetime.timezone.utc)
+        expected = {
+            'hour': (datetime.datetime(2024, 12, 18, 15), datetime.datetime(2024, 12, 18, 16), 'p2024121815'),
+            'day': (datetime.datetime(2024, 12, 18), datetime.datetime(2024, 12, 19), 'p20241218'),
+            'week': (datetime.datetime(2024, 12, 16), datetime.datetime(2024, 12, 23), 'p20241216'),
+            'month': (datetime.datetime(2024, 12, 1), datetime.datetime(2025, 1, 1), 'p202412')
+        }
+
+        for interval, (start, next_start, suffix) in expected.items():
+            with self.subTest(interval=interval):
+                partitioning = TimePartitioning('time', interval=interval)
+                self.assertEqual(start, partitioning.get_period_start(value))
+                self.assertEqual(next_start, partitioning.get_next_period_start(start))
+                self.assertEqual('tests_testpartitionedmodel_%s' % suffix,
+                                 partitioning.get_partition_name(TestPartitionedModel, start))
+
+        self.assertEqual(datetime.datetime(2024, 12, 18),
+                         TimePartitioning('time').get_period_start(datetime.date(2024, 12, 18)))
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            TimePartitioning('time', interval='year')
+
+        with self.assertRaises(ValueError):
+            TimePartitioning('time', premake=-1)
+
+        with self.assertRaises(ValueError):
+            TimePartitioning('hll_field').get_field(TestPartitionedModel)
+
+        with self.assertRaises(ValueError):
+            CreatePartitionedModel('Test', [], partitioning=None)
+
+        with self.assertRaises(ValueError):
+            maintain_partitions(TestModel)
+
+    def test_deconstruct(self):
+        partitioning = TimePartitioning('time', interval='hour', retention=datetime.timedelta(hours=5))
+        self.assertEqual(partitioning, TimePartitioning('time', interval='hour', retention=datetime.timedelta(hours=5)))
+        self.assertNotEqual(partitioning, TimePartitioning('time', interval='hour'))
+
+        operation = CreatePartitionedModel('Test', [], partitioning=partitioning)
+        name, args, kwargs = operation.deconstruct()
+        self.assertEqual('CreatePartitionedModel', name)
+        self.assertEqual(partitioning, kwargs['partitioning'])
+
+    def test_table_sql(self):
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        sql, params = TestPartitionedModel.hll_partitioning.get_table_sql(editor, TestPartitionedModel)
+
+        qn = connection.ops.quote_name
+        self.assertListEqual([], params)
+        self.assertTrue(sql.startswith('CREATE TABLE %s (' % qn(TestPartitionedModel._meta.db_table)))
+        self.assertTrue(sql.endswith(', PRIMARY KEY (%s, %s)) PARTITION BY RANGE (%s)'
+                                     % (qn('id'), qn('time'), qn('time'))))
+        self.assertEqual(1, sql.count('PRIMARY KEY'))
+        for column in ('id', 'time', 'hll_field'):
+            self.assertIn('%s ' % qn(column), sql)
+
+    @isolate_apps('tests')
+    def test_table_sql_foreign_key(self):
+        class TestPartitionedFKModel(models.Model):
+            time = models.DateTimeField()
+            fk = models.ForeignKey(FKModel, on_delete=models.CASCADE)
+
+        # Postgres schema editor has no inline foreign key template. SQL is generated without connecting to database,
+        # so postgres DDL is checked with any test database
+        pg_connection = PostgresDatabaseWrapper(connection.settings_dict, 'partitioning_test')
+        qn = pg_connection.ops.quote_name
+        with pg_connection.SchemaEditorClass(pg_connection, collect_sql=True, atomic=False) as editor:
+            sql, _ = TimePartitioning('time').get_table_sql(editor, TestPartitionedFKModel)
+            self.assertIn('%s integer NOT NULL, ' % qn('fk_id'), sql)
+            self.assertNotIn('REFERENCES', sql)
+
+        # Foreign key is added after table is created
+        self.assertEqual(1, len(editor.collected_sql))
+        self.assertIn('FOREIGN KEY (%s) REFERENCES %s (%s)' % (qn('fk_id'), qn(FKModel._meta.db_table), qn('id')),
+                      editor.collected_sql[0])
+
+        # SQLite declares foreign key inline
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        editor.deferred_sql = []
+        sql, _ = TimePartitioning('time').get_table_sql(editor, TestPartitionedFKModel)
+        fk_sql = sql if editor.sql_create_inline_fk else ' '.join(str(statement) for statement in editor.deferred_sql)
+        self.assertIn('REFERENCES %s' % connection.ops.quote_name(FKModel._meta.db_table), fk_sql)
+
+    def test_save(self):
+        TestPartitionedModel.objects.create(time=timezone.now(), hll_field=HllEmpty())
+        self.assertEqual(1, TestPartitionedModel.objects.filter(time__lte=timezone.now()).count())
+
+
+@postgres_only
+class PartitionMaintenanceTest(TransactionTestCase):
+    def setUp(self):
+        self.initial_partitions = self._get_partitions()
+
+    def tearDown(self):
+        # Partitions are not removed by flushing database after test
+        with connection.cursor() as cursor:
+            for name in set(self._get_partitions()) - set(self.initial_partitions):
+                cursor.execute('DROP TABLE %s' % connection.ops.quote_name(name))
+
+    def _get_partitions(self):
+        return [name for name, _ in TestPartitionedModel.hll_partitioning.get_partitions(TestPartitionedModel)]
+
+    def test_migration(self):
+        partitioning = TestPartitionedModel.hll_partitioning
+        now = partitioning.get_period_start(timezone.now())
+
+        # Current and 2 premade partitions are created by migration
+        self.assertListEqual([partitioning.get_partition_name(TestPartitionedModel, now),
+                              partitioning.get_partition_name(TestPartitionedModel, now + datetime.timedelta(days=1)),
+                              partitioning.get_partition_name(TestPartitionedModel, now + datetime.timedelta(days=2))],
+                             self._get_partitions())
+
+        with transaction.atomic(), self.assertRaises(DatabaseError):
+            TestPartitionedModel.objects.create(time=timezone.now() - datetime.timedelta(days=30),
+                                                hll_field=HllEmpty())
+
+    def test_pruning(self):
+        TestPartitionedModel.objects.create(time=timezone.now(), hll_field=HllEmpty())
+        queryset = TestPartitionedModel.objects.filter(time__gte=timezone.now() + datetime.timedelta(days=1))
+
+        with connection.cursor() as cursor:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute('EXPLAIN %s' % sql, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+        current_partition = self._get_partitions()[0]
+        self.assertNotIn(current_partition, plan)
+
+    def test_maintain(self):
+        partitioning = TestPartitionedModel.hll_partitioning
+        created = partitioning.create_partitions(TestPartitionedModel, end=timezone.now(),
+                                                 start=timezone.now() - datetime.timedelta(days=10))
+        self.assertEqual(10, len(created))
+        self.assertEqual(13, len(self._get_partitions()))
+
+        TestPartitionedModel.objects.create(time=timezone.now() - datetime.timedelta(days=9), hll_field=HllEmpty())
+
+        created, dropped = maintain_partitions(TestPartitionedModel)
+        self.assertListEqual([], created)
+        self.assertEqual(3, len(dropped))
+        self.assertEqual(10, len(self._get_partitions()))
+        self.assertEqual(0, TestPartitionedModel.objects.count())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('hll_partitions', stdout=out)
+        self.assertIn('tests.TestPartitionedModel: created 0 partitions, dropped 0 partitions', out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('hll_partitions', 'tests.TestModel', stdout=out)
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from django_pg_hll.profiler import _get_sample, estimate_size, profile_hll_field
+from django_pg_hll.sketch import build_sketch
+from django_pg_hll.values import HllEmpty
+
+from tests.models import TestModel
+
+
+class ProfilerTest(TestCase):
+    def setUp(self):
+        TestModel.objects.bulk_create([
+            TestModel(hll_field=HllEmpty()),
+            TestModel(hll_field=build_sketch(range(10))),
+            TestModel(hll_field=build_sketch(range(300))),
+            TestModel(hll_field=build_sketch(range(20000)))
+        ])
+
+    def test_estimate_size(self):
+        self.assertEqual(3, estimate_size(0, (11, 5, -1, 1)))
+        self.assertEqual(83, estimate_size(10, (11, 5, -1, 1)))
+        self.assertEqual(1283, estimate_size(1000000, (11, 5, -1, 1)))
+        self.assertEqual(1283, estimate_size(10, (11, 5, 0, 0)))
+
+        # Estimation should be close to real size
+        real_size = len(build_sketch(range(1000)).to_bytes())
+        self.assertAlmostEqual(real_size, estimate_size(1000, (11, 5, -1, 1)), delta=real_size * 0.05)
+
+    def test_profile(self):
+        report = profile_hll_field(TestModel.objects.all(), 'hll_field', sample_size=None)
+
+        self.assertEqual(4, report['rows'])
+        self.assertTupleEqual((11, 5, -1, 1), report['params'])
+        self.assertDictEqual({'UNDEFINED': 0, 'EMPTY': 1, 'EXPLICIT': 1, 'SPARSE': 1, 'FULL': 1}, report['types'])
+        self.assertEqual(sum(len(build_sketch(range(size)).to_bytes()) for size in (0, 10, 300, 20000)),
+                         report['raw_bytes'])
+        self.assertEqual(0, report['toasted'])
+        self.assertEqual(0, report['cardinality']['min'])
+        self.assertEqual(10, report['cardinality']['p50'])
+
+        candidates = {item['params']: item for item in report['candidates']}
+        self.assertEqual(12, len(candidates))
+        self.assertEqual(report['raw_bytes'], candidates[(11, 5, -1, 1)]['bytes'])
+        self.assertEqual(0, candidates[(11, 5, -1, 1)]['estimated'])
+        self.assertEqual(2, candidates[(12, 5, -1, 1)]['estimated'])
+        self.assertEqual(3 + 3 * 1283, candidates[(11, 5, 0, 0)]['bytes'])
+
+    def test_candidates(self):
+        report = profile_hll_field(TestModel.objects.all(), 'hll_field', sample_size=2, candidates=[(11, 4, -1, 1)])
+        self.assertEqual(2, report['rows'])
+        self.assertListEqual([(11, 4, -1, 1)], [item['params'] for item in report['candidates']])
+
+    def test_sample(self):
+        # Small part of analyzed table is sampled with TABLESAMPLE
+        TestModel.objects.bulk_create([TestModel() for _ in range(100)])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE %s' % connection.ops.quote_name(TestModel._meta.db_table))
+
+        sample = _get_sample(TestModel.objects.all(), 2)
+        self.assertLessEqual(len(sample), 2)
+        self.assertEqual(connection.vendor == 'postgresql', 'TABLESAMPLE' in str(sample.query))
+
+        # Random rows are ordered, if sample is a big part of the table
+        sample = _get_sample(TestModel.objects.all(), 50)
+        self.assertEqual(50, len(sample))
+        self.assertNotIn('TABLESAMPLE', str(sample.query))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('hll_profile', 'tests.TestModel', 'hll_field', '--candidate', '11,4,-1,1', stdout=out)
+        self.assertIn('Rows sampled: 4', out.getvalue())
+        self.assertIn('(11, 4, -1, 1)', out.getvalue())
@@ -0,0 +1,87 @@
+import datetime
+import threading
+
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from django_pg_hll import HllBulkSet
+from django_pg_hll.progressive import _split_bounds, hll_progressive_union
+from django_pg_hll.sketch import build_sketch
+
+from tests.models import TestModel, TestPartitionedModel
+
+
+class ProgressiveUnionTest(TransactionTestCase):
+    def setUp(self):
+        for i in range(10):
+            TestModel.objects.create(hll_field=HllBulkSet(range(i * 10, i * 10 + 15)))
+
+    def test_split_bounds(self):
+        self.assertListEqual([3, 6, 8], _split_bounds(1, 10, 4))
+        self.assertListEqual([2], _split_bounds(1, 2, 4))
+        self.assertListEqual([], _split_bounds(5, 5, 4))
+
+        start = datetime.date(2024, 1, 1)
+        self.assertListEqual([datetime.date(2024, 1, 16)], _split_bounds(start, datetime.date(2024, 1, 31), 2))
+
+    def test_progressive(self):
+        for workers in (4, 1):
+            with self.subTest(workers=workers):
+                results = list(hll_progressive_union(TestModel.objects.all(), 'hll_field', partitions=4,
+                                                     workers=workers))
+                self.assertListEqual([1, 2, 3, 4], [result.completed for result in results])
+                self.assertSetEqual({4}, {result.total for result in results})
+
+                # Running estimate never decreases
+                cardinalities = [result.cardinality for result in results]
+                self.assertListEqual(sorted(cardinalities), cardinalities)
+                self.assertEqual(105, results[-1].cardinality)
+                self.assertEqual(build_sketch(range(105)).to_bytes(), results[-1].hll)
+
+    def test_atomic(self):
+        with transaction.atomic():
+            TestModel.objects.create(hll_field=HllBulkSet(range(1000, 1010)))
+            results = list(hll_progressive_union(TestModel.objects.all(), 'hll_field', partitions=4, workers=4))
+
+        # Uncommitted row is seen, as ranges are queried in current transaction
+        self.assertEqual(115, results[-1].cardinality)
+
+    def test_time_bounds(self):
+        now = timezone.now()
+        for day in range(3):
+            TestPartitionedModel.objects.create(time=now + datetime.timedelta(hours=day * 6),
+                                                hll_field=HllBulkSet(range(day * 5, day * 5 + 10)))
+
+        bounds = [now + datetime.timedelta(hours=3), now + datetime.timedelta(hours=9)]
+        results = list(hll_progressive_union(TestPartitionedModel.objects.all(), 'hll_field', split_field='time',
+                                             bounds=bounds))
+        self.assertEqual(3, len(results))
+        self.assertEqual(20, results[-1].cardinality)
+
+        results = list(hll_progressive_union(TestPartitionedModel.objects.all(), 'hll_field', split_field='time'))
+        self.assertEqual(20, results[-1].cardinality)
+
+    def test_empty(self):
+        results = list(hll_progressive_union(TestModel.objects.filter(pk__lt=0), 'hll_field'))
+        self.assertListEqual([(0, None, 1, 1)], results)
+
+    def test_cancel(self):
+        generator = hll_progressive_union(TestModel.objects.all(), 'hll_field', partitions=10, workers=1)
+        self.assertEqual(1, next(generator).completed)
+        generator.close()
+        self.assertListEqual([], list(generator))
+
+        event = threading.Event()
+        generator = hll_progressive_union(TestModel.objects.all(), 'hll_field', partitions=10, workers=2,
+                                          cancel_event=event)
+        self.assertEqual(1, next(generator).completed)
+        event.set()
+        self.assertListEqual([], list(generator))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            next(hll_progressive_union(TestModel.objects.all(), 'hll_field', partitions=0))
+
+        with self.assertRaises(ValueError):
+            next(hll_progressive_union(TestModel.objects.all(), 'hll_field', workers=0))
@@ -0,0 +1,72 @@
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from django_pg_hll import HllBulkSet, UnionAggCardinality
+from django_pg_hll.routers import HllQuerySet, HllReplicaRouter, hll_analytics
+
+from tests.models import TestModel
+
+
+class LaggingRouter(HllReplicaRouter):
+    lags = {}
+
+    def get_lag(self, using):
+        lag = self.lags.get(using, 0.0)
+        if lag is None:
+            raise DatabaseError('Database is down')
+
+        return lag
+
+
+class HllReplicaRouterTest(TestCase):
+    databases = {'default', 'secondary'}
+
+    def setUp(self):
+        TestModel.objects.create(hll_field=HllBulkSet(range(10)))
+        TestModel.objects.using('secondary').create(hll_field=HllBulkSet(range(100)))
+        self.queryset = HllQuerySet(model=TestModel)
+
+    def _get_card(self, queryset):
+        return queryset.aggregate(card=UnionAggCardinality('hll_field'))['card']
+
+    def test_routing(self):
+        with override_settings(DATABASE_ROUTERS=[HllReplicaRouter(replicas=['secondary'])]):
+            self.assertAlmostEqual(100, self._get_card(self.queryset), delta=5)
+            self.assertEqual(1, self.queryset.filter(hll_field__cardinality__gt=50).count())
+            self.assertAlmostEqual(100, self.queryset.annotate(card=UnionAggCardinality('hll_field')).values_list(
+                'card', flat=True)[0], delta=5)
+            self.assertAlmostEqual(100, self._get_card(hll_analytics(TestModel.objects.all())), delta=5)
+
+            # Not hll queries and explicit database are not routed
+            self.assertEqual(1, self.queryset.filter(pk__gt=0).count())
+            self.assertAlmostEqual(10, self._get_card(TestModel.objects.all()), delta=1)
+            self.assertAlmostEqual(10, self._get_card(self.queryset.using('default')), delta=1)
+
+    def test_fallback(self):
+        router = LaggingRouter(replicas=['secondary'], max_lag=10, check_interval=0)
+        with override_settings(DATABASE_ROUTERS=[router]):
+            router.lags = {'secondary': 20.0}
+            self.assertAlmostEqual(10, self._get_card(self.queryset), delta=1)
+
+            router.lags = {'secondary': None}
+            self.assertAlmostEqual(10, self._get_card(self.queryset), delta=1)
+
+            router.lags = {'secondary': 5.0}
+            self.assertAlmostEqual(100, self._get_card(self.queryset), delta=5)
+
+    def test_check_interval(self):
+        router = LaggingRouter(replicas=['secondary'], max_lag=10, check_interval=3600)
+        self.assertTrue(router.is_available('secondary'))
+
+        router.lags = {'secondary': None}
+        self.assertTrue(router.is_available('secondary'))
+
+    def test_settings(self):
+        with override_settings(HLL_REPLICA_DATABASES=['secondary'], HLL_REPLICA_MAX_LAG=30):
+            router = HllReplicaRouter()
+
+        self.assertTupleEqual(('secondary',), router.replicas)
+        self.assertEqual(30, router.max_lag)
+        self.assertEqual(5, router.check_interval)
+        self.assertIsNone(router.db_for_read(TestModel))
+        self.assertEqual('secondary', router.db_for_read(TestModel, hll_analytics=True))
@@ -0,0 +1,46 @@
+from django.test import TransactionTestCase
+
+from django_pg_hll.sharding import sharded_union
+from django_pg_hll.sketch import build_sketch
+from django_pg_hll.values import HllBulkSet
+
+from tests.models import TestModel
+
+
+class ShardedUnionTest(TransactionTestCase):
+    databases = {'default', 'secondary'}
+
+    def setUp(self):
+        TestModel.objects.using('default').create(hll_field=HllBulkSet(range(0, 60)))
+        TestModel.objects.using('default').create(hll_field=HllBulkSet(range(30, 90)))
+        TestModel.objects.using('secondary').create(hll_field=HllBulkSet(range(80, 150)))
+
+    def test_merge_local(self):
+        for workers in (None, 1):
+            with self.subTest(workers=workers):
+                result = sharded_union(TestModel.objects.all(), 'hll_field', ['default', 'secondary'], workers=workers)
+                self.assertEqual(150, result.cardinality)
+                self.assertEqual(build_sketch(range(150)).to_bytes(), result.hll)
+                self.assertSetEqual({'default', 'secondary'}, set(result.timings.keys()))
+
+    def test_merge_database(self):
+        result = sharded_union(TestModel.objects.all(), 'hll_field', ['default', 'secondary'], merge='database',
+                               merge_using='secondary')
+        self.assertEqual(150, result.cardinality)
+        self.assertEqual(build_sketch(range(150)).to_bytes(), result.hll)
+
+    def test_empty_shard(self):
+        result = sharded_union(TestModel.objects.filter(pk__lt=0), 'hll_field', ['default', 'secondary'])
+        self.assertEqual(0, result.cardinality)
+        self.assertIsNone(result.hll)
+
+        result = sharded_union(TestModel.objects.using('secondary').filter(hll_field__cardinality__gt=65),
+                               'hll_field', ['default', 'secondary'])
+        self.assertEqual(70, result.cardinality)
+
+    def test_invalid_params(self):
+        with self.assertRaises(ValueError):
+            sharded_union(TestModel.objects.all(), 'hll_field', [])
+
+        with self.assertRaises(ValueError):
+            sharded_union(TestModel.objects.all(), 'hll_field', ['default'], merge='unknown')
@@ -0,0 +1,148 @@
+from django.test import TestCase
+
+from django_pg_hll.aggregate import Cardinality
+from django_pg_hll.sketch import HllSketch, build_sketch, hash_value, murmurhash3_x64_128
+from django_pg_hll.values import HllBulkSet, HllEmpty
+
+from tests.models import TestModel, TestConfiguredModel
+
+
+class HashTest(TestCase):
+    def test_murmurhash3(self):
+        self.assertTupleEqual((0, 0), murmurhash3_x64_128(b''))
+        self.assertTupleEqual((14688674573012802306, 6565844092913065241), murmurhash3_x64_128(b'hello'))
+
+    def test_hash_value(self):
+        self.assertEqual(-8604791237420463362, hash_value(1, 'integer'))
+        self.assertEqual(hash_value(1, 'smallint'), hash_value(1))
+        self.assertEqual(hash_value(100500, 'integer'), hash_value(100500))
+        self.assertEqual(hash_value('test', 'text'), hash_value('test'))
+        self.assertEqual(hash_value(b'test', 'bytea'), hash_value(b'test'))
+        self.assertEqual(hash_value(b'test'), hash_value('test'))
+        self.assertNotEqual(hash_value(1, 'integer'), hash_value(1, 'bigint'))
+        self.assertNotEqual(hash_value(1), hash_value(1, hash_seed=1))
+
+        with self.assertRaises(ValueError):
+            hash_value(1.5)
+
+        with self.assertRaises(ValueError):
+            hash_value(1, 'any')
+
+
+class HllSketchTest(TestCase):
+    def test_types(self):
+        sketch = HllSketch()
+        self.assertEqual(HllSketch.EMPTY, sketch.type)
+        self.assertEqual(0, sketch.cardinality())
+
+        sketch.update(range(160))
+        self.assertEqual(HllSketch.EXPLICIT, sketch.type)
+        self.assertEqual(160, sketch.cardinality())
+
+        sketch.add(160)
+        self.assertEqual(HllSketch.SPARSE, sketch.type)
+
+        sketch.update(range(10000))
+        self.assertEqual(HllSketch.FULL, sketch.type)
+        self.assertAlmostEqual(10000, sketch.cardinality(), delta=500)
+
+    def test_params(self):
+        with self.assertRaises(ValueError):
+            HllSketch(log2m=32)
+
+        with self.assertRaises(ValueError):
+            HllSketch(expthresh=3)
+
+        with self.assertRaises(ValueError):
+            HllSketch(sparseon=2)
+
+        self.assertEqual(0, HllSketch(expthresh=0).explicit_cutoff)
+        self.assertEqual(160, HllSketch().explicit_cutoff)
+        self.assertEqual(1, HllSketch(13, 2, 1, 0).explicit_cutoff)
+
+    def test_serialization(self):
+        for params in ((11, 5, -1, 1), (13, 2, 1, 0), (10, 4, 0, 1)):
+            for size in (0, 1, 100, 1000, 10000):
+                with self.subTest(params=params, size=size):
+                    sketch = build_sketch(range(size), log2m=params[0], regwidth=params[1], expthresh=params[2],
+                                          sparseon=params[3])
+                    restored = HllSketch.from_bytes(sketch.to_bytes())
+                    self.assertEqual(sketch, restored)
+                    self.assertTupleEqual(params, restored.params)
+                    self.assertEqual(sketch.cardinality(), restored.cardinality())
+                    self.assertEqual(sketch, HllSketch.from_bytes(sketch.to_hex()))
+
+        self.assertEqual(b'\x11\x8b\x7f', HllSketch().to_bytes())
+
+        with self.assertRaises(ValueError):
+            HllSketch.from_bytes(b'\x21\x8b\x7f')
+
+        with self.assertRaises(ValueError):
+            HllSketch.from_bytes('test')
+
+    def test_union(self):
+        sketch1, sketch2 = build_sketch(range(0, 100)), build_sketch(range(50, 150))
+        self.assertEqual(150, (sketch1 | sketch2).cardinality())
+        self.assertEqual(100, sketch1.cardinality())
+
+        sketch3 = build_sketch(range(10000))
+        self.assertEqual(sketch3, sketch1 | sketch3)
+        self.assertEqual(sketch3, sketch3 | sketch1)
+
+        with self.assertRaises(ValueError):
+            sketch1.union(HllSketch(log2m=12))
+
+    def test_union_update_bytes(self):
+        buffer = bytearray(1 << 11)
+        for size1, size2 in ((0, 10), (10, 100), (100, 1000), (1000, 10000), (10000, 100)):
+            with self.subTest(size1=size1, size2=size2):
+                sketch1, sketch2 = build_sketch(range(size1)), build_sketch(range(size1 // 2, size2))
+                folded = sketch1.copy()
+                folded.union_update_bytes(sketch2.to_bytes(), buffer=buffer)
+                self.assertEqual(sketch1 | sketch2, folded)
+
+                folded = sketch1.copy()
+                folded.union_update_bytes(sketch2.to_hex())
+                self.assertEqual(sketch1 | sketch2, folded)
+
+        with self.assertRaises(ValueError):
+            HllSketch().union_update_bytes(HllSketch(log2m=12).to_bytes())
+
+        with self.assertRaises(ValueError):
+            HllSketch().union_update_bytes(build_sketch(range(10000)).to_bytes(), buffer=bytearray(10))
+
+    def test_build_sketch_workers(self):
+        self.assertEqual(build_sketch(range(10000)), build_sketch(iter(range(10000)), workers=2, chunk_size=1000))
+
+
+class HllSketchDatabaseTest(TestCase):
+    def _get_db_sketch(self, pk):
+        return HllSketch.from_bytes(TestModel.objects.get(pk=pk).hll_field)
+
+    def test_compatibility(self):
+        for size in (1, 100, 1000, 10000):
+            with self.subTest(size=size):
+                values = [i for i in range(size)] + ['test', True, b'test']
+                instance = TestModel.objects.create(hll_field=HllBulkSet(values))
+                sketch = build_sketch(values)
+
+                self.assertEqual(sketch.cardinality(), self._get_db_sketch(instance.pk).cardinality())
+                self.assertEqual(sketch.registers, self._get_db_sketch(instance.pk).registers)
+
+    def test_save(self):
+        sketch = build_sketch(range(1000))
+        instance = TestModel.objects.create(hll_field=sketch)
+
+        card = TestModel.objects.annotate(card=Cardinality('hll_field')).get(pk=instance.pk).card
+        self.assertEqual(sketch.cardinality(), card)
+
+        TestModel.objects.filter(pk=instance.pk).update(hll_field=HllEmpty() | build_sketch(range(500, 1500)))
+        card = TestModel.objects.annotate(card=Cardinality('hll_field')).get(pk=instance.pk).card
+        self.assertEqual(build_sketch(range(500, 1500)).cardinality(), card)
+
+    def test_save_configured(self):
+        sketch = HllSketch(13, 2, 1, 0)
+        sketch.update(range(100))
+        instance = TestConfiguredModel.objects.create(hll_field=sketch)
+
+        self.assertEqual(sketch, HllSketch.from_bytes(TestConfiguredModel.objects.get(pk=instance.pk).hll_field))
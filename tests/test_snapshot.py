@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+from unittest import mock, skipIf
+
+from django.test import TestCase
+
+from django_pg_hll.compatibility import numpy_available
+from django_pg_hll.snapshot import HllSnapshot, hll_snapshot
+from django_pg_hll.sketch import HllSketch, build_sketch
+
+from tests.models import TestModel
+
+
+class HllSnapshotTest(TestCase):
+    def setUp(self):
+        self.rows = TestModel.objects.bulk_create([
+            TestModel(hll_field=build_sketch(range(100))),
+            TestModel(hll_field=build_sketch(range(50, 1000))),
+            TestModel(hll_field=build_sketch(range(10000)))
+        ])
+        self.pks = list(TestModel.objects.order_by('pk').values_list('pk', flat=True))
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'snapshot.hll')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _test_snapshot(self):
+        self.assertEqual(3, hll_snapshot(TestModel.objects.order_by('pk'), 'hll_field', self.path, chunk_size=2))
+        self.assertFalse(os.path.exists('%s.tmp' % self.path))
+
+        with HllSnapshot(self.path) as snapshot:
+            self.assertEqual(3, len(snapshot))
+            self.assertListEqual(self.pks, list(snapshot))
+            self.assertIn(self.pks[0], snapshot)
+            self.assertTupleEqual((11, 5, -1, 1), snapshot.params)
+
+            self.assertEqual(HllSketch.from_registers(build_sketch(range(100)).registers), snapshot.get(self.pks[0]))
+            self.assertEqual(HllSketch.from_registers(build_sketch(range(1000)).registers),
+                             snapshot.union(self.pks[:2], chunk_size=1))
+            self.assertEqual(build_sketch(range(10000)), snapshot.union())
+            self.assertAlmostEqual(10000, snapshot.cardinality(), delta=300)
+            self.assertEqual(0, snapshot.cardinality([]))
+
+            with self.assertRaises(KeyError):
+                snapshot.union([-1])
+
+    def test_snapshot(self):
+        with mock.patch('django_pg_hll.snapshot.numpy', None):
+            self._test_snapshot()
+
+            with HllSnapshot(self.path) as snapshot, self.assertRaises(ImportError):
+                snapshot.array
+
+    @skipIf(not numpy_available(), 'numpy is not installed')
+    def test_numpy(self):
+        self._test_snapshot()
+
+        with HllSnapshot(self.path) as snapshot:
+            array = snapshot.array
+            self.assertTupleEqual((3, 2048), array.shape)
+            self.assertEqual(build_sketch(range(100)).registers, bytearray(array[snapshot.index[self.pks[0]]]))
+            del array
+
+    def test_keys(self):
+        hll_snapshot(TestModel.objects.all(), 'hll_field', self.path, key_field='id')
+        with HllSnapshot(self.path) as snapshot:
+            self.assertSetEqual(set(self.pks), set(snapshot.keys))
+
+        with self.assertRaises(ValueError):
+            hll_snapshot(TestModel.objects.all(), 'hll_field', self.path, key_field='fk')
+
+        self.assertFalse(os.path.exists('%s.tmp' % self.path))
+
+    def test_empty(self):
+        self.assertEqual(0, hll_snapshot(TestModel.objects.none(), 'hll_field', self.path))
+        with HllSnapshot(self.path) as snapshot:
+            self.assertEqual(0, len(snapshot))
+            self.assertEqual(HllSketch(), snapshot.union())
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot' * 10)
+
+        with self.assertRaises(ValueError):
+            HllSnapshot(self.path)
@@ -0,0 +1,51 @@
+from django.test import TestCase
+
+from django_pg_hll.streaming import hll_stream_update, hll_stream_update_many
+from django_pg_hll.utils import chunks
+from django_pg_hll.values import HllEmpty
+
+from tests.models import TestModel
+
+
+class ChunksTest(TestCase):
+    def test_chunks(self):
+        self.assertListEqual([[0, 1], [2, 3], [4]], list(chunks((i for i in range(5)), 2)))
+        self.assertListEqual([], list(chunks([], 2)))
+
+        with self.assertRaises(ValueError):
+            list(chunks([1], 0))
+
+
+class HllStreamUpdateTest(TestCase):
+    def setUp(self):
+        TestModel.objects.bulk_create([
+            TestModel(id=100501, hll_field=HllEmpty()),
+            TestModel(id=100502, hll_field=HllEmpty()),
+            TestModel(id=100503, hll_field=HllEmpty())
+        ])
+
+    def _get_cardinalities(self):
+        return dict(TestModel.objects.values_list('id', 'hll_field__cardinality'))
+
+    def test_stream_update(self):
+        processed = hll_stream_update(TestModel.objects.filter(id__in={100501, 100502}), 'hll_field',
+                                      (i % 7 for i in range(100)), chunk_size=15)
+
+        self.assertEqual(100, processed)
+        self.assertDictEqual({100501: 7, 100502: 7, 100503: 0}, self._get_cardinalities())
+
+    def test_stream_update_non_atomic(self):
+        hll_stream_update(TestModel.objects.filter(id=100501), 'hll_field', iter(['a', 'b', 'c']), chunk_size=1,
+                          atomic=False, stable_sql=True)
+        self.assertDictEqual({100501: 3, 100502: 0, 100503: 0}, self._get_cardinalities())
+
+    def test_stream_update_many(self):
+        data = ((100501 + i % 2, i) for i in range(10))
+        processed = hll_stream_update_many(TestModel.objects.all(), 'hll_field', data, chunk_size=3)
+
+        self.assertEqual(10, processed)
+        self.assertDictEqual({100501: 5, 100502: 5, 100503: 0}, self._get_cardinalities())
+
+    def test_stream_update_many_missing_key(self):
+        hll_stream_update_many(TestModel.objects.all(), 'hll_field', [(1, 1), (100503, 1)], key_field='id')
+        self.assertDictEqual({100501: 0, 100502: 0, 100503: 1}, self._get_cardinalities())
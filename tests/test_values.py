@@ -291,3 +291,24 @@ class HllBulkSetTest(HllSetTest):
             sql, params = val.as_sql(self.compiler, connection)
             self.assertEqual('(SELECT hll_add_agg(hll_hash_integer(item::integer)) FROM UNNEST(%s) AS t(item))', sql)
             self.assertListEqual([[1]], params)
+
+    def test_stable_sql(self):
+        empty_sql, empty_params = self.base_cls(stable_sql=True).as_sql(self.compiler, connection)
+        sql, params = self.base_cls([1, 100500, 'test', True], stable_sql=True).as_sql(self.compiler, connection)
+
+        self.assertEqual(empty_sql, sql)
+        self.assertListEqual([[], [], [], [], [], []], empty_params)
+        self.assertListEqual([[True], [1], [100500], [], [], ['test']], params)
+
+        with self.assertRaises(ValueError):
+            self.base_cls([HllAny(1)], stable_sql=True).as_sql(self.compiler, connection)
+
+        with self.assertRaises(ValueError):
+            self.base_cls([HllInteger(1, hash_seed=1)], stable_sql=True).as_sql(self.compiler, connection)
+
+    def test_stable_sql_save(self):
+        TestModel.objects.create(hll_field=self.base_cls([i for i in range(10)] + ['test'], stable_sql=True))
+        TestModel.objects.create(hll_field=self.base_cls(stable_sql=True))
+
+        self.assertListEqual([11, 0], list(TestModel.objects.order_by('id').
+                                           values_list("hll_field__cardinality", flat=True)))